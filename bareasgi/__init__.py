@@ -11,6 +11,9 @@ from bareutils import (
 
 from .application import Application
 from .http import (
+    Codec,
+    CodecRegistry,
+    HttpMetrics,
     HttpRequest,
     HttpResponse,
     HttpRequestCallback,
@@ -31,6 +34,9 @@ __all__ = [
 
     "Application",
 
+    "Codec",
+    "CodecRegistry",
+    "HttpMetrics",
     "HttpRequest",
     "HttpResponse",
     "HttpRequestCallback",
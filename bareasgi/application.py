@@ -13,10 +13,13 @@ from typing import (
 from bareutils import text_writer
 
 from .http import (
+    CodecRegistry,
+    HttpMetrics,
     HttpRouter,
     HttpResponse,
     HttpMiddlewareCallback,
-    HttpRequestCallback
+    HttpRequestCallback,
+    MinimumDataRate
 )
 from .lifespan import LifespanRequestHandler
 from .websockets import WebSocketRouter, WebSocketRequestCallback
@@ -45,7 +48,15 @@ class Application(CoreApplication):
             startup_handlers: Optional[List[LifespanRequestHandler]] = None,
             shutdown_handlers: Optional[List[LifespanRequestHandler]] = None,
             not_found_response: HttpResponse = DEFAULT_NOT_FOUND_RESPONSE,
-            info: Optional[Dict[str, Any]] = None
+            info: Optional[Dict[str, Any]] = None,
+            cancel_on_disconnect: bool = False,
+            deadline: Optional[float] = None,
+            stream_deadline: Optional[float] = None,
+            body_idle_timeout: Optional[float] = None,
+            body_min_rate: Optional[MinimumDataRate] = None,
+            max_body_size: Optional[int] = None,
+            http_metrics: Optional[HttpMetrics] = None,
+            codecs: Optional[CodecRegistry] = None
     ) -> None:
         """Construct the application
 
@@ -90,6 +101,37 @@ class Application(CoreApplication):
                 found (404) response. Defaults to DEFAULT_NOT_FOUND_RESPONSE.
             info (Optional[Dict[str, Any]], optional): Optional
                 dictionary for user data. Defaults to None.
+            cancel_on_disconnect (bool, optional): If True the handler is
+                cancelled when the client disconnects before it completes.
+                Routes may override this with the `cancel_on_disconnect`
+                option. Defaults to False.
+            deadline (Optional[float], optional): The number of seconds a
+                handler has to produce a response before a 504 is sent. Routes
+                may override this with the `deadline` option. Defaults to
+                None.
+            stream_deadline (Optional[float], optional): The number of
+                seconds allowed for streaming the response body, after which
+                the response is abandoned. Routes may override this with the
+                `stream_deadline` option. Defaults to None.
+            body_idle_timeout (Optional[float], optional): The number of
+                seconds to wait for each part of the request body before
+                aborting the request with a 408. Routes may override this with
+                the `body_idle_timeout` option. Defaults to None.
+            body_min_rate (Optional[MinimumDataRate], optional): The minimum
+                rate in bytes per second, and a grace period in seconds, for
+                receiving the request body before aborting the request with a
+                408. Routes may override this with the `body_min_rate` option.
+                Defaults to None.
+            max_body_size (Optional[int], optional): The maximum size in bytes
+                of a request body. Larger bodies are rejected with a 413.
+                Routes may override this with the `max_body_size` option.
+                Defaults to None.
+            http_metrics (Optional[HttpMetrics], optional): Optional metrics
+                for requests which did not complete normally. Defaults to
+                None.
+            codecs (Optional[CodecRegistry], optional): The codecs used by
+                `HttpRequest.json` and `HttpResponse.from_json`. Defaults to
+                None, for the standard library JSON codec.
         """
         super().__init__(
             middlewares or [],
@@ -97,26 +139,36 @@ class Application(CoreApplication):
             web_socket_router or BasicWebSocketRouter(),
             startup_handlers or [],
             shutdown_handlers or [],
-            info or {}
+            info or {},
+            cancel_on_disconnect=cancel_on_disconnect,
+            deadline=deadline,
+            stream_deadline=stream_deadline,
+            body_idle_timeout=body_idle_timeout,
+            body_min_rate=body_min_rate,
+            max_body_size=max_body_size,
+            http_metrics=http_metrics,
+            codecs=codecs
         )
 
     def on_http_request(
             self,
             methods: AbstractSet[str],
-            path: str
+            path: str,
+            **options: Any
     ) -> Callable[[HttpRequestCallback], HttpRequestCallback]:
         """A decorator to add an http route handler to the application
 
         Args:
             methods (AbstractSet[str]): The http methods, e.g. {{'POST', 'PUT'}
             path (str): The path
+            **options (Any): Options for the route, e.g. `priority=10`.
 
         Returns:
             Callable[[HttpRequestCallback], HttpRequestCallback]: The decorated
                 request.
         """
         def decorator(callback: HttpRequestCallback) -> Callable:
-            self.http_router.add(methods, path, callback)
+            self.http_router.add(methods, path, callback, **options)
             return callback
 
         return decorator
@@ -9,6 +9,7 @@ from typing import (
     Dict,
     List,
     Mapping,
+    Optional,
     Tuple
 )
 
@@ -16,14 +17,15 @@ from ..http import (
     HttpRouter,
     HttpRequest,
     HttpResponse,
-    HttpRequestCallback
+    HttpRequestCallback,
+    HttpRoute
 )
 
 from .path_definition import PathDefinition
 
 LOGGER = logging.getLogger(__name__)
 
-Route = Tuple[PathDefinition, HttpRequestCallback]
+Route = Tuple[PathDefinition, HttpRequestCallback, HttpRoute]
 
 
 class BasicHttpRouter(HttpRouter):
@@ -45,18 +47,21 @@ class BasicHttpRouter(HttpRouter):
             self,
             methods: AbstractSet[str],
             path: str,
-            callback: HttpRequestCallback
+            callback: HttpRequestCallback,
+            **options: Any
     ) -> None:
         LOGGER.debug('Adding route for %s on "%s".', methods, path)
         path_definition = PathDefinition(path)
+        route = HttpRoute(path, options)
         for method in methods:
-            self.add_route(method, path_definition, callback)
+            self.add_route(method, path_definition, callback, route)
 
     def add_route(
             self,
             method: str,
             path_definition: PathDefinition,
-            callback: HttpRequestCallback
+            callback: HttpRequestCallback,
+            route: Optional[HttpRoute] = None
     ) -> None:
         """Add a route to a callback for a method and path definition
 
@@ -64,9 +69,15 @@ class BasicHttpRouter(HttpRouter):
             method (str): The method.
             path_definition (PathDefinition): The path definition
             callback (HttpRequestCallback): The callback
+            route (Optional[HttpRoute], optional): The route provided to the
+                request. Defaults to a route with no options.
         """
         path_definition_list = self._routes.setdefault(method, [])
-        path_definition_list.append((path_definition, callback))
+        path_definition_list.append((
+            path_definition,
+            callback,
+            route or HttpRoute(path_definition.path)
+        ))
 
     async def _not_found(
             self,
@@ -79,9 +90,17 @@ class BasicHttpRouter(HttpRouter):
             method: str,
             path: str
     ) -> Tuple[HttpRequestCallback, Mapping[str, Any]]:
+        handler, matches, _route = self.resolve_route(method, path)
+        return handler, matches
+
+    def resolve_route(
+            self,
+            method: str,
+            path: str
+    ) -> Tuple[HttpRequestCallback, Mapping[str, Any], Optional[HttpRoute]]:
         path_definition_list = self._routes.get(method)
         if path_definition_list:
-            for path_definition, handler in path_definition_list:
+            for path_definition, handler, route in path_definition_list:
                 is_match, matches = path_definition.match(path)
                 if is_match:
                     LOGGER.debug(
@@ -92,7 +111,7 @@ class BasicHttpRouter(HttpRouter):
                         matches,
                         extra={'method': method, 'path': path}
                     )
-                    return handler, matches
+                    return handler, matches, route
 
         LOGGER.warning(
             'Failed to find a match for %s on "%s".',
@@ -100,4 +119,4 @@ class BasicHttpRouter(HttpRouter):
             path,
             extra={'method': method, 'path': path}
         )
-        return self._not_found, {}
+        return self._not_found, {}, None
@@ -1,7 +1,7 @@
 """The core ASGI application"""
 
 import logging
-from typing import Any, Dict, List, cast
+from typing import Any, Dict, List, Optional, cast
 
 from asgi_typing import (
     HTTPScope,
@@ -18,7 +18,15 @@ from asgi_typing import (
     ASGIReceiveCallable
 )
 
-from .http import HttpInstance, HttpRouter, HttpMiddlewareCallback
+from .http import (
+    CodecRegistry,
+    HttpInstance,
+    MinimumDataRate,
+    HttpMetrics,
+    HttpRouter,
+    HttpMiddlewareCallback
+)
+from .http.http_codecs import reset_codecs, use_codecs
 from .lifespan import LifespanRequestHandler, LifespanInstance
 from .websockets import WebSocketRouter, WebSocketInstance
 
@@ -35,7 +43,16 @@ class CoreApplication:
             web_socket_router: WebSocketRouter,
             startup_handlers: List[LifespanRequestHandler],
             shutdown_handlers: List[LifespanRequestHandler],
-            info: Dict[str, Any]
+            info: Dict[str, Any],
+            *,
+            cancel_on_disconnect: bool = False,
+            deadline: Optional[float] = None,
+            stream_deadline: Optional[float] = None,
+            body_idle_timeout: Optional[float] = None,
+            body_min_rate: Optional[MinimumDataRate] = None,
+            max_body_size: Optional[int] = None,
+            http_metrics: Optional[HttpMetrics] = None,
+            codecs: Optional[CodecRegistry] = None
     ) -> None:
         self.info = info
         self.http_router = http_router
@@ -43,6 +60,14 @@ class CoreApplication:
         self.ws_router = web_socket_router
         self.startup_handlers = startup_handlers
         self.shutdown_handlers = shutdown_handlers
+        self.cancel_on_disconnect = cancel_on_disconnect
+        self.deadline = deadline
+        self.stream_deadline = stream_deadline
+        self.body_idle_timeout = body_idle_timeout
+        self.body_min_rate = body_min_rate
+        self.max_body_size = max_body_size
+        self.http_metrics = http_metrics or HttpMetrics()
+        self.codecs = codecs or CodecRegistry()
 
     async def _handle_http_request(
             self,
@@ -54,9 +79,20 @@ class CoreApplication:
             scope,
             self.http_router,
             self.middlewares,
-            self.info
+            self.info,
+            cancel_on_disconnect=self.cancel_on_disconnect,
+            deadline=self.deadline,
+            stream_deadline=self.stream_deadline,
+            body_idle_timeout=self.body_idle_timeout,
+            body_min_rate=self.body_min_rate,
+            max_body_size=self.max_body_size,
+            metrics=self.http_metrics
         )
-        await instance.process(receive, send)
+        token = use_codecs(self.codecs)
+        try:
+            await instance.process(receive, send)
+        finally:
+            reset_codecs(token)
 
     async def _handle_lifespan_request(
             self,
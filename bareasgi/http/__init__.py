@@ -4,19 +4,43 @@ from .http_callbacks import (
     HttpRequestCallback,
     HttpMiddlewareCallback,
 )
-from .http_instance import HttpInstance
+from .http_instance import HttpInstance, MinimumDataRate
+from .http_codecs import Codec, CodecRegistry
+from .http_errors import (
+    HttpFormError,
+    HttpPayloadTooLargeError,
+    HttpUnsupportedMediaTypeError
+)
+from .http_metrics import HttpMetrics
+from .http_multipart import FormField, FormFile, FormPart
 from .http_middleware import make_middleware_chain
 from .http_request import HttpRequest
 from .http_response import HttpResponse, PushResponse
+from .http_route import HttpRoute
 from .http_router import HttpRouter
+from .http_spooled_body import SpooledBody
+from .http_tee_body import TeeBody
 
 __all__ = [
+    'Codec',
+    'CodecRegistry',
+    'FormField',
+    'FormFile',
+    'FormPart',
+    'HttpFormError',
     'HttpInstance',
+    'HttpMetrics',
+    'HttpPayloadTooLargeError',
     'HttpRequest',
     'HttpResponse',
+    'HttpRoute',
     'HttpRouter',
+    'HttpUnsupportedMediaTypeError',
     'HttpRequestCallback',
     'HttpMiddlewareCallback',
+    'MinimumDataRate',
     'PushResponse',
+    'SpooledBody',
+    'TeeBody',
     'make_middleware_chain'
 ]
@@ -0,0 +1,306 @@
+"""Codecs for request and response bodies"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextvars import ContextVar, Token
+from json import dumps, loads
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar, Union
+
+from bareutils import header
+
+Encoder = Callable[[Any], bytes]
+Decoder = Callable[[Union[bytes, bytearray]], Any]
+
+AnyBytes = TypeVar('AnyBytes', bound=Union[bytes, bytearray])
+
+
+class Codec:
+    """An encoder and decoder for a media type"""
+
+    def __init__(
+            self,
+            media_type: bytes,
+            encode: Encoder,
+            decode: Decoder
+    ) -> None:
+        """Construct the codec.
+
+        Args:
+            media_type (bytes): The media type, e.g. b'application/json'.
+            encode (Encoder): A function to convert data to bytes.
+            decode (Decoder): A function to convert bytes to data. It may also
+                be passed a bytearray.
+        """
+        self.media_type = media_type
+        self.encode = encode
+        self.decode = decode
+
+    def __repr__(self) -> str:
+        return f'Codec({self.media_type!r})'
+
+
+def _encode_json(data: Any) -> bytes:
+    return dumps(data).encode('utf-8')
+
+
+JSON_CODEC = Codec(b'application/json', _encode_json, loads)
+
+
+class CodecRegistry:
+    """The codecs of an application, keyed by media type.
+
+    The JSON codec defaults to the standard library, and may be replaced with
+    a faster one which encodes directly to bytes. Other codecs, such as
+    MessagePack or CBOR, are chosen by content negotiation.
+
+    ```python
+    import msgpack
+    import orjson
+
+    app = Application(
+        codecs=CodecRegistry([
+            Codec(b'application/json', orjson.dumps, orjson.loads),
+            Codec(b'application/msgpack', msgpack.packb, msgpack.unpackb)
+        ])
+    )
+    ```
+
+    Decoding and encoding large payloads can block the event loop for long
+    enough to stall every other request. Above a threshold they can be run
+    in an executor instead. Responses are encoded in the executor by the
+    awaitable constructors, such as `HttpResponse.from_json_async`.
+
+    ```python
+    codecs = CodecRegistry(
+        offload_threshold=1_000_000,
+        offload_min_items=10_000
+    )
+    ```
+    """
+
+    def __init__(
+            self,
+            codecs: Optional[Iterable[Codec]] = None,
+            *,
+            max_cached_accepts: int = 256,
+            offload_threshold: Optional[int] = None,
+            offload_min_items: Optional[int] = None,
+            executor: Optional[Executor] = None
+    ) -> None:
+        """Construct the codec registry.
+
+        Args:
+            codecs (Optional[Iterable[Codec]], optional): Codecs to register
+                in addition to, or replacing, the default JSON codec. Defaults
+                to None.
+            max_cached_accepts (int, optional): The number of distinct accept
+                headers for which the negotiated codec is remembered.
+                Defaults to 256.
+            offload_threshold (Optional[int], optional): The size in bytes
+                of a body above which it is decoded in the executor. Defaults
+                to None.
+            offload_min_items (Optional[int], optional): The number of items
+                in a list or dict above which it is encoded in the executor.
+                The encoded size is not known before encoding, so the number
+                of items estimates it. Defaults to None.
+            executor (Optional[Executor], optional): The executor, which may
+                be a process pool if the codec functions can be pickled.
+                Defaults to None, for the default executor of the loop.
+        """
+        self.max_cached_accepts = max_cached_accepts
+        self.offload_threshold = offload_threshold
+        self.offload_min_items = offload_min_items
+        self.executor = executor
+        self._codecs: Dict[bytes, Codec] = {JSON_CODEC.media_type: JSON_CODEC}
+        self._negotiated: 'OrderedDict[bytes, Optional[Codec]]' = \
+            OrderedDict()
+        self.negotiation_hits = 0
+        self.negotiation_misses = 0
+        for codec in codecs or ():
+            self.register(codec)
+
+    def register(self, codec: Codec) -> None:
+        """Register a codec, replacing any for the same media type.
+
+        Args:
+            codec (Codec): The codec.
+        """
+        self._codecs[codec.media_type] = codec
+        self._negotiated.clear()
+
+    def for_content_type(self, media_type: bytes) -> Optional[Codec]:
+        """Find the codec for the media type of a request body.
+
+        A structured syntax suffix is also recognised, so
+        b'application/vnd.api+json' is decoded by the JSON codec.
+
+        Args:
+            media_type (bytes): The media type of the content-type.
+
+        Returns:
+            Optional[Codec]: The codec, or None if there is none.
+        """
+        codec = self._codecs.get(media_type)
+        if codec is None:
+            _, sep, suffix = media_type.rpartition(b'+')
+            if sep:
+                codec = self._codecs.get(b'application/' + suffix)
+        return codec
+
+    def _select(self, accept: bytes) -> Optional[Codec]:
+        media_ranges = header.accept([(b'accept', accept)]) or {}
+        best: Optional[Codec] = None
+        best_quality = 0.0
+        for media_type, codec in self._codecs.items():
+            major_type = media_type.partition(b'/')[0]
+            for media_range in (media_type, major_type + b'/*', b'*/*'):
+                parameters = media_ranges.get(media_range)
+                if parameters is not None:
+                    # The most specific range decides the quality.
+                    quality = float(parameters.get(b'q', 1.0))
+                    if quality > best_quality:
+                        best, best_quality = codec, quality
+                    break
+        return best
+
+    def negotiate(self, accept: Optional[bytes]) -> Optional[Codec]:
+        """Choose the codec for a response from the accept header.
+
+        The choice is remembered for each distinct accept header, as clients
+        typically send the same few values. The use of the remembered choices
+        is counted by `negotiation_hits` and `negotiation_misses`.
+
+        Args:
+            accept (Optional[bytes]): The value of the accept header, if any.
+
+        Returns:
+            Optional[Codec]: The most acceptable codec, the JSON codec if
+                there is no accept header, or None if no codec is acceptable.
+        """
+        if accept is None:
+            return self.json
+
+        if accept in self._negotiated:
+            self.negotiation_hits += 1
+            self._negotiated.move_to_end(accept)
+            return self._negotiated[accept]
+
+        self.negotiation_misses += 1
+        codec = self._select(accept)
+        self._negotiated[accept] = codec
+        if len(self._negotiated) > self.max_cached_accepts:
+            self._negotiated.popitem(last=False)
+        return codec
+
+    async def decode(
+            self,
+            decode: Callable[[AnyBytes], Any],
+            data: AnyBytes
+    ) -> Any:
+        """Decode data, in the executor if it is larger than the threshold.
+
+        Args:
+            decode (Callable[[AnyBytes], Any]): The decoding function.
+            data (AnyBytes): The data to decode.
+
+        Returns:
+            Any: The decoded data.
+        """
+        if (
+                self.offload_threshold is None or
+                len(data) < self.offload_threshold
+        ):
+            return decode(data)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, decode, data)
+
+    def should_offload_encode(self, data: Any) -> bool:
+        """Decide if encoding data should be run in the executor.
+
+        Args:
+            data (Any): The data to encode.
+
+        Returns:
+            bool: True if the data is a list or dict with more items than the
+                threshold.
+        """
+        return (
+            self.offload_min_items is not None and
+            isinstance(data, (list, tuple, dict)) and
+            len(data) >= self.offload_min_items
+        )
+
+    async def encode(self, encode: Encoder, data: Any) -> bytes:
+        """Encode data, in the executor if it has more items than the
+        threshold.
+
+        Args:
+            encode (Encoder): The encoding function.
+            data (Any): The data to encode.
+
+        Returns:
+            bytes: The encoded data.
+        """
+        if not self.should_offload_encode(data):
+            return encode(data)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, encode, data)
+
+    def find(self, media_type: bytes) -> Optional[Codec]:
+        """Find the codec for a media type.
+
+        Args:
+            media_type (bytes): The media type.
+
+        Returns:
+            Optional[Codec]: The codec, or None if there is none.
+        """
+        return self._codecs.get(media_type)
+
+    @property
+    def json(self) -> Codec:
+        """The JSON codec.
+
+        Returns:
+            Codec: The codec for application/json.
+        """
+        return self._codecs[JSON_CODEC.media_type]
+
+
+DEFAULT_CODECS = CodecRegistry()
+
+_CURRENT_CODECS: ContextVar[CodecRegistry] = ContextVar(
+    'codecs',
+    default=DEFAULT_CODECS
+)
+
+
+def current_codecs() -> CodecRegistry:
+    """The codecs of the application handling the current request.
+
+    Returns:
+        CodecRegistry: The codec registry.
+    """
+    return _CURRENT_CODECS.get()
+
+
+def use_codecs(codecs: CodecRegistry) -> Token:
+    """Set the codecs for the current request.
+
+    Args:
+        codecs (CodecRegistry): The codec registry.
+
+    Returns:
+        Token: A token to restore the previous codecs.
+    """
+    return _CURRENT_CODECS.set(codecs)
+
+
+def reset_codecs(token: Token) -> None:
+    """Restore the codecs in place before `use_codecs` was called.
+
+    Args:
+        token (Token): The token returned by `use_codecs`.
+    """
+    _CURRENT_CODECS.reset(token)
@@ -7,3 +7,19 @@ class HttpInternalError(Exception):
 
 class HttpDisconnectError(Exception):
     """Exception raise on HTTP disconnect"""
+
+
+class HttpRequestTimeoutError(Exception):
+    """Exception raised when the request body is received too slowly"""
+
+
+class HttpPayloadTooLargeError(Exception):
+    """Exception raised when the request body exceeds the maximum size"""
+
+
+class HttpUnsupportedMediaTypeError(Exception):
+    """Exception raised when there is no codec for the request body"""
+
+
+class HttpFormError(Exception):
+    """Exception raised when a form, or a streamed JSON body, is malformed"""
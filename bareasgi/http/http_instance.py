@@ -9,6 +9,7 @@ from typing import (
     Dict,
     Iterable,
     List,
+    Optional,
     Set,
     Tuple,
     cast
@@ -24,10 +25,20 @@ from asgi_typing import (
     HTTPServerPushEvent
 )
 
+from bareutils import bytes_writer, header
+
 from ..utils import NullIter
 
 from .http_callbacks import HttpMiddlewareCallback
-from .http_errors import HttpInternalError, HttpDisconnectError
+from .http_errors import (
+    HttpInternalError,
+    HttpDisconnectError,
+    HttpFormError,
+    HttpPayloadTooLargeError,
+    HttpRequestTimeoutError,
+    HttpUnsupportedMediaTypeError
+)
+from .http_metrics import HttpMetrics
 from .http_request import HttpRequest
 from .http_response import HttpResponse, PushResponse
 from .http_router import HttpRouter
@@ -35,6 +46,57 @@ from .http_middleware import make_middleware_chain
 
 LOGGER = logging.getLogger(__name__)
 
+# A rate in bytes per second, and a grace period in seconds.
+MinimumDataRate = Tuple[float, float]
+
+# The number of body messages received ahead of a handler which is not
+# reading them.
+MAX_READ_AHEAD = 16
+_END_OF_BODY = object()
+
+GATEWAY_TIMEOUT_BODY = b'Gateway Timeout'
+GATEWAY_TIMEOUT_HEADERS = [
+    (b'content-type', b'text/plain'),
+    (b'content-length', str(len(GATEWAY_TIMEOUT_BODY)).encode('ascii'))
+]
+
+# Sent with a rejection over HTTP/1, as the rest of the request is not read.
+# Connection specific headers are not allowed in HTTP/2.
+CONNECTION_CLOSE_HEADER = (b'connection', b'close')
+
+REQUEST_TIMEOUT_BODY = b'Request Timeout'
+REQUEST_TIMEOUT_HEADERS = [
+    (b'content-type', b'text/plain'),
+    (b'content-length', str(len(REQUEST_TIMEOUT_BODY)).encode('ascii'))
+]
+
+BAD_REQUEST_BODY = b'Bad Request'
+BAD_REQUEST_HEADERS = [
+    (b'content-type', b'text/plain'),
+    (b'content-length', str(len(BAD_REQUEST_BODY)).encode('ascii'))
+]
+
+PAYLOAD_TOO_LARGE_BODY = b'Payload Too Large'
+PAYLOAD_TOO_LARGE_HEADERS = [
+    (b'content-type', b'text/plain'),
+    (b'content-length', str(len(PAYLOAD_TOO_LARGE_BODY)).encode('ascii'))
+]
+
+UNSUPPORTED_MEDIA_TYPE_BODY = b'Unsupported Media Type'
+UNSUPPORTED_MEDIA_TYPE_HEADERS = [
+    (b'content-type', b'text/plain'),
+    (b'content-length', str(len(UNSUPPORTED_MEDIA_TYPE_BODY)).encode('ascii'))
+]
+
+
+async def _cancel_tasks(*tasks: asyncio.Future) -> None:
+    for task in tasks:
+        try:
+            task.cancel()
+            await task
+        except:  # pylint: disable=bare-except
+            pass
+
 
 class BodyIterator:
     """Iterate over the body content"""
@@ -42,25 +104,55 @@ class BodyIterator:
     def __init__(
             self,
             receive: ASGIHTTPReceiveCallable,
-            body: bytes,
-            more_body: bool
+            *,
+            idle_timeout: Optional[float] = None,
+            min_rate: Optional[MinimumDataRate] = None,
+            max_size: Optional[int] = None
     ) -> None:
         """Initialise the body iterator
 
+        The "http.request" messages are received by `start` and as the body
+        is iterated.
+
         Args:
             receive (Receive): The receive callable
-            body (bytes): The initial body
-            more_body (bool): Signifies if there is additional content to come.
+            idle_timeout (Optional[float], optional): The maximum time in
+                seconds to wait for each message. Defaults to None.
+            min_rate (Optional[MinimumDataRate], optional): The minimum rate
+                in bytes per second at which the body must be received, and
+                the grace period in seconds before it is enforced. Defaults
+                to None.
+            max_size (Optional[int], optional): The maximum size of the body
+                in bytes. Defaults to None.
         """
         self._receive = receive
         self._queue: Queue = Queue()
-        self._queue.put_nowait(body)
-        self._more_body = more_body
+        self._more_body = True
+        self._is_reading_ahead = False
+        self._drained = asyncio.Event()
+        self._idle_timeout = idle_timeout
+        self._min_rate = min_rate
+        self._max_size = max_size
+        # The time spent waiting for the client, and the bytes it has sent.
+        self._read_time = 0.0
+        self._bytes_read = 0
+        self._is_timed_out = False
 
     def __aiter__(self):
         return self
 
     async def __anext__(self):
+        if self._is_reading_ahead:
+            # The messages are received by `read_ahead`.
+            item = await self._queue.get()
+            self._drained.set()
+            if item is _END_OF_BODY or isinstance(item, Exception):
+                self._queue.put_nowait(item)
+                if item is _END_OF_BODY:
+                    raise StopAsyncIteration
+                raise item
+            return item
+
         if not self._queue.empty():
             body = await self._queue.get()
             return body
@@ -70,8 +162,38 @@ class BodyIterator:
 
         return await self._read()
 
+    def _read_timeout(self) -> Optional[float]:
+        timeout = self._idle_timeout
+        if self._min_rate is not None:
+            # Only the time spent waiting on the client counts, so a handler
+            # which is slow to read is not mistaken for a slow client.
+            rate, grace_period = self._min_rate
+            allowed = max(grace_period, self._bytes_read / rate) - \
+                self._read_time
+            timeout = allowed if timeout is None else min(timeout, allowed)
+        return timeout
+
+    async def _receive_event(self) -> Any:
+        if self._is_timed_out:
+            raise HttpRequestTimeoutError
+
+        timeout = self._read_timeout()
+        if timeout is None:
+            return await self._receive()
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            return await asyncio.wait_for(self._receive(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            LOGGER.warning('Timed out receiving the request body.')
+            self._is_timed_out = True
+            raise HttpRequestTimeoutError from None
+        finally:
+            self._read_time += loop.time() - start
+
     async def _read(self) -> bytes:
-        event = await self._receive()
+        event = await self._receive_event()
         LOGGER.debug('Received event type "%s".', event['type'])
 
         if event['type'] == 'http.disconnect':
@@ -84,11 +206,50 @@ class BodyIterator:
 
         request_event = cast(HTTPRequestEvent, event)
         body = request_event.get('body', b'')
+        self._bytes_read += len(body)
+        if self._max_size is not None and self._bytes_read > self._max_size:
+            # Stop reading, so no more than the limit is ever buffered.
+            self._more_body = False
+            raise HttpPayloadTooLargeError
         self._more_body = request_event.get('more_body', False)
         return body
 
+    async def start(self) -> None:
+        """Receive the first http.request message"""
+        await self._queue.put(await self._read())
+
+    async def read_ahead(self) -> Any:
+        """Receive the body ahead of the iterator, then the following message.
+
+        The body is queued for the iterator, holding no more than
+        MAX_READ_AHEAD messages, so the disconnect is observed while the
+        handler runs, whether or not it reads the body. Errors receiving the
+        body are raised by the iterator as well as here.
+
+        Returns:
+            Any: The message following the body, typically "http.disconnect".
+        """
+        self._is_reading_ahead = True
+        try:
+            while self._more_body:
+                while self._queue.qsize() >= MAX_READ_AHEAD:
+                    self._drained.clear()
+                    await self._drained.wait()
+                await self._queue.put(await self._read())
+        except HttpDisconnectError as error:
+            await self._queue.put(error)
+            return {'type': 'http.disconnect'}
+        except Exception as error:
+            await self._queue.put(error)
+            raise
+        await self._queue.put(_END_OF_BODY)
+        return await self._receive()
+
     async def flush(self) -> None:
         """Flush all remaining http.request messages"""
+        if self._is_reading_ahead:
+            # The messages are received by `read_ahead`.
+            return
         while self._more_body:
             await self._queue.put(await self._read())
 
@@ -101,13 +262,23 @@ class HttpInstance:
             scope: HTTPScope,
             router: HttpRouter,
             middleware: Iterable[HttpMiddlewareCallback],
-            info: Dict[str, Any]
+            info: Dict[str, Any],
+            *,
+            cancel_on_disconnect: bool = False,
+            deadline: Optional[float] = None,
+            stream_deadline: Optional[float] = None,
+            body_idle_timeout: Optional[float] = None,
+            body_min_rate: Optional[MinimumDataRate] = None,
+            max_body_size: Optional[int] = None,
+            metrics: Optional[HttpMetrics] = None
     ) -> None:
         self.scope = scope
         self.info = info
+        self.metrics = metrics or HttpMetrics()
+        self._is_response_started = False
 
         # Find the route.
-        self.handler, self.matches = router.resolve(
+        self.handler, self.matches, self.route = router.resolve_route(
             scope['method'],
             scope['path']
         )
@@ -119,6 +290,37 @@ class HttpInstance:
                 handler=self.handler
             )
 
+        # The route may override the application settings.
+        self.cancel_on_disconnect: bool = self._route_option(
+            'cancel_on_disconnect',
+            cancel_on_disconnect
+        )
+        self.deadline: Optional[float] = self._route_option(
+            'deadline',
+            deadline
+        )
+        self.stream_deadline: Optional[float] = self._route_option(
+            'stream_deadline',
+            stream_deadline
+        )
+        self.body_idle_timeout: Optional[float] = self._route_option(
+            'body_idle_timeout',
+            body_idle_timeout
+        )
+        self.body_min_rate: Optional[MinimumDataRate] = self._route_option(
+            'body_min_rate',
+            body_min_rate
+        )
+        self.max_body_size: Optional[int] = self._route_option(
+            'max_body_size',
+            max_body_size
+        )
+
+    def _route_option(self, name: str, default: Any) -> Any:
+        if self.route is None:
+            return default
+        return self.route.options.get(name, default)
+
     async def process(
             self,
             receive: ASGIHTTPReceiveCallable,
@@ -127,44 +329,145 @@ class HttpInstance:
 
         LOGGER.debug('Start handling request.')
 
+        start = asyncio.get_running_loop().time()
+
+        body = BodyIterator(
+            receive,
+            idle_timeout=self.body_idle_timeout,
+            min_rate=self.body_min_rate,
+            max_size=self.max_body_size
+        )
+        request = HttpRequest(
+            self.scope,
+            self.info,
+            {},
+            self.matches,
+            body,
+            self.route,
+            None if self.deadline is None else start + self.deadline
+        )
+
         try:
-            request_event = await self._receive_request(receive)
+            if self.max_body_size is not None:
+                # Reject a declared length before any of the body is read.
+                content_length = header.content_length(self.scope['headers'])
+                if (
+                        content_length is not None and
+                        content_length > self.max_body_size
+                ):
+                    raise HttpPayloadTooLargeError
+
+            await body.start()
+
+            if self.cancel_on_disconnect:
+                response, disconnect_task = \
+                    await self._handle_cancellable_request(
+                        body,
+                        request
+                    )
+                if response is None:
+                    return
+            else:
+                response = await self._handle_request(body, request)
+                disconnect_task = None
+
+            await self._send_response(
+                receive,
+                send,
+                request,
+                response,
+                disconnect_task
+            )
+
+        except HttpRequestTimeoutError:
+            # The client is too slow to send the body, so don't wait for it.
+            self.metrics.on_body_timed_out(request)
+            await self._send_rejection(
+                send,
+                HttpResponse(
+                    408,
+                    list(REQUEST_TIMEOUT_HEADERS),
+                    bytes_writer(REQUEST_TIMEOUT_BODY)
+                )
+            )
+
+        except HttpFormError as error:
+            # The rest of the body may not have been read, so the connection
+            # is closed.
+            LOGGER.warning('The request body was malformed: %s', error)
+            await self._send_rejection(
+                send,
+                HttpResponse(
+                    400,
+                    list(BAD_REQUEST_HEADERS),
+                    bytes_writer(BAD_REQUEST_BODY)
+                )
+            )
 
-            response = await self._handle_request(receive, request_event)
+        except HttpPayloadTooLargeError:
+            # The rest of the body is not read, so the connection is closed.
+            LOGGER.warning('The request body exceeded the maximum size.')
+            self.metrics.on_body_too_large(request)
+            await self._send_rejection(
+                send,
+                HttpResponse(
+                    413,
+                    list(PAYLOAD_TOO_LARGE_HEADERS),
+                    bytes_writer(PAYLOAD_TOO_LARGE_BODY)
+                )
+            )
 
-            await self._send_response(receive, send, response)
+        except HttpUnsupportedMediaTypeError:
+            # The body was not read, so the connection is closed.
+            await self._send_rejection(
+                send,
+                HttpResponse(
+                    415,
+                    list(UNSUPPORTED_MEDIA_TYPE_HEADERS),
+                    bytes_writer(UNSUPPORTED_MEDIA_TYPE_BODY)
+                )
+            )
 
         except asyncio.CancelledError:
             pass
 
-    async def _receive_request(
+        finally:
+            # Release resources held by the request, such as a spooled body.
+            await request.close()
+
+    async def _send_rejection(
             self,
-            receive: ASGIHTTPReceiveCallable,
-    ) -> HTTPRequestEvent:
-        event = await receive()
-        if event['type'] != 'http.request':
-            raise HttpInternalError('Expected http.request')
-        return cast(HTTPRequestEvent, event)
+            send: ASGIHTTPSendCallable,
+            response: HttpResponse
+    ) -> None:
+        if self._is_response_started:
+            # A second response cannot be sent. The response is abandoned,
+            # and as it is incomplete the server closes the connection.
+            LOGGER.warning(
+                'Abandoning the response, as it started before the %d error.',
+                response.status
+            )
+            return
+        if self.scope['http_version'] in ('1.0', '1.1'):
+            response.headers = (response.headers or []) + \
+                [CONNECTION_CLOSE_HEADER]
+        await self._send_response_events(send, response)
 
     async def _handle_request(
             self,
-            receive: ASGIHTTPReceiveCallable,
-            request_event: HTTPRequestEvent
+            body: BodyIterator,
+            request: HttpRequest
     ) -> HttpResponse:
-        body = BodyIterator(
-            receive,
-            request_event.get('body', b''),
-            request_event.get('more_body', False)
-        )
-        request = HttpRequest(
-            self.scope,
-            self.info,
-            {},
-            self.matches,
-            body
-        )
-
-        response = await self.handler(request)
+        if request.deadline is None:
+            response = await self.handler(request)
+        else:
+            try:
+                response = await asyncio.wait_for(
+                    self.handler(request),
+                    request.time_remaining
+                )
+            except asyncio.TimeoutError:
+                response = self._timed_out(request)
 
         # Typically the request handler has already processed the request
         # body, but we flush all the "http.request" messages so we can catch
@@ -173,39 +476,123 @@ class HttpInstance:
 
         return response
 
+    async def _handle_cancellable_request(
+            self,
+            body: BodyIterator,
+            request: HttpRequest
+    ) -> Tuple[Optional[HttpResponse], Optional[asyncio.Future]]:
+        # The body is received ahead of the handler, so the disconnect is
+        # observed even when the handler does not read it.
+        handler_task = asyncio.create_task(self.handler(request))
+        disconnect_task = asyncio.create_task(body.read_ahead())
+
+        try:
+            done, _pending = await asyncio.wait(
+                (handler_task, disconnect_task),
+                timeout=request.time_remaining,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            await _cancel_tasks(handler_task, disconnect_task)
+            raise
+
+        is_timed_out = not done
+        if is_timed_out:
+            await _cancel_tasks(handler_task)
+
+        is_abandoned = disconnect_task.done() or (
+            not handler_task.cancelled() and
+            isinstance(handler_task.exception(), HttpDisconnectError)
+        )
+        if not is_abandoned:
+            try:
+                response = (
+                    self._timed_out(request)
+                    if is_timed_out
+                    else handler_task.result()
+                )
+                await body.flush()
+            except:  # pylint: disable=bare-except
+                await _cancel_tasks(disconnect_task)
+                raise
+            return response, disconnect_task
+
+        await _cancel_tasks(handler_task)
+        if disconnect_task.done():
+            event = disconnect_task.result()
+            if event['type'] != 'http.disconnect':
+                raise HttpInternalError(
+                    f'Unexpected request type "{event["type"]}"'
+                )
+        else:
+            await _cancel_tasks(disconnect_task)
+
+        LOGGER.debug('Client disconnected, abandoning request.')
+        self.metrics.on_abandoned(request)
+        return None, None
+
+    def _timed_out(self, request: HttpRequest) -> HttpResponse:
+        LOGGER.warning('The request handler exceeded the deadline.')
+        self.metrics.on_timed_out(request)
+        return HttpResponse(
+            504,
+            list(GATEWAY_TIMEOUT_HEADERS),
+            bytes_writer(GATEWAY_TIMEOUT_BODY)
+        )
+
     async def _send_response(
             self,
             receive: ASGIHTTPReceiveCallable,
             send: ASGIHTTPSendCallable,
-            response: HttpResponse
+            request: HttpRequest,
+            response: HttpResponse,
+            receive_task: Optional[asyncio.Future] = None
     ) -> None:
+        loop = asyncio.get_running_loop()
+        stream_deadline = (
+            None if self.stream_deadline is None
+            else loop.time() + self.stream_deadline
+        )
+
         send_task = asyncio.create_task(
             self._send_response_events(send, response)
         )
-        receive_task = asyncio.create_task(receive())
+        if receive_task is None:
+            receive_task = asyncio.create_task(receive())
         pending: Set[asyncio.Future] = {send_task, receive_task}
 
         is_connected = True
 
         while is_connected:
 
+            timeout = (
+                max(0.0, stream_deadline - loop.time())
+                if stream_deadline is not None and send_task in pending
+                else None
+            )
             done, pending = await asyncio.wait(
                 pending,
+                timeout=timeout,
                 return_when=asyncio.FIRST_COMPLETED
             )
 
+            if not done:
+                # Abandon the response. As it is incomplete the server will
+                # close the connection rather than end the body cleanly.
+                LOGGER.warning('Streaming the response exceeded the deadline.')
+                await _cancel_tasks(*pending)
+                self.metrics.on_stream_timed_out(request)
+                return
+
             if receive_task in done:
+                # Cancel the send, even if it has finished with an error,
+                # before fetching the result raises any error receiving the
+                # request body.
+                await _cancel_tasks(send_task)
+
                 event = receive_task.result()
                 LOGGER.debug('Received event type "%s".', event)
 
-                # Cancel pending tasks.
-                for task in pending:
-                    try:
-                        task.cancel()
-                        await task
-                    except:  # pylint: disable=bare-except
-                        pass
-
                 # Check for abnormal disconnection.
                 if event['type'] != 'http.disconnect':
                     raise HttpInternalError(
@@ -216,6 +603,8 @@ class HttpInstance:
 
                 is_connected = False
             elif send_task in done:
+                if send_task.exception() is not None:
+                    await _cancel_tasks(receive_task)
                 # Fetch result to trigger possible exceptions
                 send_task.result()
 
@@ -250,6 +639,7 @@ class HttpInstance:
         }
 
         LOGGER.debug('Sending "http.response.start" with status "%s".', status)
+        self._is_response_started = True
         await send(response_start_event)
 
     async def _send_response_push_event(
@@ -0,0 +1,354 @@
+"""Incremental decoding of JSON arrays"""
+
+import codecs
+import re
+from json import JSONDecodeError, JSONDecoder
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .http_errors import HttpFormError, HttpPayloadTooLargeError
+
+_WHITESPACE = ' \t\n\r'
+# The characters which change the nesting of a value, inside and outside of
+# strings, and the characters which end a number or literal.
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[ \t\n\r,\]}]')
+
+DEFAULT_MAX_ITEM_SIZE = 1024 * 1024
+
+(
+    _KEY, _COLON, _VALUE, _SKIP, _NEXT_KEY, _FIRST_ITEM, _ITEM, _NEXT_ITEM,
+    _DONE
+) = range(9)
+
+
+class JsonArrayParser:
+    """An incremental parser for the elements of a JSON array.
+
+    The array is either the whole document, or is found by following a path
+    of object keys. Chunks of text are fed to the parser, which returns the
+    elements they complete. Only the element being received is buffered.
+
+    The brackets, strings and escapes of a value are scanned as its text
+    arrives, and it is only decoded when it is complete, so each character is
+    examined a fixed number of times however the value is split into chunks.
+    Values of other keys on the path are scanned and discarded without being
+    buffered, and anything after the array is ignored.
+    """
+
+    def __init__(
+            self,
+            path: Sequence[str] = (),
+            max_item_size: Optional[int] = DEFAULT_MAX_ITEM_SIZE
+    ) -> None:
+        """Construct the parser.
+
+        Args:
+            path (Sequence[str], optional): The keys of the objects containing
+                the array. Defaults to (), for a top level array.
+            max_item_size (Optional[int], optional): The maximum size in
+                characters of an element or key, or None for no limit.
+                Defaults to 1 MiB.
+        """
+        self.path = path
+        self.max_item_size = max_item_size
+        self._decoder = JSONDecoder()
+        self._buffer = ''
+        self._depth = 0
+        self._state = _VALUE
+        self._is_final = False
+        # The state of the scan of a partially received value.
+        self._is_scalar: Optional[bool] = None
+        self._scanned = 0
+        self._nesting = 0
+        self._in_string = False
+        self._is_escaped = False
+        self._held: List[str] = []
+        self._is_path_key = False
+
+    @property
+    def is_complete(self) -> bool:
+        """True when the end of the array, or of the document, was reached.
+
+        Returns:
+            bool: True if no more elements will be returned.
+        """
+        return self._state == _DONE
+
+    def _skip_whitespace(self, pos: int) -> Optional[int]:
+        buf = self._buffer
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        return pos if pos < len(buf) else None
+
+    def _expect(self, pos: int, expected: str) -> Optional[int]:
+        start = self._skip_whitespace(pos)
+        if start is None:
+            return None
+        if self._buffer[start] not in expected:
+            raise JSONDecodeError(
+                f'Expecting one of "{expected}"',
+                self._buffer,
+                start
+            )
+        return start
+
+    def _scan_nested(self, pos: int) -> Optional[int]:
+        buf = self._buffer
+        if self._is_escaped:
+            if pos >= len(buf):
+                return None
+            pos += 1
+            self._is_escaped = False
+        while True:
+            pattern = _STRING_SPECIAL if self._in_string else _STRUCTURAL
+            match = pattern.search(buf, pos)
+            if match is None:
+                return None
+            char, pos = match.group(), match.end()
+            if self._in_string:
+                if char == '\\':
+                    if pos >= len(buf):
+                        self._is_escaped = True
+                        return None
+                    pos += 1
+                else:
+                    self._in_string = False
+                    if self._nesting == 0:
+                        return pos
+            elif char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._nesting += 1
+            else:
+                self._nesting -= 1
+                if self._nesting <= 0:
+                    return pos
+
+    def _scan_scalar(self, pos: int) -> Optional[int]:
+        # A number or literal at the end of the buffer may continue in the
+        # next chunk.
+        match = _SCALAR_END.search(self._buffer, pos)
+        if match is not None:
+            return match.start()
+        return len(self._buffer) if self._is_final else None
+
+    def _scan(self, pos: int, is_kept: bool) -> Optional[Tuple[int, int]]:
+        # Find the start and end of a value in the buffer. When the value is
+        # incomplete the text scanned so far is moved out of the buffer, to
+        # the held text if it is kept, so it is not copied again as further
+        # chunks arrive. The value then resumes at the start of the buffer.
+        if self._is_scalar is None:
+            start = self._skip_whitespace(pos)
+            if start is None:
+                return None
+            self._is_scalar = self._buffer[start] not in '[{"'
+        else:
+            start = pos
+
+        end = (
+            self._scan_scalar(start) if self._is_scalar
+            else self._scan_nested(start)
+        )
+        size = self._scanned + (len(self._buffer) if end is None else end)
+        size -= start
+        if (
+                is_kept and
+                self.max_item_size is not None and
+                size > self.max_item_size
+        ):
+            raise HttpPayloadTooLargeError
+
+        if end is None:
+            self._scanned = size
+            if is_kept:
+                self._held.append(self._buffer[start:])
+            self._buffer = ''
+            return None
+
+        self._is_scalar = None
+        self._scanned = self._nesting = 0
+        self._in_string = False
+        return start, end
+
+    def _decode_value(self, pos: int) -> Optional[Tuple[Any, int]]:
+        scanned = self._scan(pos, True)
+        if scanned is None:
+            return None
+        start, end = scanned
+        if self._held:
+            text = ''.join(self._held) + self._buffer[:end]
+            self._held.clear()
+            value, value_end = self._decoder.raw_decode(text)
+            is_complete = value_end == len(text)
+        else:
+            value, value_end = self._decoder.raw_decode(self._buffer, start)
+            is_complete = value_end == end
+        if not is_complete:
+            raise JSONDecodeError('Extra data', self._buffer, end)
+        return value, end
+
+    def _skip_value(self, pos: int) -> Optional[int]:
+        scanned = self._scan(pos, False)
+        return None if scanned is None else scanned[1]
+
+    def _step(self, pos: int, items: List[Any]) -> Optional[int]:
+        # pylint: disable=too-many-return-statements
+        state = self._state
+
+        if state == _VALUE:
+            is_array = self._depth == len(self.path)
+            start = self._expect(pos, '[' if is_array else '{')
+            if start is None:
+                return None
+            self._state = _FIRST_ITEM if is_array else _KEY
+            return start + 1
+
+        if state in (_KEY, _NEXT_KEY):
+            if self._is_scalar is not None:
+                # The rest of a partially received key.
+                start = pos
+            else:
+                start = self._expect(pos, '"}' if state == _KEY else ',}')
+            if start is None:
+                return None
+            if self._is_scalar is None and self._buffer[start] == '}':
+                # The key is not in the object.
+                self._state = _DONE
+                return start + 1
+            if state == _NEXT_KEY:
+                self._state = _KEY
+                return start + 1
+            decoded = self._decode_value(start)
+            if decoded is None:
+                return None
+            key, end = decoded
+            self._is_path_key = key == self.path[self._depth]
+            self._state = _COLON
+            return end
+
+        if state == _COLON:
+            start = self._expect(pos, ':')
+            if start is None:
+                return None
+            if self._is_path_key:
+                self._state = _VALUE
+                self._depth += 1
+            else:
+                self._state = _SKIP
+            return start + 1
+
+        if state == _SKIP:
+            skipped_end = self._skip_value(pos)
+            if skipped_end is None:
+                return None
+            self._state = _NEXT_KEY
+            return skipped_end
+
+        if state in (_FIRST_ITEM, _NEXT_ITEM):
+            start = (
+                self._skip_whitespace(pos) if state == _FIRST_ITEM
+                else self._expect(pos, ',]')
+            )
+            if start is None:
+                return None
+            if self._buffer[start] == ']':
+                self._state = _DONE
+                return start + 1
+            self._state = _ITEM
+            return start if state == _FIRST_ITEM else start + 1
+
+        if state == _ITEM:
+            decoded = self._decode_value(pos)
+            if decoded is None:
+                return None
+            value, end = decoded
+            items.append(value)
+            self._state = _NEXT_ITEM
+            return end
+
+        return None
+
+    def feed(self, text: str, is_final: bool = False) -> List[Any]:
+        """Feed a chunk of text to the parser.
+
+        Args:
+            text (str): The chunk.
+            is_final (bool, optional): True if this is the last chunk.
+                Defaults to False.
+
+        Raises:
+            JSONDecodeError: If the document is malformed.
+            HttpPayloadTooLargeError: If an element is too large.
+
+        Returns:
+            List[Any]: The elements completed by the chunk.
+        """
+        self._buffer += text
+        self._is_final = is_final
+        items: List[Any] = []
+        consumed = 0
+        while self._state != _DONE:
+            pos = self._step(consumed, items)
+            if pos is None:
+                break
+            consumed = pos
+        self._buffer = self._buffer[consumed:] if self._state != _DONE else ''
+
+        if is_final and self._state != _DONE:
+            raise JSONDecodeError(
+                'Unexpected end of document',
+                self._buffer,
+                len(self._buffer)
+            )
+        return items
+
+
+async def parse_json_items(
+        body: AsyncIterable[bytes],
+        path: Sequence[str] = (),
+        *,
+        max_item_size: Optional[int] = DEFAULT_MAX_ITEM_SIZE,
+        encoding: str = 'utf-8'
+) -> AsyncIterator[Any]:
+    """Decode the elements of a JSON array as the body arrives.
+
+    Args:
+        body (AsyncIterable[bytes]): The body.
+        path (Sequence[str], optional): The keys of the objects containing
+            the array. Defaults to (), for a top level array.
+        max_item_size (Optional[int], optional): The maximum size in
+            characters of an element or key, or None for no limit. Defaults
+            to 1 MiB.
+        encoding (str, optional): The encoding of the body. Defaults to
+            'utf-8'.
+
+    Raises:
+        HttpFormError: If the body is malformed.
+        HttpPayloadTooLargeError: If an element is too large.
+
+    Yields:
+        Any: The elements of the array.
+    """
+    parser = JsonArrayParser(path, max_item_size)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        async for chunk in body:
+            for item in parser.feed(decoder.decode(chunk)):
+                yield item
+            if parser.is_complete:
+                return
+        for item in parser.feed(decoder.decode(b'', True), True):
+            yield item
+    except JSONDecodeError as error:
+        raise HttpFormError(f'Malformed JSON: {error}') from error
+    except UnicodeDecodeError as error:
+        raise HttpFormError('Invalid encoding') from error
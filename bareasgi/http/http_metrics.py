@@ -0,0 +1,70 @@
+"""The http metrics"""
+
+from typing import Dict, Optional
+
+from .http_request import HttpRequest
+
+
+class HttpMetrics:
+    """Counters for HTTP requests which did not complete normally.
+
+    The counters are keyed by the path template of the matched route, or None
+    if no route was matched. To forward the events to a monitoring system,
+    subclass and override the `on_*` hooks.
+    """
+
+    def __init__(self) -> None:
+        self.abandoned: Dict[Optional[str], int] = {}
+        self.timed_out: Dict[Optional[str], int] = {}
+        self.stream_timed_out: Dict[Optional[str], int] = {}
+        self.body_timed_out: Dict[Optional[str], int] = {}
+        self.body_too_large: Dict[Optional[str], int] = {}
+
+    @classmethod
+    def _increment(
+            cls,
+            counters: Dict[Optional[str], int],
+            request: HttpRequest
+    ) -> None:
+        path = request.route.path if request.route is not None else None
+        counters[path] = counters.get(path, 0) + 1
+
+    def on_abandoned(self, request: HttpRequest) -> None:
+        """Called when the client disconnects before the handler completes.
+
+        Args:
+            request (HttpRequest): The abandoned request.
+        """
+        self._increment(self.abandoned, request)
+
+    def on_timed_out(self, request: HttpRequest) -> None:
+        """Called when the handler exceeds the deadline of the request.
+
+        Args:
+            request (HttpRequest): The request which timed out.
+        """
+        self._increment(self.timed_out, request)
+
+    def on_stream_timed_out(self, request: HttpRequest) -> None:
+        """Called when streaming the response body exceeds the deadline.
+
+        Args:
+            request (HttpRequest): The request whose response timed out.
+        """
+        self._increment(self.stream_timed_out, request)
+
+    def on_body_timed_out(self, request: HttpRequest) -> None:
+        """Called when the request body is received too slowly.
+
+        Args:
+            request (HttpRequest): The request which was aborted.
+        """
+        self._increment(self.body_timed_out, request)
+
+    def on_body_too_large(self, request: HttpRequest) -> None:
+        """Called when the request body exceeds the maximum size.
+
+        Args:
+            request (HttpRequest): The request which was rejected.
+        """
+        self._increment(self.body_too_large, request)
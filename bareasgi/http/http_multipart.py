@@ -0,0 +1,388 @@
+"""Streaming multipart/form-data support"""
+
+import asyncio
+import os
+import re
+from tempfile import NamedTemporaryFile
+from typing import (
+    IO,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
+
+from .http_errors import HttpFormError, HttpPayloadTooLargeError
+
+_HEADER_PARAMETER = re.compile(
+    rb';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)'
+)
+_QUOTED_PAIR = re.compile(rb'\\(.)')
+
+_PREAMBLE, _AFTER_DELIMITER, _HEADERS, _DATA, _EPILOGUE = range(5)
+
+# The events made by the parser.
+PART_START, PART_DATA, PART_END = range(3)
+MultipartEvent = Tuple[int, Any]
+
+
+def parse_header_value(value: bytes) -> Tuple[bytes, Dict[bytes, bytes]]:
+    """Parse a header value with parameters, e.g. a content-disposition.
+
+    Unlike the bareutils parsers, quoted parameter values may contain `;`.
+
+    Args:
+        value (bytes): The header value.
+
+    Returns:
+        Tuple[bytes, Dict[bytes, bytes]]: The value, and its parameters keyed
+            by their lower case names.
+    """
+    main_value, sep, _ = value.partition(b';')
+    parameters: Dict[bytes, bytes] = {}
+    if sep:
+        for match in _HEADER_PARAMETER.finditer(value, len(main_value)):
+            name, parameter = match.group(1), match.group(2).strip()
+            if parameter[:1] == b'"':
+                parameter = _QUOTED_PAIR.sub(rb'\1', parameter[1:-1])
+            parameters[name.lower()] = parameter
+    return main_value.strip().lower(), parameters
+
+
+class MultipartParser:
+    """An incremental multipart parser.
+
+    Chunks of the body are fed to the parser, which returns the events they
+    complete. The parser holds at most one part header block, and a tail the
+    length of the delimiter, so its memory does not grow with the body.
+    """
+
+    def __init__(self, boundary: bytes, max_header_size: int = 16384) -> None:
+        """Construct the parser.
+
+        Args:
+            boundary (bytes): The boundary from the content-type.
+            max_header_size (int, optional): The maximum size of the headers
+                of a part. Defaults to 16384.
+        """
+        if not boundary:
+            raise HttpFormError('The multipart boundary is missing')
+        self.max_header_size = max_header_size
+        self._delimiter = b'\r\n--' + boundary
+        # The first boundary is not preceded by a line break, so one is added
+        # to match it with the same delimiter.
+        self._buffer = bytearray(b'\r\n')
+        self._state = _PREAMBLE
+
+    @property
+    def is_complete(self) -> bool:
+        """True when the closing boundary has been read.
+
+        Returns:
+            bool: True if the multipart body is complete.
+        """
+        return self._state == _EPILOGUE
+
+    def feed(self, data: bytes) -> List[MultipartEvent]:
+        """Feed a chunk of the body to the parser.
+
+        Args:
+            data (bytes): The chunk.
+
+        Raises:
+            HttpFormError: If the body is malformed.
+
+        Returns:
+            List[MultipartEvent]: The events completed by the chunk.
+        """
+        buf = self._buffer
+        buf += data
+        events: List[MultipartEvent] = []
+        delimiter = self._delimiter
+        # The part of the buffer which may be the start of a delimiter.
+        tail = len(delimiter) - 1
+
+        while True:
+            if self._state == _PREAMBLE:
+                index = buf.find(delimiter)
+                if index == -1:
+                    del buf[:max(0, len(buf) - tail)]
+                    break
+                del buf[:index + len(delimiter)]
+                self._state = _AFTER_DELIMITER
+
+            elif self._state == _AFTER_DELIMITER:
+                # Transport padding may follow the delimiter.
+                end = buf.find(b'\r\n')
+                if buf[:2] == b'--':
+                    self._state = _EPILOGUE
+                    buf.clear()
+                    break
+                if end == -1:
+                    if len(buf) > self.max_header_size:
+                        raise HttpFormError('Malformed multipart boundary')
+                    break
+                if buf[:end].strip(b' \t'):
+                    raise HttpFormError('Malformed multipart boundary')
+                del buf[:end + 2]
+                self._state = _HEADERS
+
+            elif self._state == _HEADERS:
+                if buf[:2] == b'\r\n':
+                    end, headers = 0, []
+                else:
+                    end = buf.find(b'\r\n\r\n')
+                    if end == -1:
+                        if len(buf) > self.max_header_size:
+                            raise HttpFormError('Part headers too long')
+                        break
+                    headers = self._parse_headers(bytes(buf[:end]))
+                del buf[:end + 2 if end == 0 else end + 4]
+                events.append((PART_START, headers))
+                self._state = _DATA
+
+            elif self._state == _DATA:
+                index = buf.find(delimiter)
+                if index == -1:
+                    end = len(buf) - tail
+                    if end > 0:
+                        events.append((PART_DATA, bytes(buf[:end])))
+                        del buf[:end]
+                    break
+                if index:
+                    events.append((PART_DATA, bytes(buf[:index])))
+                del buf[:index + len(delimiter)]
+                events.append((PART_END, None))
+                self._state = _AFTER_DELIMITER
+
+            else:
+                # The epilogue is ignored.
+                buf.clear()
+                break
+
+        return events
+
+    def close(self) -> None:
+        """Signal the end of the body.
+
+        Raises:
+            HttpFormError: If the closing boundary was not read.
+        """
+        if self._state != _EPILOGUE:
+            raise HttpFormError('The multipart body is incomplete')
+
+    @classmethod
+    def _parse_headers(cls, data: bytes) -> List[Tuple[bytes, bytes]]:
+        headers: List[Tuple[bytes, bytes]] = []
+        for line in data.split(b'\r\n'):
+            name, sep, value = line.partition(b':')
+            if not sep:
+                raise HttpFormError('Malformed part header')
+            headers.append((name.strip().lower(), value.strip()))
+        return headers
+
+
+class FormField:
+    """A form field held in memory"""
+
+    def __init__(
+            self,
+            name: str,
+            value: str,
+            headers: List[Tuple[bytes, bytes]]
+    ) -> None:
+        """Construct the form field.
+
+        Args:
+            name (str): The name of the field.
+            value (str): The value of the field.
+            headers (List[Tuple[bytes, bytes]]): The headers of the part.
+        """
+        self.name = name
+        self.value = value
+        self.headers = headers
+
+    def __repr__(self) -> str:
+        return f'FormField({self.name!r}, {self.value!r})'
+
+
+class FormFile:
+    """An uploaded file written to disk.
+
+    The file is not removed when the request completes; it should be moved
+    or removed by the handler.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            filename: str,
+            content_type: bytes,
+            path: str,
+            size: int,
+            headers: List[Tuple[bytes, bytes]]
+    ) -> None:
+        """Construct the form file.
+
+        Args:
+            name (str): The name of the field.
+            filename (str): The file name sent by the client. This should not
+                be trusted as a path.
+            content_type (bytes): The content type of the file.
+            path (str): The path of the file on disk.
+            size (int): The size of the file in bytes.
+            headers (List[Tuple[bytes, bytes]]): The headers of the part.
+        """
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = size
+        self.headers = headers
+
+    def __repr__(self) -> str:
+        return f'FormFile({self.name!r}, {self.filename!r}, {self.path!r})'
+
+
+FormPart = Union[FormField, FormFile]
+
+
+def _open_file(directory: Optional[str]) -> IO[bytes]:
+    return NamedTemporaryFile(  # pylint: disable=consider-using-with
+        dir=directory,
+        delete=False
+    )
+
+
+def _discard_file(file: IO[bytes]) -> None:
+    file.close()
+    os.remove(file.name)
+
+
+async def parse_multipart(
+        body: AsyncIterable[bytes],
+        boundary: bytes,
+        *,
+        max_field_size: int = 65536,
+        max_file_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_parts: int = 1000,
+        directory: Optional[str] = None
+) -> AsyncIterator[FormPart]:
+    """Parse a multipart/form-data body as it arrives.
+
+    Fields are yielded as they complete. File parts are written to temporary
+    files in `directory` from the default executor, so neither the event loop
+    nor memory is held up by large uploads.
+
+    Args:
+        body (AsyncIterable[bytes]): The body.
+        boundary (bytes): The boundary from the content-type.
+        max_field_size (int, optional): The maximum size of a field held in
+            memory. Defaults to 65536.
+        max_file_size (Optional[int], optional): The maximum size of a file.
+            Defaults to None.
+        max_size (Optional[int], optional): The maximum size of the body.
+            Defaults to None.
+        max_parts (int, optional): The maximum number of parts. Defaults to
+            1000.
+        directory (Optional[str], optional): The directory for uploaded files,
+            or None for the system temporary directory. Defaults to None.
+
+    Raises:
+        HttpFormError: If the body is malformed or has too many parts.
+        HttpPayloadTooLargeError: If a size limit is exceeded.
+
+    Yields:
+        FormPart: The fields and files of the form.
+    """
+    loop = asyncio.get_running_loop()
+    parser = MultipartParser(boundary)
+    part_count = total_size = 0
+    headers: List[Tuple[bytes, bytes]] = []
+    name = filename = ''
+    content_type = b''
+    field_data = bytearray()
+    file: Optional[IO[bytes]] = None
+    part_size = 0
+
+    try:
+        async for chunk in body:
+            total_size += len(chunk)
+            if max_size is not None and total_size > max_size:
+                raise HttpPayloadTooLargeError
+
+            for event, value in parser.feed(chunk):
+                if event == PART_START:
+                    part_count += 1
+                    if part_count > max_parts:
+                        raise HttpFormError('Too many form parts')
+                    headers = value
+                    disposition, parameters = parse_header_value(
+                        dict(headers).get(b'content-disposition', b'')
+                    )
+                    if (
+                            disposition != b'form-data' or
+                            b'name' not in parameters
+                    ):
+                        raise HttpFormError('Missing form-data disposition')
+                    name = parameters[b'name'].decode('utf-8', 'replace')
+                    content_type = dict(headers).get(b'content-type', b'')
+                    part_size = 0
+                    if b'filename' in parameters:
+                        filename = parameters[b'filename'].decode(
+                            'utf-8',
+                            'replace'
+                        )
+                        file = await loop.run_in_executor(
+                            None,
+                            _open_file,
+                            directory
+                        )
+
+                elif event == PART_DATA:
+                    part_size += len(value)
+                    if file is None:
+                        if part_size > max_field_size:
+                            raise HttpPayloadTooLargeError
+                        field_data += value
+                    else:
+                        if (
+                                max_file_size is not None and
+                                part_size > max_file_size
+                        ):
+                            raise HttpPayloadTooLargeError
+                        await loop.run_in_executor(None, file.write, value)
+
+                elif file is not None:
+                    await loop.run_in_executor(None, file.close)
+                    path, file = file.name, None
+                    yield FormFile(
+                        name,
+                        filename,
+                        content_type,
+                        path,
+                        part_size,
+                        headers
+                    )
+
+                else:
+                    _, parameters = parse_header_value(content_type)
+                    charset = parameters.get(b'charset', b'utf-8')
+                    try:
+                        value = field_data.decode(charset.decode('ascii'))
+                    except (LookupError, UnicodeDecodeError) as error:
+                        raise HttpFormError('Invalid encoding') from error
+                    field_data.clear()
+                    yield FormField(name, value, headers)
+
+        parser.close()
+
+    finally:
+        if file is not None:
+            # The upload was abandoned part way through.
+            await loop.run_in_executor(None, _discard_file, file)
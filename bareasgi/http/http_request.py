@@ -1,10 +1,67 @@
 """The http request"""
 
-from json import loads
-from typing import Any, AsyncIterable, Callable, Dict, Mapping
+import asyncio
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union
+)
 
 from asgi_typing import HTTPScope
-from bareutils import header, bytes_reader, text_reader
+from bareutils import header
+
+from .http_codecs import CodecRegistry, current_codecs
+from .http_errors import HttpFormError, HttpUnsupportedMediaTypeError
+from .http_json_stream import DEFAULT_MAX_ITEM_SIZE, parse_json_items
+from .http_multipart import FormPart, parse_header_value, parse_multipart
+from .http_route import HttpRoute
+from .http_urlencoded import parse_urlencoded
+from .http_spooled_body import SpooledBody
+from .http_tee_body import TeeBody
+
+# The largest buffer allocated up front from a declared content-length. A
+# larger body grows the buffer as it arrives, so a client cannot make the
+# server reserve memory it never sends.
+MAX_PREALLOCATED_BODY = 16 * 1024 * 1024
+
+# The context key of the callbacks run when the request is complete. The
+# context is shared by the requests a middleware makes from the original.
+_CLOSE_CALLBACKS = 'bareasgi.close_callbacks'
+
+
+async def _join_body(body: AsyncIterable[bytes]) -> bytes:
+    chunks: List[bytes] = []
+    async for chunk in body:
+        chunks.append(chunk)
+    # A single chunk is returned as is, otherwise it is joined once.
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+async def _aggregate_body(
+        body: AsyncIterable[bytes],
+        content_length: Optional[int]
+) -> Union[bytes, bytearray]:
+    if content_length is None:
+        return await _join_body(body)
+
+    buf = bytearray(min(content_length, MAX_PREALLOCATED_BODY))
+    offset = 0
+    async for chunk in body:
+        end = offset + len(chunk)
+        # Copies in place while the chunk fits, and grows the buffer if not.
+        buf[offset:end] = chunk
+        offset = end
+    if offset < len(buf):
+        del buf[offset:]
+    return buf
 
 
 class HttpRequest:
@@ -16,7 +73,9 @@ class HttpRequest:
             info: Dict[str, Any],
             context: Dict[str, Any],
             matches: Mapping[str, Any],
-            body: AsyncIterable[bytes]
+            body: AsyncIterable[bytes],
+            route: Optional[HttpRoute] = None,
+            deadline: Optional[float] = None
     ) -> None:
         """An HTTP request.
 
@@ -27,12 +86,19 @@ class HttpRequest:
                 requests.
             matches (Mapping[str, Any]): Matches made by the router.
             body (AsyncIterable[bytes]): The body.
+            route (Optional[HttpRoute], optional): The route matched by the
+                router, if known. Defaults to None.
+            deadline (Optional[float], optional): The event loop time by which
+                the handler must complete, if any. Defaults to None.
         """
         self.scope = scope
         self.info = info
         self.context = context
         self.matches = matches
         self.body = body
+        self.route = route
+        self.deadline = deadline
+        self._form: Optional[Dict[str, List[str]]] = None
 
     @property
     def url(self) -> str:
@@ -47,6 +113,298 @@ class HttpRequest:
         path = self.scope['path']
         return f"{scheme}://{host.decode()}{path}"
 
+    @property
+    def codecs(self) -> CodecRegistry:
+        """The codecs of the application handling the request.
+
+        Returns:
+            CodecRegistry: The codec registry.
+        """
+        return current_codecs()
+
+    @property
+    def time_remaining(self) -> Optional[float]:
+        """The time remaining before the deadline of the request.
+
+        This can be used as the timeout of downstream calls, so they share the
+        budget of the request.
+
+        Returns:
+            Optional[float]: The number of seconds remaining, or None if the
+                request has no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - asyncio.get_running_loop().time())
+
+    def on_close(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a callback to release a resource of the request, such
+        as a temporary file, once the response has been sent.
+
+        Args:
+            callback (Callable[[], Awaitable[None]]): The callback.
+        """
+        self.context.setdefault(_CLOSE_CALLBACKS, []).append(callback)
+
+    async def close(self) -> None:
+        """Run the close callbacks, most recently registered first.
+
+        This is called when the response has been sent.
+        """
+        callbacks = self.context.pop(_CLOSE_CALLBACKS, [])
+        for callback in reversed(callbacks):
+            await callback()
+
+    async def spool(
+            self,
+            max_memory: int = 1024 * 1024,
+            chunk_size: int = 64 * 1024
+    ) -> SpooledBody:
+        """Read the body into a seekable, re-readable store.
+
+        The body is kept in memory up to `max_memory` bytes, and is then moved
+        to a temporary file. The body of the request is replaced by the
+        spooled body, so it may be read any number of times, and subsequent
+        calls return the same store. The store is closed, and any temporary
+        file removed, once the response has been sent.
+
+        Args:
+            max_memory (int, optional): The number of bytes held in memory
+                before the body is moved to disk. Defaults to 1 MiB.
+            chunk_size (int, optional): The size of the chunks yielded when
+                the body is read. Defaults to 64 KiB.
+
+        Returns:
+            SpooledBody: The spooled body.
+        """
+        if isinstance(self.body, SpooledBody):
+            return self.body
+
+        spooled_body = SpooledBody(max_memory, chunk_size)
+        self.on_close(spooled_body.close)
+        async for chunk in self.body:
+            await spooled_body.write(chunk)
+        self.body = spooled_body
+        return spooled_body
+
+    def tee(self, max_size: Optional[int] = None) -> TeeBody:
+        """Make the body readable by more than one reader.
+
+        The body is buffered in memory as it is read, so middleware can
+        inspect it, e.g. to check a signature, and the handler can still read
+        it. The body of the request is replaced by the tee, and subsequent
+        calls return the same tee. Bodies which are only read once need not
+        call this, and are streamed without buffering.
+
+        This must be called before a middleware which wraps the body, such as
+        the compression middleware, creates a new request.
+
+        Args:
+            max_size (Optional[int], optional): The maximum number of bytes
+                to buffer, or None for no limit. Defaults to None.
+
+        Returns:
+            TeeBody: The tee body.
+        """
+        if not isinstance(self.body, TeeBody):
+            self.body = TeeBody(self.body, max_size)
+        return self.body
+
+    def multipart(
+            self,
+            *,
+            max_field_size: int = 65536,
+            max_file_size: Optional[int] = None,
+            max_size: Optional[int] = None,
+            max_parts: int = 1000,
+            directory: Optional[str] = None
+    ) -> AsyncIterator[FormPart]:
+        """Stream the parts of a multipart/form-data body.
+
+        Fields are held in memory, and files are written to disk as they
+        arrive, so memory use does not grow with the size of an upload.
+
+        ```python
+        async for part in request.multipart(max_file_size=10_000_000):
+            if isinstance(part, FormFile):
+                uploads[part.name] = part.path
+            else:
+                fields[part.name] = part.value
+        ```
+
+        This function consumes the body.
+
+        Args:
+            max_field_size (int, optional): The maximum size of a field held
+                in memory. Defaults to 65536.
+            max_file_size (Optional[int], optional): The maximum size of a
+                file. Defaults to None.
+            max_size (Optional[int], optional): The maximum size of the body.
+                Defaults to None.
+            max_parts (int, optional): The maximum number of parts. Defaults
+                to 1000.
+            directory (Optional[str], optional): The directory for uploaded
+                files, or None for the system temporary directory. Defaults to
+                None.
+
+        Raises:
+            HttpFormError: If the request is not multipart/form-data.
+
+        Returns:
+            AsyncIterator[FormPart]: The fields and files of the form.
+        """
+        media_type, parameters = parse_header_value(
+            header.find(b'content-type', self.scope['headers']) or b''
+        )
+        if media_type != b'multipart/form-data':
+            raise HttpFormError('The content type is not multipart/form-data')
+        return parse_multipart(
+            self.body,
+            parameters.get(b'boundary', b''),
+            max_field_size=max_field_size,
+            max_file_size=max_file_size,
+            max_size=max_size,
+            max_parts=max_parts,
+            directory=directory
+        )
+
+    async def form(
+            self,
+            *,
+            max_fields: int = 1000,
+            max_field_size: int = 65536,
+            max_size: Optional[int] = None,
+            encoding: str = 'utf-8'
+    ) -> Dict[str, List[str]]:
+        """Return the fields of an application/x-www-form-urlencoded body.
+
+        The fields are decoded as the body arrives, without first reading the
+        whole body. The result is kept, so subsequent calls return the same
+        fields. Unlike `urllib.parse.parse_qs`, fields with blank values are
+        kept.
+
+        ```python
+        form = await request.form()
+        first_name = form['firstname'][0]
+        ```
+
+        This function consumes the body.
+
+        Args:
+            max_fields (int, optional): The maximum number of fields. Defaults
+                to 1000.
+            max_field_size (int, optional): The maximum size in bytes of an
+                encoded field. Defaults to 65536.
+            max_size (Optional[int], optional): The maximum size of the body.
+                Defaults to None.
+            encoding (str, optional): The encoding of the names and values.
+                Defaults to 'utf-8'.
+
+        Raises:
+            HttpFormError: If the body is not urlencoded, or has too many
+                fields.
+
+        Returns:
+            Dict[str, List[str]]: The values of the fields keyed by name.
+        """
+        if self._form is None:
+            media_type, _ = parse_header_value(
+                header.find(b'content-type', self.scope['headers']) or b''
+            )
+            if media_type != b'application/x-www-form-urlencoded':
+                raise HttpFormError(
+                    'The content type is not application/x-www-form-urlencoded'
+                )
+            self._form = await parse_urlencoded(
+                self.body,
+                max_fields=max_fields,
+                max_field_size=max_field_size,
+                max_size=max_size,
+                encoding=encoding
+            )
+        return self._form
+
+    def json_items(
+            self,
+            path: Sequence[str] = (),
+            *,
+            max_item_size: Optional[int] = DEFAULT_MAX_ITEM_SIZE,
+            encoding: str = 'utf-8'
+    ) -> AsyncIterator[Any]:
+        """Stream the elements of a JSON array in the body.
+
+        The elements are decoded as the body arrives, so a large upload can
+        be processed while it is in flight, and only the element being
+        received is held in memory. The array is either the whole body, or is
+        found by following a path of object keys.
+
+        ```python
+        # The body is {"meta": {...}, "data": {"rows": [...]}}
+        async for row in request.json_items(('data', 'rows')):
+            await database.insert(row)
+        ```
+
+        The elements are decoded with the standard library parser, whatever
+        the JSON codec of the application. This function consumes the body.
+
+        Args:
+            path (Sequence[str], optional): The keys of the objects containing
+                the array. Defaults to (), for a top level array.
+            max_item_size (Optional[int], optional): The maximum size in
+                characters of an element or key, or None for no limit.
+                Defaults to 1 MiB.
+            encoding (str, optional): The encoding of the body. Defaults to
+                'utf-8'.
+
+        Raises:
+            HttpFormError: If the body is malformed, which the application
+                answers with "400 Bad Request".
+            HttpPayloadTooLargeError: If an element is too large.
+
+        Returns:
+            AsyncIterator[Any]: The elements of the array.
+        """
+        return parse_json_items(
+            self.body,
+            path,
+            max_item_size=max_item_size,
+            encoding=encoding
+        )
+
+    async def data(self) -> Any:
+        """Return the body decoded by the codec for its content-type.
+
+        The codecs are those registered with the application. A request with
+        no codec for its content-type is answered with a 415.
+
+        This function consumes the body.
+
+        Raises:
+            HttpUnsupportedMediaTypeError: If there is no codec for the
+                content-type.
+
+        Returns:
+            Any: The decoded body.
+        """
+        media_type, _ = parse_header_value(
+            header.find(b'content-type', self.scope['headers']) or b''
+        )
+        codec = self.codecs.for_content_type(media_type)
+        if codec is None:
+            raise HttpUnsupportedMediaTypeError
+        data = await self._read_body()
+        return await self.codecs.decode(codec.decode, data)
+
+    async def _read_body(self) -> Union[bytes, bytearray]:
+        headers = self.scope['headers']
+        # The content-length of an encoded body is not the decoded length.
+        content_length = (
+            header.content_length(headers)
+            if header.find(b'content-encoding', headers) is None
+            else None
+        )
+        return await _aggregate_body(self.body, content_length)
+
     async def text(self, encoding: str = 'utf-8') -> str:
         """Return the request body as text.
 
@@ -59,31 +417,46 @@ class HttpRequest:
         Returns:
             str: The body as text.
         """
-        return await text_reader(self.body, encoding)
+        data = await self._read_body()
+        return data.decode(encoding)
 
     async def content(self) -> bytes:
         """Return the contents of the request body as bytes.
 
+        The chunks of the body are joined once, rather than being
+        concatenated as they arrive. A preallocated buffer would need to be
+        copied again to make bytes, so is only used to decode text and JSON.
+
         This function consumes the body. Calling it a second time will generate
         an error.
 
         Returns:
             bytes: The body as bytes.
         """
-        return await bytes_reader(self.body)
+        return await _join_body(self.body)
 
-    async def json(self, decode: Callable[[bytes], Any] = loads) -> Any:
+    async def json(
+            self,
+            decode: Optional[Callable[[bytes], Any]] = None
+    ) -> Any:
         """Return the contents of the request body as JSON.
 
         This function consumes the body. Calling it a second time will generate
         an error.
 
         Args:
-            decode (Callable[[Union[str, bytes]], Any], optional): A function to
-                decode the body to json. Defaults to `json.loads`.
+            decode (Optional[Callable[[bytes], Any]], optional): A function to
+                decode the body to json. Defaults to None, for the JSON codec
+                of the application.
 
         Returns:
             Any: The body as JSON.
         """
-        data = await self.content()
-        return decode(data)
+        data = await self._read_body()
+        if decode is not None:
+            # A function passed by the caller is given bytes, as it may not
+            # accept a bytearray.
+            return await self.codecs.decode(decode, bytes(data))
+        # The aggregated buffer is decoded by the codec without copying it to
+        # bytes.
+        return await self.codecs.decode(self.codecs.json.decode, data)
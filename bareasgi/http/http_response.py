@@ -2,12 +2,64 @@
 
 from __future__ import annotations
 
-from json import dumps
-from typing import Any, AsyncIterable, Callable, Iterable, List, Optional, Tuple
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
 
-from bareutils import bytes_writer, text_writer
+from bareutils import bytes_writer, header, text_writer
+
+from .http_codecs import Codec, current_codecs
+from .http_request import HttpRequest
 
 PushResponse = Tuple[str, List[Tuple[bytes, bytes]]]
+Records = Union[Iterable[Any], AsyncIterable[Any]]
+
+
+async def _iterate_records(records: Records) -> AsyncIterator[Any]:
+    if isinstance(records, AsyncIterable):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
+
+
+async def _json_writer(
+        records: Records,
+        encode: Callable[[Any], bytes],
+        start: bytes,
+        separator: bytes,
+        terminator: bytes,
+        end: bytes,
+        buffer_size: int
+) -> AsyncIterator[bytes]:
+    buf = bytearray(start)
+    delimiter = b''
+    async for record in _iterate_records(records):
+        buf += delimiter
+        buf += encode(record)
+        buf += terminator
+        delimiter = separator
+        if len(buf) >= buffer_size:
+            yield bytes(buf)
+            buf.clear()
+    buf += end
+    if buf:
+        yield bytes(buf)
+
+
+def _negotiate(request: HttpRequest) -> Optional[Codec]:
+    return request.codecs.negotiate(
+        header.find(b'accept', request.scope['headers'])
+    )
 
 
 class HttpResponse:
@@ -62,7 +114,7 @@ class HttpResponse:
         Returns:
             HttpResponse: The built HTTP response.
         """
-        return HttpResponse(
+        return cls(
             status,
             [(b'content-type', content_type)] + (headers or []),
             bytes_writer(content, chunk_size)
@@ -96,7 +148,7 @@ class HttpResponse:
         Returns:
             HttpResponse: The built HTTP response.
         """
-        return HttpResponse(
+        return cls(
             status,
             [(b'content-type', content_type)] + (headers or []),
             text_writer(text, encoding, chunk_size)
@@ -110,11 +162,15 @@ class HttpResponse:
             status: int = 200,
             content_type: bytes = b'application/json',
             headers: Optional[List[Tuple[bytes, bytes]]] = None,
-            encode: Callable[[Any], str] = dumps,
+            encode: Optional[Callable[[Any], str]] = None,
             encode_bytes: Optional[Callable[[Any], bytes]] = None
     ) -> HttpResponse:
         """Create an HTTP response from data converted to JSON.
 
+        If neither `encode` nor `encode_bytes` is given, the JSON codec of the
+        application is used. To encode large data in the executor use
+        `from_json_async`.
+
         Args:
             data (Any): The data to be converted to JSON.
             headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
@@ -122,8 +178,9 @@ class HttpResponse:
             status (int, optional): An optional status code. Defaults to `200`.
             content_type (bytes, optional): An optional content type. Defaults
                 to `b'application/json'`.
-            encode (Callable[[Any], str], optional): An function to convert the
-                data to a JSON string. Defaults to `json.dumps`.
+            encode (Optional[Callable[[Any], str]], optional): An optional
+                function to convert the data to a JSON string. Defaults to
+                None.
             encode_bytes (Optional[Callable[[Any]], bytes], optional): An
                 optional function to convert the data to JSON bytes. If
                 specified this will be preferred to the `encode` argument.
@@ -132,14 +189,246 @@ class HttpResponse:
         Returns:
             HttpResponse: A JSON http response.
         """
+        if encode is not None and encode_bytes is None:
+            return cls.from_text(
+                encode(data),
+                status=status,
+                content_type=content_type,
+                headers=headers
+            )
+        if encode_bytes is None:
+            encode_bytes = current_codecs().json.encode
         return cls.from_bytes(
             encode_bytes(data),
             status=status,
             content_type=content_type,
             headers=headers
-        ) if encode_bytes is not None else cls.from_text(
-            encode(data),
+        )
+
+    @classmethod
+    def from_data(
+            cls,
+            request: HttpRequest,
+            data: Any,
+            *,
+            status: int = 200,
+            headers: Optional[List[Tuple[bytes, bytes]]] = None
+    ) -> HttpResponse:
+        """Create an HTTP response with the codec the client accepts.
+
+        The codec is chosen from the codecs of the application by the accept
+        header of the request. If the request has no accept header the JSON
+        codec is used, and if no codec is acceptable a 406 is returned.
+
+        ```python
+        async def get_user(request: HttpRequest) -> HttpResponse:
+            user = await database.get_user(request.matches['id'])
+            return HttpResponse.from_data(request, user)
+        ```
+
+        Args:
+            request (HttpRequest): The request.
+            data (Any): The data to encode.
+            status (int, optional): An optional status code. Defaults to `200`.
+            headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
+                Defaults to `None`.
+
+        Returns:
+            HttpResponse: The http response.
+        """
+        codec = _negotiate(request)
+        if codec is None:
+            return cls._not_acceptable()
+        return cls.from_bytes(
+            codec.encode(data),
+            status=status,
+            content_type=codec.media_type,
+            headers=[(b'vary', b'accept')] + (headers or [])
+        )
+
+    @classmethod
+    async def from_json_async(
+            cls,
+            data: Any,
+            *,
+            status: int = 200,
+            content_type: bytes = b'application/json',
+            headers: Optional[List[Tuple[bytes, bytes]]] = None
+    ) -> HttpResponse:
+        """Create an HTTP response from data converted to JSON, encoding
+        data with more items than the offload threshold of the codecs in the
+        executor.
+
+        The data is encoded before the response is returned, so the work is
+        within the deadline and any concurrency limit of the request. The data
+        must not be changed by other tasks while it is encoded.
+
+        ```python
+        async def get_rows(request: HttpRequest) -> HttpResponse:
+            rows = await database.get_rows()
+            return await HttpResponse.from_json_async(rows)
+        ```
+
+        Args:
+            data (Any): The data to be converted to JSON.
+            status (int, optional): An optional status code. Defaults to `200`.
+            content_type (bytes, optional): An optional content type. Defaults
+                to `b'application/json'`.
+            headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
+                Defaults to `None`.
+
+        Returns:
+            HttpResponse: A JSON http response.
+        """
+        codecs = current_codecs()
+        return cls.from_bytes(
+            await codecs.encode(codecs.json.encode, data),
             status=status,
             content_type=content_type,
             headers=headers
         )
+
+    @classmethod
+    async def from_data_async(
+            cls,
+            request: HttpRequest,
+            data: Any,
+            *,
+            status: int = 200,
+            headers: Optional[List[Tuple[bytes, bytes]]] = None
+    ) -> HttpResponse:
+        """Create an HTTP response with the codec the client accepts,
+        encoding data with more items than the offload threshold of the codecs
+        in the executor.
+
+        As with `from_json_async` the data is encoded before the response is
+        returned, and must not be changed by other tasks while it is encoded.
+
+        Args:
+            request (HttpRequest): The request.
+            data (Any): The data to encode.
+            status (int, optional): An optional status code. Defaults to `200`.
+            headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
+                Defaults to `None`.
+
+        Returns:
+            HttpResponse: The http response.
+        """
+        codec = _negotiate(request)
+        if codec is None:
+            return cls._not_acceptable()
+        return cls.from_bytes(
+            await request.codecs.encode(codec.encode, data),
+            status=status,
+            content_type=codec.media_type,
+            headers=[(b'vary', b'accept')] + (headers or [])
+        )
+
+    @classmethod
+    def _not_acceptable(cls) -> HttpResponse:
+        return cls.from_bytes(
+            b'Not Acceptable',
+            status=406,
+            headers=[(b'vary', b'accept')]
+        )
+
+    @classmethod
+    def from_json_array(
+            cls,
+            records: Records,
+            *,
+            status: int = 200,
+            content_type: bytes = b'application/json',
+            headers: Optional[List[Tuple[bytes, bytes]]] = None,
+            encode_bytes: Optional[Callable[[Any], bytes]] = None,
+            buffer_size: int = 65536
+    ) -> HttpResponse:
+        """Create an HTTP response which streams records as a JSON array.
+
+        The records are encoded one at a time as the body is sent, and the
+        output is sent whenever `buffer_size` bytes have accumulated, so the
+        memory used is proportional to the buffer rather than the data.
+
+        ```python
+        async def get_rows(request: HttpRequest) -> HttpResponse:
+            return HttpResponse.from_json_array(database.fetch_rows())
+        ```
+
+        Args:
+            records (Records): An iterable or async iterable of the records.
+            status (int, optional): An optional status code. Defaults to `200`.
+            content_type (bytes, optional): An optional content type. Defaults
+                to `b'application/json'`.
+            headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
+                Defaults to `None`.
+            encode_bytes (Optional[Callable[[Any]], bytes], optional): An
+                optional function to convert a record to JSON bytes. Defaults
+                to None, for the JSON codec of the application.
+            buffer_size (int, optional): The number of bytes to accumulate
+                before sending. Defaults to 65536.
+
+        Returns:
+            HttpResponse: A JSON http response.
+        """
+        return cls(
+            status,
+            [(b'content-type', content_type)] + (headers or []),
+            _json_writer(
+                records,
+                encode_bytes or current_codecs().json.encode,
+                b'[',
+                b',',
+                b'',
+                b']',
+                buffer_size
+            )
+        )
+
+    @classmethod
+    def from_ndjson(
+            cls,
+            records: Records,
+            *,
+            status: int = 200,
+            content_type: bytes = b'application/x-ndjson',
+            headers: Optional[List[Tuple[bytes, bytes]]] = None,
+            encode_bytes: Optional[Callable[[Any], bytes]] = None,
+            buffer_size: int = 65536
+    ) -> HttpResponse:
+        """Create an HTTP response which streams records as newline delimited
+        JSON.
+
+        The records are encoded one at a time as the body is sent, and the
+        output is sent whenever `buffer_size` bytes have accumulated. A
+        buffer size of 1 sends each record as soon as it is available.
+
+        Args:
+            records (Records): An iterable or async iterable of the records.
+            status (int, optional): An optional status code. Defaults to `200`.
+            content_type (bytes, optional): An optional content type. Defaults
+                to `b'application/x-ndjson'`.
+            headers (Optional[List[Tuple[bytes, bytes]]]): Optional headers.
+                Defaults to `None`.
+            encode_bytes (Optional[Callable[[Any]], bytes], optional): An
+                optional function to convert a record to JSON bytes. The
+                encoding must not contain line breaks. Defaults to None, for
+                the JSON codec of the application.
+            buffer_size (int, optional): The number of bytes to accumulate
+                before sending. Defaults to 65536.
+
+        Returns:
+            HttpResponse: A newline delimited JSON http response.
+        """
+        return cls(
+            status,
+            [(b'content-type', content_type)] + (headers or []),
+            _json_writer(
+                records,
+                encode_bytes or current_codecs().json.encode,
+                b'',
+                b'',
+                b'\n',
+                b'',
+                buffer_size
+            )
+        )
@@ -0,0 +1,42 @@
+"""The http route"""
+
+from typing import Any, Mapping, Optional
+
+
+def _check_rate_limit(rate_limit: Any) -> None:
+    rate, burst = rate_limit
+    if rate <= 0:
+        raise ValueError('The rate must be positive')
+    if burst < 1:
+        raise ValueError('The burst must be at least 1')
+
+
+class HttpRoute:
+    """A route matched by the router"""
+
+    def __init__(
+            self,
+            path: str,
+            options: Optional[Mapping[str, Any]] = None
+    ) -> None:
+        """A route matched by the router.
+
+        Args:
+            path (str): The path template used to register the route, e.g.
+                '/users/{id:int}'.
+            options (Optional[Mapping[str, Any]], optional): Options given
+                when the route was registered, e.g. `{'priority': 10}`.
+                Defaults to None.
+
+        Raises:
+            ValueError: If an option known to bareASGI is invalid.
+        """
+        self.path = path
+        self.options: Mapping[str, Any] = options or {}
+        if self.options.get('rate_limit') is not None:
+            _check_rate_limit(self.options['rate_limit'])
+
+    def __str__(self) -> str:
+        return f'<HttpRoute: path="{self.path}", options={self.options}>'
+
+    __repr__ = __str__
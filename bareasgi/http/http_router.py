@@ -1,10 +1,11 @@
 """The abstract class for http routing"""
 
 from abc import ABCMeta, abstractmethod
-from typing import AbstractSet, Any, Mapping, Tuple
+from typing import AbstractSet, Any, Mapping, Optional, Tuple
 
 from .http_callbacks import HttpRequestCallback
 from .http_response import HttpResponse
+from .http_route import HttpRoute
 
 
 class HttpRouter(metaclass=ABCMeta):
@@ -29,7 +30,8 @@ class HttpRouter(metaclass=ABCMeta):
             self,
             methods: AbstractSet[str],
             path: str,
-            callback: HttpRequestCallback
+            callback: HttpRequestCallback,
+            **options: Any
     ) -> None:
         """Add an HTTP request handler
 
@@ -37,6 +39,8 @@ class HttpRouter(metaclass=ABCMeta):
             methods (AbstractSet[str]): The supported HTTP methods.
             path (str): The path.
             callback (HttpRequestCallback): The request handler.
+            **options (Any): Options for the route, which are available to
+                middleware through the route of the request.
         """
 
     @abstractmethod
@@ -55,3 +59,26 @@ class HttpRouter(metaclass=ABCMeta):
             Tuple[HttpRequestCallback, Mapping[str, Any]]: A handler and the route
                 matches.
         """
+
+    def resolve_route(
+            self,
+            method: str,
+            path: str
+    ) -> Tuple[HttpRequestCallback, Mapping[str, Any], Optional[HttpRoute]]:
+        """Resolve a request to a handler with the route matches and the
+        matched route.
+
+        Routers which know the route that was matched should override this
+        method. The default implementation calls `resolve` and provides no
+        route.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path.
+
+        Returns:
+            Tuple[HttpRequestCallback, Mapping[str, Any], Optional[HttpRoute]]:
+                A handler, the route matches, and the route if known.
+        """
+        handler, matches = self.resolve(method, path)
+        return handler, matches, None
@@ -0,0 +1,131 @@
+"""A request body spooled to a temporary file"""
+
+import asyncio
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class SpooledBody:
+    """A seekable, re-readable request body.
+
+    The body is held in memory until it exceeds `max_memory` bytes, after
+    which it is moved to a temporary file. Writes to and reads from the file
+    are run in the default executor, so they do not block the event loop.
+
+    The body is an async iterable of bytes, and every iteration starts from
+    the beginning of the body.
+
+    ```python
+    body = await request.spool()
+    await verify_signature(body)
+    document = await request.json()
+    ```
+    """
+
+    def __init__(
+            self,
+            max_memory: int = 1024 * 1024,
+            chunk_size: int = 64 * 1024
+    ) -> None:
+        """Construct the spooled body.
+
+        Args:
+            max_memory (int, optional): The number of bytes held in memory
+                before the body is moved to disk. Defaults to 1 MiB.
+            chunk_size (int, optional): The size of the chunks yielded when
+                the body is read. Defaults to 64 KiB.
+        """
+        self.max_memory = max_memory
+        self.chunk_size = chunk_size
+        self._file = SpooledTemporaryFile(max_size=max_memory)
+        # Readers share the file, so a seek and a read must not interleave.
+        self._lock = Lock()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """The number of bytes in the body.
+
+        Returns:
+            int: The size of the body.
+        """
+        return self._size
+
+    @property
+    def is_on_disk(self) -> bool:
+        """True if the body has been moved to a temporary file.
+
+        Returns:
+            bool: True if the body is on disk.
+        """
+        return self._size > self.max_memory
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if not self.is_on_disk:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _write_at_end(self, data: bytes) -> None:
+        with self._lock:
+            self._file.seek(0, 2)
+            self._file.write(data)
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    async def write(self, data: bytes) -> None:
+        """Append data to the body.
+
+        Args:
+            data (bytes): The data to append.
+        """
+        # The size is updated first, so the write which moves the body to
+        # disk is also run in the executor.
+        self._size += len(data)
+        await self._run(self._write_at_end, data)
+
+    async def read(self, offset: int = 0, size: Optional[int] = None) -> bytes:
+        """Read part of the body.
+
+        Args:
+            offset (int, optional): The position to read from. Defaults to 0.
+            size (Optional[int], optional): The maximum number of bytes to
+                read, or None to read to the end. Defaults to None.
+
+        Returns:
+            bytes: The data read.
+        """
+        return await self._run(
+            self._read_at,
+            offset,
+            -1 if size is None else size
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        """True if the body has been closed.
+
+        Returns:
+            bool: True if the body is closed.
+        """
+        return self._file.closed
+
+    async def close(self) -> None:
+        """Close the body, removing any temporary file."""
+        if not self.is_closed:
+            await self._run(self._file.close)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        offset = 0
+        while offset < self._size:
+            chunk = await self.read(offset, self.chunk_size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
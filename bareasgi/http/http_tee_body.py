@@ -0,0 +1,87 @@
+"""A request body which can be read by many readers"""
+
+import asyncio
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+from .http_errors import HttpPayloadTooLargeError
+
+
+class TeeBody:
+    """A request body which may be read any number of times.
+
+    The source body is read once, on demand, by whichever reader is furthest
+    ahead, and the chunks are kept in memory for the other readers. Every
+    iteration starts from the beginning of the body.
+
+    If `max_size` is given and the body grows beyond it, readers get an
+    `HttpPayloadTooLargeError`, which the application answers with a 413.
+    """
+
+    def __init__(
+            self,
+            body: AsyncIterable[bytes],
+            max_size: Optional[int] = None
+    ) -> None:
+        """Construct the tee body.
+
+        Args:
+            body (AsyncIterable[bytes]): The source body.
+            max_size (Optional[int], optional): The maximum number of bytes
+                to buffer, or None for no limit. Defaults to None.
+        """
+        self.max_size = max_size
+        self._source = body.__aiter__()
+        self._chunks: List[bytes] = []
+        self._size = 0
+        self._is_complete = False
+        self._is_too_large = False
+        # Only one reader pulls from the source at a time.
+        self._lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        """The number of bytes buffered so far.
+
+        Returns:
+            int: The size of the buffered body.
+        """
+        return self._size
+
+    @property
+    def is_complete(self) -> bool:
+        """True if the whole body has been buffered.
+
+        Returns:
+            bool: True if the source body has been consumed.
+        """
+        return self._is_complete
+
+    async def _fill(self, index: int) -> bool:
+        async with self._lock:
+            if index < len(self._chunks):
+                # Another reader buffered the chunk while this one waited.
+                return True
+            if self._is_too_large:
+                raise HttpPayloadTooLargeError
+            if self._is_complete:
+                return False
+
+            try:
+                chunk = await self._source.__anext__()
+            except StopAsyncIteration:
+                self._is_complete = True
+                return False
+
+            self._size += len(chunk)
+            if self.max_size is not None and self._size > self.max_size:
+                self._is_too_large = True
+                raise HttpPayloadTooLargeError
+
+            self._chunks.append(chunk)
+            return True
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        index = 0
+        while index < len(self._chunks) or await self._fill(index):
+            yield self._chunks[index]
+            index += 1
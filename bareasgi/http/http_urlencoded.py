@@ -0,0 +1,137 @@
+"""Incremental application/x-www-form-urlencoded support"""
+
+from typing import AsyncIterable, Dict, List, Optional
+from urllib.parse import unquote_to_bytes
+
+from .http_errors import HttpFormError, HttpPayloadTooLargeError
+
+
+class UrlEncodedParser:
+    """An incremental urlencoded form parser.
+
+    Chunks of the body are fed to the parser, and each field is decoded as
+    soon as its terminating `&` arrives, so only the field being received is
+    buffered.
+    """
+
+    def __init__(
+            self,
+            *,
+            max_fields: int = 1000,
+            max_field_size: int = 65536,
+            encoding: str = 'utf-8'
+    ) -> None:
+        """Construct the parser.
+
+        Args:
+            max_fields (int, optional): The maximum number of fields.
+                Defaults to 1000.
+            max_field_size (int, optional): The maximum size in bytes of an
+                encoded field. Defaults to 65536.
+            encoding (str, optional): The encoding of the decoded names and
+                values. Defaults to 'utf-8'.
+        """
+        self.max_fields = max_fields
+        self.max_field_size = max_field_size
+        self.encoding = encoding
+        self.fields: Dict[str, List[str]] = {}
+        self._field_count = 0
+        self._pending = bytearray()
+
+    def _decode(self, value: bytes) -> str:
+        try:
+            return unquote_to_bytes(value.replace(b'+', b' ')).decode(
+                self.encoding
+            )
+        except UnicodeDecodeError as error:
+            raise HttpFormError('Invalid encoding') from error
+
+    def _add_field(self, field: bytes) -> None:
+        if not field:
+            return
+        self._field_count += 1
+        if self._field_count > self.max_fields:
+            raise HttpFormError('Too many form fields')
+        name, _, value = field.partition(b'=')
+        self.fields.setdefault(
+            self._decode(name),
+            []
+        ).append(self._decode(value))
+
+    def feed(self, data: bytes) -> None:
+        """Feed a chunk of the body to the parser.
+
+        Args:
+            data (bytes): The chunk.
+
+        Raises:
+            HttpFormError: If there are too many fields.
+            HttpPayloadTooLargeError: If a field is too large.
+        """
+        *fields, pending = data.split(b'&')
+        if fields:
+            self._pending += fields[0]
+            fields[0] = bytes(self._pending)
+            self._pending.clear()
+        for field in fields:
+            if len(field) > self.max_field_size:
+                raise HttpPayloadTooLargeError
+            self._add_field(field)
+
+        self._pending += pending
+        if len(self._pending) > self.max_field_size:
+            raise HttpPayloadTooLargeError
+
+    def close(self) -> Dict[str, List[str]]:
+        """Signal the end of the body.
+
+        Returns:
+            Dict[str, List[str]]: The values of the fields keyed by name.
+        """
+        self._add_field(bytes(self._pending))
+        self._pending.clear()
+        return self.fields
+
+
+async def parse_urlencoded(
+        body: AsyncIterable[bytes],
+        *,
+        max_fields: int = 1000,
+        max_field_size: int = 65536,
+        max_size: Optional[int] = None,
+        encoding: str = 'utf-8'
+) -> Dict[str, List[str]]:
+    """Parse an application/x-www-form-urlencoded body as it arrives.
+
+    Unlike `urllib.parse.parse_qs`, fields with blank values are kept.
+
+    Args:
+        body (AsyncIterable[bytes]): The body.
+        max_fields (int, optional): The maximum number of fields. Defaults to
+            1000.
+        max_field_size (int, optional): The maximum size in bytes of an
+            encoded field. Defaults to 65536.
+        max_size (Optional[int], optional): The maximum size of the body.
+            Defaults to None.
+        encoding (str, optional): The encoding of the decoded names and
+            values. Defaults to 'utf-8'.
+
+    Raises:
+        HttpFormError: If the body is malformed or has too many fields.
+        HttpPayloadTooLargeError: If a size limit is exceeded.
+
+    Returns:
+        Dict[str, List[str]]: The values of the fields keyed by name.
+    """
+    parser = UrlEncodedParser(
+        max_fields=max_fields,
+        max_field_size=max_field_size,
+        encoding=encoding
+    )
+    total_size = 0
+    async for chunk in body:
+        total_size += len(chunk)
+        if max_size is not None and total_size > max_size:
+            raise HttpPayloadTooLargeError
+        parser.feed(chunk)
+    return parser.close()
@@ -1,11 +1,67 @@
 """Middlewares"""
 
+from .adaptive_concurrency import (
+    AdaptiveConcurrencyMiddleware,
+    AdaptiveLimit,
+    AdaptiveLimitFactory,
+    AimdLimit,
+    GradientLimit
+)
 from .compression import (
+    CompressionCache,
     CompressionMiddleware,
     make_default_compression_middleware
 )
+from .compression_dictionary import (
+    make_zdict_compressor_factory,
+    make_zdict_decompressor_factory,
+    train_zdict,
+    zdict_encoding
+)
+from .compression_level import (
+    AdaptiveCompressionLevel,
+    CompressionLevelMetrics,
+    LeveledCompressorFactory,
+    LoadMonitor
+)
+from .concurrency import ConcurrencyLimitMiddleware, PriorityClassMetrics
+from .fair_queuing import FairQueuingMiddleware, ClientWeightFunction
+from .rate_limit import RateLimitMiddleware, RateLimit, TokenBucketStore
+from .utils import (
+    ClientKeyFunction,
+    client_address_key,
+    route_key,
+    make_header_key,
+    make_composite_key
+)
 
 __all__ = [
+    'AdaptiveConcurrencyMiddleware',
+    'AdaptiveLimit',
+    'AdaptiveLimitFactory',
+    'AimdLimit',
+    'GradientLimit',
     'CompressionMiddleware',
-    'make_default_compression_middleware'
+    'CompressionCache',
+    'make_default_compression_middleware',
+    'make_zdict_compressor_factory',
+    'make_zdict_decompressor_factory',
+    'train_zdict',
+    'zdict_encoding',
+    'AdaptiveCompressionLevel',
+    'CompressionLevelMetrics',
+    'LeveledCompressorFactory',
+    'LoadMonitor',
+    'ConcurrencyLimitMiddleware',
+    'PriorityClassMetrics',
+    'FairQueuingMiddleware',
+    'ClientWeightFunction',
+    'RateLimitMiddleware',
+    'RateLimit',
+    'TokenBucketStore',
+    'ClientKeyFunction',
+    'client_address_key',
+    'route_key',
+    'make_header_key',
+    'make_composite_key'
 ]
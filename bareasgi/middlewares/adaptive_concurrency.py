@@ -0,0 +1,334 @@
+"""Middleware for adaptive concurrency limiting"""
+
+from abc import ABCMeta, abstractmethod
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from ..http import (
+    HttpRequestCallback,
+    HttpRequest,
+    HttpResponse
+)
+
+from .utils import make_rejection_response_factory
+
+LOGGER = logging.getLogger(__name__)
+
+# The method and the path template of a route.
+RouteKey = Tuple[str, str]
+
+
+class AdaptiveLimit(metaclass=ABCMeta):
+    """The interface for an algorithm which adapts a concurrency limit"""
+
+    @property
+    @abstractmethod
+    def limit(self) -> int:
+        """The current concurrency limit.
+
+        Returns:
+            int: The maximum number of requests which may be in flight.
+        """
+
+    @abstractmethod
+    def update(self, latency: float, in_flight: int, is_dropped: bool) -> None:
+        """Update the limit with the outcome of a request.
+
+        Args:
+            latency (float): The time in seconds the handler took.
+            in_flight (int): The number of requests in flight, including this
+                one, when the request completed.
+            is_dropped (bool): True if the request failed in a manner which
+                suggests overload, e.g. an exception or a 5xx status.
+        """
+
+
+AdaptiveLimitFactory = Callable[[], AdaptiveLimit]
+
+
+class AimdLimit(AdaptiveLimit):
+    """An additive-increase/multiplicative-decrease limit.
+
+    The limit grows by `increase` for each successful request while the limit
+    is being used, and shrinks by `backoff_ratio` when a request is dropped or
+    is slower than `target_latency`.
+    """
+
+    def __init__(
+            self,
+            *,
+            initial_limit: int = 20,
+            min_limit: int = 1,
+            max_limit: int = 1000,
+            target_latency: float = 1.0,
+            increase: float = 1.0,
+            backoff_ratio: float = 0.9
+    ) -> None:
+        """Construct the AIMD limit.
+
+        Args:
+            initial_limit (int, optional): The starting limit. Defaults to 20.
+            min_limit (int, optional): The lowest limit. Defaults to 1.
+            max_limit (int, optional): The highest limit. Defaults to 1000.
+            target_latency (float, optional): The latency in seconds above
+                which a request is considered to have been dropped. Defaults to
+                1.0.
+            increase (float, optional): The additive increase. Defaults to 1.0.
+            backoff_ratio (float, optional): The multiplicative decrease.
+                Defaults to 0.9.
+        """
+        if not 0 < backoff_ratio < 1:
+            raise ValueError('The backoff ratio must be between 0 and 1')
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.increase = increase
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(initial_limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, latency: float, in_flight: int, is_dropped: bool) -> None:
+        if is_dropped or latency > self.target_latency:
+            self._limit = max(
+                float(self.min_limit),
+                self._limit * self.backoff_ratio
+            )
+        elif in_flight * 2 >= self._limit:
+            # Only grow the limit when it is being used.
+            self._limit = min(
+                float(self.max_limit),
+                self._limit + self.increase
+            )
+
+
+class GradientLimit(AdaptiveLimit):
+    """A limit driven by the gradient of the latency.
+
+    The latency of each request is compared with a long term average. When the
+    latency rises above the average, scaled by `tolerance`, the limit is
+    reduced in proportion. Otherwise the limit grows by the square root of the
+    limit, which allows a small queue to form.
+    """
+
+    def __init__(
+            self,
+            *,
+            initial_limit: int = 20,
+            min_limit: int = 1,
+            max_limit: int = 1000,
+            smoothing: float = 0.2,
+            tolerance: float = 1.5,
+            long_window: int = 600
+    ) -> None:
+        """Construct the gradient limit.
+
+        Args:
+            initial_limit (int, optional): The starting limit. Defaults to 20.
+            min_limit (int, optional): The lowest limit. Defaults to 1.
+            max_limit (int, optional): The highest limit. Defaults to 1000.
+            smoothing (float, optional): The weight given to each new limit.
+                Defaults to 0.2.
+            tolerance (float, optional): The ratio of the latency to the long
+                term average which is tolerated before the limit is reduced.
+                Defaults to 1.5.
+            long_window (int, optional): The number of samples in the long
+                term average. Defaults to 600.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self._long_factor = 2 / (long_window + 1)
+        self._long_latency: Optional[float] = None
+        self._limit = float(initial_limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, latency: float, in_flight: int, is_dropped: bool) -> None:
+        if self._long_latency is None:
+            self._long_latency = latency
+        else:
+            self._long_latency += (latency - self._long_latency) * \
+                self._long_factor
+
+        if is_dropped:
+            gradient = 0.5
+        elif latency <= 0:
+            gradient = 1.0
+        else:
+            gradient = max(
+                0.5,
+                min(1.0, self.tolerance * self._long_latency / latency)
+            )
+
+        new_limit = self._limit * gradient + math.sqrt(self._limit)
+        if in_flight * 2 < self._limit:
+            # Don't grow the limit when it isn't being used.
+            new_limit = min(new_limit, self._limit)
+
+        new_limit = self._limit * (1 - self.smoothing) + \
+            new_limit * self.smoothing
+        self._limit = max(
+            float(self.min_limit),
+            min(float(self.max_limit), new_limit)
+        )
+
+
+class _RouteLimit:
+
+    def __init__(self, limit: AdaptiveLimit) -> None:
+        self.limit = limit
+        self.in_flight = 0
+
+
+class AdaptiveConcurrencyMiddleware:
+    """Adaptive concurrency limiting middleware
+
+    A concurrency limit is kept for each method and route, and adapted from
+    the observed latency of the handler. Requests which would exceed the limit are shed
+    immediately with a pre-built "503 Service Unavailable" response.
+
+    A route registered for several methods has a limit for each, as a cheap
+    GET and an expensive POST to the same path can have very different
+    latencies. Requests for which the router provided no route share a
+    single limit.
+    """
+
+    def __init__(
+            self,
+            limit_factory: AdaptiveLimitFactory = AimdLimit,
+            *,
+            retry_after: int = 1,
+            body: bytes = b'Service Unavailable'
+    ) -> None:
+        """Construct the adaptive concurrency middleware.
+
+        A fresh limit is made with the factory for each method and route.
+
+        ```python
+        from functools import partial
+
+        adaptive_middleware = AdaptiveConcurrencyMiddleware(
+            partial(AimdLimit, target_latency=0.25)
+        )
+        app = Application(middlewares=[adaptive_middleware])
+        ```
+
+        Args:
+            limit_factory (AdaptiveLimitFactory, optional): A factory for the
+                limit algorithm. Defaults to AimdLimit.
+            retry_after (int, optional): The value in seconds of the
+                `retry-after` header sent with a shed request. Defaults to 1.
+            body (bytes, optional): The body of the 503 response. Defaults to
+                b'Service Unavailable'.
+        """
+        self.limit_factory = limit_factory
+        self._routes: Dict[Optional[RouteKey], _RouteLimit] = {}
+        self._shed_count = 0
+        self._overloaded_response = make_rejection_response_factory(
+            503,
+            body,
+            retry_after
+        )
+
+    @property
+    def shed_count(self) -> int:
+        """The number of requests rejected since the middleware was created.
+
+        Returns:
+            int: The number of shed requests.
+        """
+        return self._shed_count
+
+    @property
+    def limits(self) -> Mapping[Optional[RouteKey], int]:
+        """The current limit for each method and route seen so far.
+
+        Returns:
+            Mapping[Optional[RouteKey], int]: The limits keyed by the method
+                and route path, or None for requests without a route.
+        """
+        return {
+            key: route_limit.limit.limit
+            for key, route_limit in self._routes.items()
+        }
+
+    @property
+    def in_flight(self) -> Mapping[Optional[RouteKey], int]:
+        """The number of requests in flight for each method and route seen so
+        far.
+
+        Returns:
+            Mapping[Optional[RouteKey], int]: The number of requests keyed by
+                the method and route path, or None for requests without a
+                route.
+        """
+        return {
+            key: route_limit.in_flight
+            for key, route_limit in self._routes.items()
+        }
+
+    async def __call__(
+            self,
+            request: HttpRequest,
+            handler: HttpRequestCallback
+    ) -> HttpResponse:
+        """Call the handler if the route is within its limit.
+
+        Args:
+            request (HttpRequest): The request.
+            handler (HttpRequestCallback): The handler to call.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        key: Optional[RouteKey] = (
+            (request.scope['method'], request.route.path)
+            if request.route is not None
+            else None
+        )
+        route_limit = self._routes.get(key)
+        if route_limit is None:
+            route_limit = _RouteLimit(self.limit_factory())
+            self._routes[key] = route_limit
+
+        if route_limit.in_flight >= route_limit.limit.limit:
+            self._shed_count += 1
+            LOGGER.warning(
+                'Shedding request for %s (limit %d).',
+                key,
+                route_limit.limit.limit
+            )
+            return self._overloaded_response()
+
+        route_limit.in_flight += 1
+        start = time.monotonic()
+        # None when the outcome says nothing about the load on the route.
+        is_dropped: Optional[bool] = True
+        try:
+            response = await handler(request)
+            is_dropped = response.status >= 500
+            return response
+        except asyncio.CancelledError:
+            # The handler is cancelled when the deadline passes, which is a
+            # drop, but also when the client disconnects, which is not.
+            if request.time_remaining != 0:
+                is_dropped = None
+            raise
+        finally:
+            if is_dropped is not None:
+                route_limit.limit.update(
+                    time.monotonic() - start,
+                    route_limit.in_flight,
+                    is_dropped
+                )
+            route_limit.in_flight -= 1
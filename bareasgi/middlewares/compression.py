@@ -1,11 +1,26 @@
 """Middleware for compression"""
 
-from typing import Mapping, List, Optional
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+import hashlib
+import zlib
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Mapping,
+    List,
+    Optional,
+    Tuple
+)
 
 from bareutils import (
+    bytes_reader,
+    bytes_writer,
     header,
+    Compressor,
     CompressorFactory,
-    compression_writer_adapter,
     make_deflate_compressobj,
     make_gzip_compressobj,
     DecompressorFactory,
@@ -19,6 +34,335 @@ from ..http import (
     HttpRequest,
     HttpResponse
 )
+from ..lifespan import LifespanRequest
+
+from .compression_dictionary import (
+    ZDICT_ENCODING_PREFIX,
+    make_zdict_compressor_factory,
+    make_zdict_decompressor_factory,
+    zdict_encoding
+)
+from .compression_level import (
+    DEFAULT_LEVELED_COMPRESSORS,
+    AdaptiveCompressionLevel,
+    CompressionLevelMetrics,
+    LeveledCompressorFactory
+)
+
+
+def _sync_flush(compressobj: Compressor) -> bytes:
+    # Emits all the pending output on a byte boundary, without ending the
+    # stream.
+    return compressobj.flush(zlib.Z_SYNC_FLUSH)  # type: ignore
+
+
+async def _compress_body(
+        body: AsyncIterable[bytes],
+        compressobj: Compressor,
+        executor: Optional[Executor],
+        offload_threshold: Optional[int],
+        flush_interval: Optional[float]
+) -> AsyncIterator[bytes]:
+    # pylint: disable=too-many-branches
+    loop = asyncio.get_running_loop()
+    iterator = body.__aiter__()
+    # The compressed previous chunk, which is sent while the current chunk is
+    # compressed in the executor.
+    pending: Optional[asyncio.Future] = None
+    # A read which is still outstanding when the flush interval elapsed.
+    reading: Optional[asyncio.Future] = None
+    # The time by which compressed data held by the compressor is flushed.
+    flush_at: Optional[float] = None
+    is_exhausted = False
+
+    try:
+        while True:
+            try:
+                if flush_at is None:
+                    buf = await (reading or iterator.__anext__())
+                else:
+                    reading = reading or asyncio.ensure_future(
+                        iterator.__anext__()
+                    )
+                    done, _ = await asyncio.wait(
+                        (reading,),
+                        timeout=max(0, flush_at - loop.time())
+                    )
+                    if not done:
+                        if pending is not None:
+                            compressed = await pending
+                            pending = None
+                            if compressed:
+                                yield compressed
+                        yield _sync_flush(compressobj)
+                        flush_at = None
+                        continue
+                    buf = reading.result()
+            except StopAsyncIteration:
+                is_exhausted = True
+                break
+            reading = None
+
+            if pending is not None:
+                # The compressor is stateful, so chunks are compressed in
+                # order.
+                compressed = await pending
+            if (
+                    offload_threshold is not None and
+                    len(buf) >= offload_threshold
+            ):
+                current = loop.run_in_executor(
+                    executor,
+                    compressobj.compress,
+                    buf
+                )
+            else:
+                current = loop.create_future()
+                current.set_result(compressobj.compress(buf))
+            if pending is not None and compressed:
+                yield compressed
+            pending = current
+
+            if flush_interval == 0:
+                compressed = await pending
+                pending = None
+                yield compressed + _sync_flush(compressobj)
+            elif flush_interval is not None and flush_at is None:
+                flush_at = loop.time() + flush_interval
+
+        if pending is not None:
+            compressed = await pending
+            if compressed:
+                yield compressed
+        yield compressobj.flush()
+    finally:
+        # The consumer may stop early, for example when the client
+        # disconnects, leaving a read or a compression outstanding.
+        if pending is not None:
+            pending.cancel()
+        if not is_exhausted:
+            if reading is not None:
+                await _cancel_read(reading)
+            await _close_body(iterator)
+
+
+class _ResumedBody:
+    """A body continuing after the chunks read by `_peek_body`.
+
+    Closing the body cancels a read left pending by the peek, and closes the
+    original body.
+    """
+
+    def __init__(
+            self,
+            prefix: List[bytes],
+            pending: Optional[asyncio.Future],
+            iterator: AsyncIterator[bytes]
+    ) -> None:
+        self._prefix = prefix
+        self._index = 0
+        self._pending = pending
+        self._iterator = iterator
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._index < len(self._prefix):
+            chunk = self._prefix[self._index]
+            self._index += 1
+            return chunk
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            return await pending
+        return await self._iterator.__anext__()
+
+    async def aclose(self) -> None:
+        """Cancel any pending read and close the original body."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await _cancel_read(pending)
+        await _close_body(self._iterator)
+
+
+async def _cancel_read(pending: asyncio.Future) -> None:
+    pending.cancel()
+    try:
+        await pending
+    except (asyncio.CancelledError, StopAsyncIteration):
+        pass
+
+
+async def _peek_body(
+        body: AsyncIterable[bytes],
+        size: int,
+        timeout: Optional[float]
+) -> Tuple[List[bytes], Optional[_ResumedBody]]:
+    """Read the start of a body.
+
+    Returns the chunks read, and the whole body, or None if the body ended
+    before `size` bytes were read. Reading stops after `timeout` seconds, as
+    a slow stream should not be held back. The pending read is then passed
+    on to the returned body, which cancels it if it is closed before the
+    read completes.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    iterator = body.__aiter__()
+    prefix: List[bytes] = []
+    total = 0
+    while total < size:
+        pending = asyncio.ensure_future(iterator.__anext__())
+        try:
+            done, _ = await asyncio.wait(
+                (pending,),
+                timeout=None if deadline is None else max(
+                    0,
+                    deadline - loop.time()
+                )
+            )
+        except asyncio.CancelledError:
+            await _cancel_read(pending)
+            raise
+        if not done:
+            return prefix, _ResumedBody(prefix, pending, iterator)
+        try:
+            chunk = pending.result()
+        except StopAsyncIteration:
+            return prefix, None
+        prefix.append(chunk)
+        total += len(chunk)
+    return prefix, _ResumedBody(prefix, None, iterator)
+
+
+CacheKey = Tuple[bytes, ...]
+
+
+class CompressionCache:
+    """A memory bounded cache of compressed response bodies.
+
+    Bodies are keyed by their strong ETag and the path and query of the
+    request, or failing that a hash of their content, and the encoding. The
+    least recently used bodies are evicted when the total size exceeds
+    `max_size`.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 32 * 1024 * 1024,
+            max_entry_size: int = 1024 * 1024
+    ) -> None:
+        """Construct the compression cache.
+
+        Args:
+            max_size (int, optional): The maximum total size in bytes of the
+                compressed bodies held. Defaults to 32 MiB.
+            max_entry_size (int, optional): The maximum size in bytes of a
+                body to cache. Uncompressed bodies without an ETag are only
+                hashed if they are no larger than this. Defaults to 1 MiB.
+        """
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self._entries: 'OrderedDict[CacheKey, bytes]' = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """The total size of the compressed bodies held.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return self._size
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        """Get a compressed body.
+
+        Args:
+            key (CacheKey): The key.
+
+        Returns:
+            Optional[bytes]: The compressed body, or None if it is not held.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: CacheKey, value: bytes) -> None:
+        """Add a compressed body.
+
+        Args:
+            key (CacheKey): The key.
+            value (bytes): The compressed body.
+        """
+        if len(value) > self.max_entry_size:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def record(
+            self,
+            key: CacheKey,
+            body: AsyncIterable[bytes]
+    ) -> AsyncIterator[bytes]:
+        """Pass through a compressed body, adding it to the cache when it is
+        complete.
+
+        Args:
+            key (CacheKey): The key.
+            body (AsyncIterable[bytes]): The compressed body.
+
+        Yields:
+            bytes: The chunks of the body.
+        """
+        chunks: Optional[List[bytes]] = []
+        size = 0
+        async for chunk in body:
+            if chunks is not None:
+                size += len(chunk)
+                if size > self.max_entry_size:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is not None:
+            self.put(key, b''.join(chunks))
+
+
+async def _close_body(body: AsyncIterable[bytes]) -> None:
+    # A body which is not read may hold resources, such as a file, until it
+    # is closed.
+    aclose = getattr(body, 'aclose', None)
+    if aclose is not None:
+        await aclose()
+
+
+def _resource(request: HttpRequest) -> bytes:
+    # ETags are only unique within a resource.
+    path: str = request.scope.get('path', '')
+    query_string: bytes = request.scope.get('query_string', b'')
+    return path.encode('utf-8') + b'?' + query_string
+
+
+def _strong_etag(headers: List[Tuple[bytes, bytes]]) -> Optional[bytes]:
+    etag = header.find(b'etag', headers)
+    # A weak ETag does not guarantee the bodies are byte for byte identical.
+    return None if etag is None or etag.startswith(b'W/') else etag
 
 
 class CompressionMiddleware:
@@ -28,7 +372,20 @@ class CompressionMiddleware:
             self,
             compressors: Mapping[bytes, CompressorFactory],
             decompressors: Mapping[bytes, DecompressorFactory],
-            minimum_size: int = 512
+            minimum_size: int = 512,
+            *,
+            offload_threshold: Optional[int] = None,
+            max_threads: int = 2,
+            executor: Optional[Executor] = None,
+            cache: Optional[CompressionCache] = None,
+            peek_timeout: Optional[float] = 0.1,
+            flush_interval: Optional[float] = None,
+            flush_intervals: Optional[Mapping[bytes, Optional[float]]] = None,
+            level_selector: Optional[AdaptiveCompressionLevel] = None,
+            leveled_compressors: Optional[
+                Mapping[bytes, LeveledCompressorFactory]
+            ] = None,
+            minimum_sizes: Optional[Mapping[bytes, int]] = None
     ) -> None:
         """Constructs the compression middleware.
 
@@ -50,10 +407,234 @@ class CompressionMiddleware:
                 of encoding to decompressor factories.
             minimum_size (int, optional): The size below which no compression
                 will be attempted. Defaults to 512.
+            offload_threshold (Optional[int], optional): The size of a chunk
+                of the body at or above which it is compressed in a thread, as
+                zlib releases the GIL. The compression of a chunk then overlaps
+                the sending of the previous one. Smaller chunks are compressed
+                on the event loop. Defaults to None.
+            max_threads (int, optional): The number of threads used for
+                compression if no executor is given. Defaults to 2.
+            executor (Optional[Executor], optional): The executor for
+                compression. Defaults to None.
+            cache (Optional[CompressionCache], optional): A cache for the
+                compressed bodies of responses which are repeated. Defaults
+                to None.
+            peek_timeout (Optional[float], optional): When a response has no
+                content-length, up to `minimum_size` bytes of the body are
+                read to decide whether to compress it. This limits the time
+                spent waiting, so a slow stream is compressed rather than
+                held back. Defaults to 0.1.
+            flush_interval (Optional[float], optional): How often compressed
+                output is flushed to the client. With None output is only
+                sent when the compressor buffer is full, which gives the best
+                ratio. With 0 output is flushed after every chunk of the body,
+                which gives the lowest latency. Otherwise data is held for at
+                most this number of seconds. Routes may override this with the
+                `compression_flush_interval` option. Defaults to None.
+            flush_intervals (Optional[Mapping[bytes, Optional[float]]],
+                optional): Flush intervals for specific content types.
+                Defaults to None, which flushes server-sent events after every
+                event.
+            level_selector (Optional[AdaptiveCompressionLevel], optional):
+                If given, the compression level of each response is chosen
+                from the load and the content length, and the levels chosen
+                and the ratios achieved are recorded in `level_metrics`.
+                Defaults to None, for the fixed level of the compressors.
+            leveled_compressors (Optional[Mapping[bytes,
+                LeveledCompressorFactory]], optional): A dictionary of
+                encoding to factories taking a compression level, used with
+                the level selector. Defaults to None, for gzip and deflate.
+            minimum_sizes (Optional[Mapping[bytes, int]], optional): Minimum
+                sizes for specific encodings, such as a preset dictionary
+                encoding which is worthwhile for much smaller bodies. Defaults
+                to None.
         """
         self.compressors = compressors
         self.decompressors = decompressors
         self.minimum_size = minimum_size
+        self.offload_threshold = offload_threshold
+        self.max_threads = max_threads
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.cache = cache
+        self.peek_timeout = peek_timeout
+        self.flush_interval = flush_interval
+        self.flush_intervals: Mapping[bytes, Optional[float]] = (
+            {b'text/event-stream': 0}
+            if flush_intervals is None
+            else flush_intervals
+        )
+        self.level_selector = level_selector
+        self.leveled_compressors = (
+            DEFAULT_LEVELED_COMPRESSORS
+            if leveled_compressors is None
+            else leveled_compressors
+        )
+        self.level_metrics = CompressionLevelMetrics()
+        self.minimum_sizes = minimum_sizes or {}
+
+    @property
+    def executor(self) -> Executor:
+        """The executor for compressing large chunks.
+
+        Returns:
+            Executor: The executor, created when first used if none was
+                given.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_threads,
+                thread_name_prefix='compression'
+            )
+        return self._executor
+
+    async def startup(self, _request: LifespanRequest) -> None:
+        """A lifespan startup handler which starts measuring the load for the
+        level selector.
+
+        Args:
+            _request (LifespanRequest): The lifespan request.
+        """
+        if self.level_selector is not None:
+            self.level_selector.monitor.start()
+
+    async def shutdown(self, _request: LifespanRequest) -> None:
+        """A lifespan shutdown handler which stops measuring the load, and
+        shuts down the executor if the middleware created it.
+
+        Args:
+            _request (LifespanRequest): The lifespan request.
+        """
+        if self.level_selector is not None:
+            await self.level_selector.monitor.stop()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _compress(
+            self,
+            body: AsyncIterable[bytes],
+            compressobj: Compressor,
+            flush_interval: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        return _compress_body(
+            body,
+            compressobj,
+            None if self.offload_threshold is None else self.executor,
+            self.offload_threshold,
+            flush_interval
+        )
+
+    def _compress_as(
+            self,
+            body: AsyncIterable[bytes],
+            encoding: bytes,
+            content_length: Optional[int],
+            flush_interval: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        if (
+                self.level_selector is None or
+                encoding not in self.leveled_compressors
+        ):
+            return self._compress(
+                body,
+                self.compressors[encoding](),
+                flush_interval
+            )
+        level = self.level_selector.select(content_length)
+        compressobj = self.leveled_compressors[encoding](level)
+        return self.level_metrics.measure(
+            level,
+            body,
+            lambda counted: self._compress(
+                counted,
+                compressobj,
+                flush_interval
+            )
+        )
+
+    def select_flush_interval(
+            self,
+            request: HttpRequest,
+            headers: List[Tuple[bytes, bytes]]
+    ) -> Optional[float]:
+        """Select the flush interval for a response.
+
+        The `compression_flush_interval` option of the route takes precedence
+        over the interval for the content type, which takes precedence over
+        the default.
+
+        Args:
+            request (HttpRequest): The request.
+            headers (List[Tuple[bytes, bytes]]): The response headers.
+
+        Returns:
+            Optional[float]: The flush interval.
+        """
+        if (
+                request.route is not None and
+                'compression_flush_interval' in request.route.options
+        ):
+            return request.route.options['compression_flush_interval']
+        content_type = header.content_type(headers)
+        if content_type is not None:
+            media_type = content_type[0].strip().lower()
+            if media_type in self.flush_intervals:
+                return self.flush_intervals[media_type]
+        return self.flush_interval
+
+    async def _compress_all(self, content: bytes, encoding: bytes) -> bytes:
+        return b''.join([
+            chunk
+            async for chunk in self._compress_as(
+                bytes_writer(content),
+                encoding,
+                len(content)
+            )
+        ])
+
+    async def _compress_cached(
+            self,
+            cache: CompressionCache,
+            resource: bytes,
+            headers: List[Tuple[bytes, bytes]],
+            body: AsyncIterable[bytes],
+            encoding: bytes,
+            content_length: Optional[int],
+            flush_interval: Optional[float]
+    ) -> Tuple[AsyncIterable[bytes], Optional[int]]:
+        etag = _strong_etag(headers)
+        if etag is not None:
+            key: CacheKey = (b'etag', resource, etag, encoding)
+            cached = cache.get(key)
+            if cached is None:
+                compressed = self._compress_as(
+                    body,
+                    encoding,
+                    content_length,
+                    flush_interval
+                )
+                return cache.record(key, compressed), None
+            await _close_body(body)
+            return bytes_writer(cached), len(cached)
+
+        if content_length is not None and content_length <= cache.max_entry_size:
+            # Hashing is much cheaper than compressing.
+            content = await bytes_reader(body)
+            key = (b'blake2b', hashlib.blake2b(content).digest(), encoding)
+            cached = cache.get(key)
+            if cached is None:
+                cached = await self._compress_all(content, encoding)
+                cache.put(key, cached)
+            return bytes_writer(cached), len(cached)
+
+        compressed = self._compress_as(
+            body,
+            encoding,
+            content_length,
+            flush_interval
+        )
+        return compressed, None
 
     def is_acceptable(
             self,
@@ -95,7 +676,8 @@ class CompressionMiddleware:
             self,
             accept_encoding: Mapping[bytes, float],
             content_encoding: List[bytes],
-            content_length: Optional[int]
+            content_length: Optional[int],
+            minimum_size: Optional[int] = None
     ) -> bool:
         """Returns True if the compression is desirable.
 
@@ -107,11 +689,16 @@ class CompressionMiddleware:
             accept_encoding (Mapping[bytes, float]): The requested encodings.
             content_encoding (List[bytes]): The current encoding.
             content_length (Optional[int]): The content length if available.
+            minimum_size (Optional[int], optional): The size below which no
+                compression will be attempted. Defaults to None, for the
+                minimum size of the middleware.
 
         Returns:
             bool: True if compression is desirable, otherwise False.
         """
-        if content_length is not None and content_length < self.minimum_size:
+        if minimum_size is None:
+            minimum_size = self.minimum_size
+        if content_length is not None and content_length < minimum_size:
             return False
 
         acceptable = {
@@ -139,17 +726,24 @@ class CompressionMiddleware:
     def select_encoding(self, accept_encoding: Mapping[bytes, float]) -> bytes:
         """Select the encoding based on the accepted encodings
 
+        Of the encodings with the highest quality, a preset dictionary
+        encoding is preferred, as a client only accepts it to opt in to it.
+
         Args:
             accept_encoding (Mapping[bytes, float]): The accepted encodings.
 
         Returns:
             bytes: The selected encoding.
         """
-        acceptable = sorted([
-            (encoding, quality)
-            for encoding, quality in accept_encoding.items()
-            if quality != 0 and encoding != b'identity'
-        ], key=lambda x: x[1])
+        acceptable = sorted(
+            [
+                (encoding, quality)
+                for encoding, quality in accept_encoding.items()
+                if quality != 0 and encoding != b'identity'
+            ],
+            key=lambda x: (x[1], x[0].startswith(ZDICT_ENCODING_PREFIX)),
+            reverse=True
+        )
 
         return next(
             encoding
@@ -157,6 +751,25 @@ class CompressionMiddleware:
             if encoding in self.compressors
         )
 
+    def select_minimum_size(self, accept_encoding: Mapping[bytes, float]) -> int:
+        """Select the minimum size for the encoding which would be used.
+
+        Args:
+            accept_encoding (Mapping[bytes, float]): The accepted encodings.
+
+        Returns:
+            int: The size below which no compression will be attempted.
+        """
+        if not any(
+                quality != 0 and encoding in self.compressors
+                for encoding, quality in accept_encoding.items()
+        ):
+            return self.minimum_size
+        return self.minimum_sizes.get(
+            self.select_encoding(accept_encoding),
+            self.minimum_size
+        )
+
     async def __call__(
             self,
             request: HttpRequest,
@@ -186,7 +799,9 @@ class CompressionMiddleware:
                         request.info,
                         request.context,
                         request.matches,
-                        decompressed_body
+                        decompressed_body,
+                        request.route,
+                        request.deadline
                     )
                     break
             else:
@@ -214,9 +829,36 @@ class CompressionMiddleware:
             return HttpResponse(406)
 
         content_length = header.content_length(response.headers)
-        if not self.is_desirable(accept_encoding, content_encoding, content_length):
+        minimum_size = self.select_minimum_size(accept_encoding)
+        if not self.is_desirable(
+                accept_encoding,
+                content_encoding,
+                content_length,
+                minimum_size
+        ):
             return response
 
+        if (
+                content_length is None and
+                response.body is not None and
+                minimum_size > 0
+        ):
+            # Read enough of the body to tell if it is worth compressing.
+            prefix, body = await _peek_body(
+                response.body,
+                minimum_size,
+                self.peek_timeout
+            )
+            if body is None:
+                # The whole body is shorter than the minimum size.
+                content = b''.join(prefix)
+                response.headers.append(
+                    (b'content-length', str(len(content)).encode('ascii'))
+                )
+                response.body = bytes_writer(content)
+                return response
+            response.body = body
+
         vary = header.vary(response.headers) or []
 
         encoding = self.select_encoding(accept_encoding)
@@ -225,8 +867,9 @@ class CompressionMiddleware:
         response.headers = [(k, v) for k, v in response.headers if k not in (
             b'content-length', b'content-encoding', b'vary')]
 
-        # Add the content-encoding. We don't know the length, so the content
-        # length is omitted and chunking is used.
+        # Add the content-encoding. Unless the compressed body is cached the
+        # length is not known, so the content length is omitted and chunking
+        # is used.
         response.headers.append((b'content-encoding', encoding))
 
         # Add accept-encoding to the vary header to indicate this is the same
@@ -235,13 +878,30 @@ class CompressionMiddleware:
             vary.append(b'accept-encoding')
         response.headers.append((b'vary', b', '.join(vary)))
 
-        # Get the compressor class.
-        compressor_cls = self.compressors[encoding]
-
-        response.body = (
-            None if response.body is None
-            else compression_writer_adapter(response.body, compressor_cls())
-        )
+        flush_interval = self.select_flush_interval(request, response.headers)
+        if response.body is None:
+            pass
+        elif self.cache is None:
+            response.body = self._compress_as(
+                response.body,
+                encoding,
+                content_length,
+                flush_interval
+            )
+        else:
+            response.body, compressed_length = await self._compress_cached(
+                self.cache,
+                _resource(request),
+                response.headers,
+                response.body,
+                encoding,
+                content_length,
+                flush_interval
+            )
+            if compressed_length is not None:
+                response.headers.append(
+                    (b'content-length', str(compressed_length).encode('ascii'))
+                )
 
         # Return the response with the body wrapped in the compressor adapter.
         return response
@@ -249,7 +909,11 @@ class CompressionMiddleware:
 
 def make_default_compression_middleware(
         *,
-        minimum_size: int = 512
+        minimum_size: int = 512,
+        offload_threshold: Optional[int] = None,
+        level_selector: Optional[AdaptiveCompressionLevel] = None,
+        zdict: Optional[bytes] = None,
+        zdict_minimum_size: int = 64
 ) -> CompressionMiddleware:
     """Makes the compression middleware with the default compressors: gzip, and
     deflate.
@@ -264,20 +928,41 @@ def make_default_compression_middleware(
     Args:
         minimum_size (int, optional): An optional size below which no
             compression is performed. Defaults to 512.
+        offload_threshold (Optional[int], optional): An optional chunk size
+            at or above which compression is performed in a thread. Defaults
+            to None.
+        level_selector (Optional[AdaptiveCompressionLevel], optional): An
+            optional selector of the compression level by load and content
+            length. Defaults to None.
+        zdict (Optional[bytes], optional): An optional preset dictionary, as
+            made by `train_zdict`, for clients which accept the encoding
+            given by `zdict_encoding`. Defaults to None.
+        zdict_minimum_size (int, optional): The size below which no
+            compression is performed with the preset dictionary. Defaults to
+            64.
 
     Returns:
         CompressionMiddleware: The compression middleware.
     """
-    compressors = {
+    compressors: Dict[bytes, CompressorFactory] = {
         b'gzip': make_gzip_compressobj,
         b'deflate': make_deflate_compressobj
     }
-    decompressors = {
+    decompressors: Dict[bytes, DecompressorFactory] = {
         b'gzip': make_gzip_decompressobj,
         b'deflate': make_deflate_decompressobj
     }
+    minimum_sizes: Dict[bytes, int] = {}
+    if zdict is not None:
+        encoding = zdict_encoding(zdict)
+        compressors[encoding] = make_zdict_compressor_factory(zdict)
+        decompressors[encoding] = make_zdict_decompressor_factory(zdict)
+        minimum_sizes[encoding] = zdict_minimum_size
     return CompressionMiddleware(
         compressors,
         decompressors,
-        minimum_size
+        minimum_size,
+        offload_threshold=offload_threshold,
+        level_selector=level_selector,
+        minimum_sizes=minimum_sizes
     )
@@ -0,0 +1,198 @@
+"""Deflate with a preset dictionary.
+
+Small responses, such as JSON documents with the same keys, compress poorly
+as there is little repetition within each one. A preset dictionary of the
+content they share primes the compressor, so even a short body refers back
+to it. The client must hold the same dictionary, so it is only used when the
+client asks for it with an encoding token naming the dictionary.
+
+A dictionary is trained from recorded responses with the command line:
+
+```bash
+python -m bareasgi.middlewares.zdict_tool \\
+    --size 16384 --output responses.zdict responses/*.json
+```
+"""
+
+from collections import Counter
+import hashlib
+import heapq
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple
+)
+import zlib
+
+from bareutils import (
+    Compressor,
+    CompressorFactory,
+    Decompressor,
+    DecompressorFactory
+)
+
+ZDICT_ENCODING_PREFIX = b'x-deflate-dict-'
+
+
+def zdict_encoding(zdict: bytes) -> bytes:
+    """Make the content encoding token for a dictionary.
+
+    The token includes a hash of the dictionary, so a client holding a
+    different version of it is not sent a body it cannot decompress.
+
+    Args:
+        zdict (bytes): The dictionary.
+
+    Returns:
+        bytes: The encoding token, e.g. b'x-deflate-dict-0123456789abcdef'.
+    """
+    digest = hashlib.sha256(zdict).hexdigest()[:16]
+    return ZDICT_ENCODING_PREFIX + digest.encode('ascii')
+
+
+def make_zdict_compressor_factory(
+        zdict: bytes,
+        level: int = 9
+) -> CompressorFactory:
+    """Make a factory for raw deflate compressors with a preset dictionary.
+
+    Args:
+        zdict (bytes): The dictionary.
+        level (int, optional): The compression level. Defaults to 9.
+
+    Returns:
+        CompressorFactory: The compressor factory.
+    """
+    def make_compressobj() -> Compressor:
+        return zlib.compressobj(  # type: ignore
+            level,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zdict=zdict
+        )
+    return make_compressobj
+
+
+def make_zdict_decompressor_factory(zdict: bytes) -> DecompressorFactory:
+    """Make a factory for raw deflate decompressors with a preset dictionary.
+
+    Args:
+        zdict (bytes): The dictionary.
+
+    Returns:
+        DecompressorFactory: The decompressor factory.
+    """
+    def make_decompressobj() -> Decompressor:
+        return zlib.decompressobj(  # type: ignore
+            -zlib.MAX_WBITS,
+            zdict=zdict
+        )
+    return make_decompressobj
+
+
+def _segments(data: bytes, segment_size: int) -> Iterator[bytes]:
+    return (
+        data[i:i + segment_size]
+        for i in range(len(data) - segment_size + 1)
+    )
+
+
+def _common_substrings(
+        samples: Sequence[bytes],
+        segment_size: int,
+        min_count: int
+) -> Tuple[Counter, Set[bytes]]:
+    # Count the samples each segment occurs in.
+    segment_counts: Counter = Counter()
+    for sample in samples:
+        segment_counts.update(set(_segments(sample, segment_size)))
+
+    # Join overlapping segments which occur in enough samples into the
+    # longest runs.
+    substrings: Set[bytes] = set()
+    for sample in samples:
+        end = len(sample) - segment_size + 1
+        start: Optional[int] = None
+        for i in range(end + 1):
+            if (
+                    i < end and
+                    segment_counts[sample[i:i + segment_size]] >= min_count
+            ):
+                if start is None:
+                    start = i
+            elif start is not None:
+                substrings.add(sample[start:i - 1 + segment_size])
+                start = None
+    return segment_counts, substrings
+
+
+def train_zdict(
+        samples: Iterable[bytes],
+        size: int = 32768,
+        *,
+        segment_size: int = 8,
+        min_count: int = 2
+) -> bytes:
+    """Train a preset dictionary from sample bodies.
+
+    The substrings shared by the samples are chosen greedily by how often
+    their segments occur, only counting segments which are not already in
+    the dictionary, so similar substrings are not repeated. Deflate finds
+    matches near the end of the dictionary more cheaply, so the best
+    substrings are placed last.
+
+    ```python
+    zdict = train_zdict(recorded_responses, 16384)
+    with open('responses.zdict', 'wb') as file:
+        file.write(zdict)
+    ```
+
+    Args:
+        samples (Iterable[bytes]): The sample bodies.
+        size (int, optional): The maximum size of the dictionary. Deflate only
+            refers back 32 KiB, so a larger dictionary is not useful.
+            Defaults to 32768.
+        segment_size (int, optional): The length of the shortest substring
+            considered. Defaults to 8.
+        min_count (int, optional): The number of samples a substring must
+            occur in. Defaults to 2.
+
+    Returns:
+        bytes: The dictionary.
+    """
+    segment_counts, substrings = _common_substrings(
+        list(samples),
+        segment_size,
+        min_count
+    )
+    covered: Set[bytes] = set()
+
+    def gain(substring: bytes) -> int:
+        return sum(
+            segment_counts[segment]
+            for segment in set(_segments(substring, segment_size))
+            if segment not in covered
+        )
+
+    # The gains only fall as the dictionary grows, so a gain from the heap
+    # need only be recalculated when its substring reaches the top.
+    heap = [(-gain(substring), substring) for substring in substrings]
+    heapq.heapify(heap)
+    selected: List[bytes] = []
+    total = 0
+    while heap and total < size:
+        _, substring = heapq.heappop(heap)
+        current = gain(substring)
+        if current == 0 or total + len(substring) > size:
+            continue
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, substring))
+            continue
+        selected.append(substring)
+        covered.update(_segments(substring, segment_size))
+        total += len(substring)
+    return b''.join(reversed(selected))
@@ -0,0 +1,284 @@
+"""Adaptive compression levels"""
+
+import asyncio
+import time
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Mapping,
+    Optional
+)
+import zlib
+
+from bareutils import Compressor
+
+LeveledCompressorFactory = Callable[[int], Compressor]
+
+
+def make_leveled_gzip_compressobj(level: int) -> Compressor:
+    """Make a compressor for 'gzip' at a given level.
+
+    Args:
+        level (int): The compression level from 1 to 9.
+
+    Returns:
+        Compressor: A gzip compressor.
+    """
+    return zlib.compressobj(  # type: ignore
+        level,
+        zlib.DEFLATED,
+        zlib.MAX_WBITS | 16
+    )
+
+
+def make_leveled_deflate_compressobj(level: int) -> Compressor:
+    """Make a compressor for 'deflate' at a given level.
+
+    Args:
+        level (int): The compression level from 1 to 9.
+
+    Returns:
+        Compressor: A deflate compressor.
+    """
+    return zlib.compressobj(  # type: ignore
+        level,
+        zlib.DEFLATED,
+        -zlib.MAX_WBITS
+    )
+
+
+DEFAULT_LEVELED_COMPRESSORS: Mapping[bytes, LeveledCompressorFactory] = {
+    b'gzip': make_leveled_gzip_compressobj,
+    b'deflate': make_leveled_deflate_compressobj
+}
+
+
+class LoadMonitor:
+    """Measures the load of the process.
+
+    A background task sleeps for `interval` seconds at a time. The amount by
+    which it wakes late is the event loop lag, and the CPU time used while it
+    slept gives the CPU usage. Both are smoothed with an exponentially
+    weighted moving average. The task runs between `start` and `stop`, which
+    the compression middleware calls from its lifespan handlers.
+    """
+
+    def __init__(self, interval: float = 0.1, smoothing: float = 0.2) -> None:
+        """Construct the load monitor.
+
+        Args:
+            interval (float, optional): The sampling interval in seconds.
+                Defaults to 0.1.
+            smoothing (float, optional): The weight of a new sample. Defaults
+                to 0.2.
+        """
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self.cpu_usage = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _update(self, lag: float, cpu_usage: float) -> None:
+        self.lag += self.smoothing * (lag - self.lag)
+        self.cpu_usage += self.smoothing * (cpu_usage - self.cpu_usage)
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start, cpu_start = loop.time(), time.process_time()
+            await asyncio.sleep(self.interval)
+            elapsed = loop.time() - start
+            self._update(
+                max(0.0, elapsed - self.interval),
+                (time.process_time() - cpu_start) / elapsed
+            )
+
+    def start(self) -> None:
+        """Start sampling, if it has not already started."""
+        if not self.is_running:
+            self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    @property
+    def is_running(self) -> bool:
+        """True if the load is being sampled.
+
+        Returns:
+            bool: True if the sampling task is running.
+        """
+        return self._task is not None and not self._task.done()
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+class AdaptiveCompressionLevel:
+    """Chooses the compression level from the load and the payload size.
+
+    When the event loop lag, or the CPU usage, is low the best compression is
+    used, and as it rises the level falls towards the fastest. Large payloads
+    are limited to `large_payload_level`, as the highest levels cost much more
+    time for little gain.
+
+    The load is only measured while the monitor runs, so the lifespan
+    handlers of the middleware should be registered with the application.
+
+    ```python
+    middleware = make_default_compression_middleware(
+        level_selector=AdaptiveCompressionLevel()
+    )
+    app = Application(
+        middlewares=[middleware],
+        startup_handlers=[middleware.startup],
+        shutdown_handlers=[middleware.shutdown]
+    )
+    ```
+    """
+
+    def __init__(
+            self,
+            *,
+            min_level: int = 1,
+            max_level: int = 9,
+            low_lag: float = 0.005,
+            high_lag: float = 0.05,
+            max_cpu_usage: Optional[float] = None,
+            large_payload_size: int = 1024 * 1024,
+            large_payload_level: int = 6,
+            monitor: Optional[LoadMonitor] = None
+    ) -> None:
+        """Construct the adaptive compression level.
+
+        Args:
+            min_level (int, optional): The level under high load. Defaults to
+                1.
+            max_level (int, optional): The level under low load. Defaults to
+                9.
+            low_lag (float, optional): The event loop lag in seconds below
+                which the maximum level is used. Defaults to 0.005.
+            high_lag (float, optional): The event loop lag in seconds above
+                which the minimum level is used. Defaults to 0.05.
+            max_cpu_usage (Optional[float], optional): If given, the CPU usage
+                as a fraction of one core at which the minimum level is used.
+                Defaults to None.
+            large_payload_size (int, optional): The content length at or
+                above which a payload is large. Defaults to 1 MiB.
+            large_payload_level (int, optional): The maximum level for large
+                payloads. Defaults to 6.
+            monitor (Optional[LoadMonitor], optional): The load monitor.
+                Defaults to None.
+        """
+        self.min_level = min_level
+        self.max_level = max_level
+        self.low_lag = low_lag
+        self.high_lag = high_lag
+        self.max_cpu_usage = max_cpu_usage
+        self.large_payload_size = large_payload_size
+        self.large_payload_level = large_payload_level
+        self.monitor = monitor or LoadMonitor()
+
+    @property
+    def load(self) -> float:
+        """The load, from 0 for idle to 1 for overloaded.
+
+        Returns:
+            float: The load.
+        """
+        load = (self.monitor.lag - self.low_lag) / (self.high_lag - self.low_lag)
+        if self.max_cpu_usage is not None:
+            load = max(load, self.monitor.cpu_usage / self.max_cpu_usage)
+        return min(1.0, max(0.0, load))
+
+    def select(self, content_length: Optional[int]) -> int:
+        """Select the compression level for a response.
+
+        Args:
+            content_length (Optional[int]): The length of the uncompressed
+                body, if known.
+
+        Returns:
+            int: The compression level.
+        """
+        level = round(
+            self.max_level - self.load * (self.max_level - self.min_level)
+        )
+        if (
+                content_length is not None and
+                content_length >= self.large_payload_size
+        ):
+            level = min(level, self.large_payload_level)
+        return max(self.min_level, level)
+
+
+class CompressionLevelMetrics:
+    """The number of responses, and the bytes in and out, by level"""
+
+    def __init__(self) -> None:
+        self.responses: Dict[int, int] = {}
+        self.bytes_in: Dict[int, int] = {}
+        self.bytes_out: Dict[int, int] = {}
+
+    def record(self, level: int, bytes_in: int, bytes_out: int) -> None:
+        """Record a compressed response.
+
+        Args:
+            level (int): The compression level.
+            bytes_in (int): The size of the uncompressed body.
+            bytes_out (int): The size of the compressed body.
+        """
+        self.responses[level] = self.responses.get(level, 0) + 1
+        self.bytes_in[level] = self.bytes_in.get(level, 0) + bytes_in
+        self.bytes_out[level] = self.bytes_out.get(level, 0) + bytes_out
+
+    async def measure(
+            self,
+            level: int,
+            body: AsyncIterable[bytes],
+            compress: Callable[[AsyncIterable[bytes]], AsyncIterable[bytes]]
+    ) -> AsyncIterator[bytes]:
+        """Compress a body, recording its size before and after when it is
+        complete.
+
+        Args:
+            level (int): The compression level.
+            body (AsyncIterable[bytes]): The uncompressed body.
+            compress (Callable[[AsyncIterable[bytes]], AsyncIterable[bytes]]):
+                A function to compress the body.
+
+        Yields:
+            bytes: The compressed body.
+        """
+        bytes_in = bytes_out = 0
+
+        async def count(body: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+            nonlocal bytes_in
+            async for chunk in body:
+                bytes_in += len(chunk)
+                yield chunk
+
+        async for chunk in compress(count(body)):
+            bytes_out += len(chunk)
+            yield chunk
+        self.record(level, bytes_in, bytes_out)
+
+    @property
+    def ratios(self) -> Dict[int, float]:
+        """The compression ratio achieved at each level.
+
+        Returns:
+            Dict[int, float]: The uncompressed size divided by the compressed
+                size, by level.
+        """
+        return {
+            level: self.bytes_in[level] / bytes_out
+            for level, bytes_out in self.bytes_out.items()
+            if bytes_out
+        }
@@ -0,0 +1,290 @@
+"""Middleware for concurrency limiting and load shedding"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from ..http import (
+    HttpRequestCallback,
+    HttpRequest,
+    HttpResponse
+)
+
+from .utils import make_rejection_response_factory
+
+LOGGER = logging.getLogger(__name__)
+
+# A waiter is ordered by the negated priority, then by arrival.
+_Waiter = Tuple[int, int, asyncio.Future]
+
+
+class PriorityClassMetrics:
+    """The metrics for the requests of a priority class"""
+
+    def __init__(self) -> None:
+        self.admitted_count = 0
+        self.shed_count = 0
+        self.total_wait_time = 0.0
+        self.total_handler_time = 0.0
+        self.max_handler_time = 0.0
+
+    @property
+    def mean_wait_time(self) -> float:
+        """The mean time in seconds an admitted request waited in the queue.
+
+        Returns:
+            float: The mean wait time.
+        """
+        return (
+            self.total_wait_time / self.admitted_count
+            if self.admitted_count
+            else 0.0
+        )
+
+    @property
+    def mean_handler_time(self) -> float:
+        """The mean time in seconds taken by the handler.
+
+        Returns:
+            float: The mean handler time.
+        """
+        return (
+            self.total_handler_time / self.admitted_count
+            if self.admitted_count
+            else 0.0
+        )
+
+
+def _record_admission(
+        metrics: PriorityClassMetrics,
+        start: float,
+        admitted: float
+) -> None:
+    handler_time = time.monotonic() - admitted
+    metrics.admitted_count += 1
+    metrics.total_wait_time += admitted - start
+    metrics.total_handler_time += handler_time
+    metrics.max_handler_time = max(metrics.max_handler_time, handler_time)
+
+
+class ConcurrencyLimitMiddleware:
+    """Concurrency limiting middleware
+
+    Requests are admitted while fewer than `max_concurrency` handlers are in
+    flight. Further requests wait in a bounded queue for at most
+    `queue_timeout` seconds. When the queue is full, or the wait times out, the
+    request is shed with a pre-built "503 Service Unavailable" response.
+
+    Routes may be given a priority when they are registered, which defaults to
+    0.
+
+    ```python
+    app.http_router.add({'GET'}, '/health', health_check, priority=10)
+    ```
+
+    Queued requests are admitted in priority order. When the queue is full a
+    request evicts the lowest priority queued request if it has a higher
+    priority. Routes with a priority of at least `bypass_priority` are never
+    queued or shed.
+
+    Note that a request is in flight while the downstream handler runs. The
+    streaming of the response body happens after the slot has been released.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            max_queue: int = 0,
+            queue_timeout: Optional[float] = None,
+            *,
+            bypass_priority: Optional[int] = None,
+            retry_after: int = 1,
+            body: bytes = b'Service Unavailable'
+    ) -> None:
+        """Constructs the concurrency limiting middleware.
+
+        ```python
+        concurrency_middleware = ConcurrencyLimitMiddleware(
+            100,
+            max_queue=200,
+            queue_timeout=0.5
+        )
+        app = Application(middlewares=[concurrency_middleware])
+        ```
+
+        Args:
+            max_concurrency (int): The maximum number of requests in flight.
+            max_queue (int, optional): The maximum number of requests waiting
+                for admission. Defaults to 0.
+            queue_timeout (Optional[float], optional): The maximum time in
+                seconds a request may wait for admission, or None to wait
+                indefinitely. Defaults to None.
+            bypass_priority (Optional[int], optional): The route priority at
+                or above which requests are always admitted, or None for no
+                bypass. Defaults to None.
+            retry_after (int, optional): The value in seconds of the
+                `retry-after` header sent with a shed request. Defaults to 1.
+            body (bytes, optional): The body of the 503 response. Defaults to
+                b'Service Unavailable'.
+        """
+        if max_concurrency < 1:
+            raise ValueError('The maximum concurrency must be at least 1')
+        if max_queue < 0:
+            raise ValueError('The maximum queue size cannot be negative')
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bypass_priority = bypass_priority
+
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._shed_count = 0
+        self._class_metrics: Dict[int, PriorityClassMetrics] = {}
+
+        self._overloaded_response = make_rejection_response_factory(
+            503,
+            body,
+            retry_after
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests currently being handled.
+
+        Returns:
+            int: The number of requests in flight.
+        """
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests waiting for admission.
+
+        Returns:
+            int: The number of queued requests.
+        """
+        return len(self._waiters)
+
+    @property
+    def shed_count(self) -> int:
+        """The number of requests rejected since the middleware was created.
+
+        Returns:
+            int: The number of shed requests.
+        """
+        return self._shed_count
+
+    @property
+    def class_metrics(self) -> Mapping[int, PriorityClassMetrics]:
+        """The metrics for each priority class seen so far.
+
+        Returns:
+            Mapping[int, PriorityClassMetrics]: The metrics keyed by priority.
+        """
+        return self._class_metrics
+
+    def _remove_waiter(self, entry: _Waiter) -> None:
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+    async def _acquire(self, priority: int) -> bool:
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            if not self._waiters:
+                return False
+            lowest = max(self._waiters)
+            if lowest[0] <= -priority:
+                return False
+            # Make room by evicting the lowest priority waiter.
+            self._remove_waiter(lowest)
+            lowest[2].set_result(False)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self._sequence), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                if waiter.result():
+                    # The slot was handed over as the task was cancelled.
+                    self._release()
+            else:
+                waiter.cancel()
+                self._remove_waiter(entry)
+            raise
+
+        if waiter.done():
+            # Either a slot was handed over, or the waiter was evicted.
+            return waiter.result()
+
+        waiter.cancel()
+        self._remove_waiter(entry)
+        return False
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # Hand the slot directly to the next waiter.
+                waiter.set_result(True)
+                return
+        self._in_flight -= 1
+
+    async def __call__(
+            self,
+            request: HttpRequest,
+            handler: HttpRequestCallback
+    ) -> HttpResponse:
+        """Call the handler if the request can be admitted.
+
+        Args:
+            request (HttpRequest): The request.
+            handler (HttpRequestCallback): The handler to call.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        priority: int = (
+            request.route.options.get('priority', 0)
+            if request.route is not None
+            else 0
+        )
+        metrics = self._class_metrics.get(priority)
+        if metrics is None:
+            metrics = PriorityClassMetrics()
+            self._class_metrics[priority] = metrics
+
+        if self.bypass_priority is not None and priority >= self.bypass_priority:
+            start = time.monotonic()
+            try:
+                return await handler(request)
+            finally:
+                _record_admission(metrics, start, start)
+
+        start = time.monotonic()
+        if not await self._acquire(priority):
+            self._shed_count += 1
+            metrics.shed_count += 1
+            LOGGER.warning(
+                'Shedding request for "%s" (in flight %d, queued %d).',
+                request.scope['path'],
+                self._in_flight,
+                len(self._waiters)
+            )
+            return self._overloaded_response()
+
+        admitted = time.monotonic()
+        try:
+            return await handler(request)
+        finally:
+            self._release()
+            _record_admission(metrics, start, admitted)
@@ -0,0 +1,276 @@
+"""Middleware for per-client fair queuing"""
+
+import asyncio
+from collections import deque
+import logging
+from typing import Callable, Deque, Dict, Optional
+
+from ..http import (
+    HttpRequestCallback,
+    HttpRequest,
+    HttpResponse
+)
+
+from .utils import (
+    ClientKeyFunction,
+    client_address_key,
+    make_rejection_response_factory
+)
+
+LOGGER = logging.getLogger(__name__)
+
+ClientWeightFunction = Callable[[str], float]
+
+
+class _ClientState:
+
+    def __init__(self, weight: float) -> None:
+        self.weight = weight
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        self.deficit = 0.0
+
+
+class FairQueuingMiddleware:
+    """Per-client fair queuing middleware
+
+    Requests are admitted while fewer than `max_concurrency` handlers are in
+    flight. Further requests wait in a bounded queue for their client. When a
+    handler completes the next request is chosen from the client queues by
+    deficit round robin, so a client with a long queue cannot starve the
+    others.
+
+    A client whose queue is full receives a "429 Too Many Requests" response.
+    When the number of tracked clients reaches `max_clients`, or a queued
+    request times out, a "503 Service Unavailable" response is returned. The
+    state of a client is discarded as soon as it has no requests queued or in
+    flight, so the memory used is bounded by `max_clients` and
+    `max_queue_per_client`.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            max_queue_per_client: int = 10,
+            queue_timeout: Optional[float] = None,
+            *,
+            client_key: ClientKeyFunction = client_address_key,
+            client_weight: Optional[ClientWeightFunction] = None,
+            max_clients: int = 10000,
+            retry_after: int = 1
+    ) -> None:
+        """Constructs the fair queuing middleware.
+
+        ```python
+        fair_queuing_middleware = FairQueuingMiddleware(
+            100,
+            max_queue_per_client=20,
+            client_key=make_header_key(b'x-api-key')
+        )
+        app = Application(middlewares=[fair_queuing_middleware])
+        ```
+
+        Args:
+            max_concurrency (int): The maximum number of requests in flight.
+            max_queue_per_client (int, optional): The maximum number of
+                requests a client may have waiting. Defaults to 10.
+            queue_timeout (Optional[float], optional): The maximum time in
+                seconds a request may wait for admission, or None to wait
+                indefinitely. Defaults to None.
+            client_key (ClientKeyFunction, optional): A function to identify
+                the client of a request. Defaults to client_address_key.
+            client_weight (Optional[ClientWeightFunction], optional): A
+                function returning the share of a client relative to the
+                default of 1. Defaults to None.
+            max_clients (int, optional): The maximum number of clients for
+                which state is kept. Defaults to 10000.
+            retry_after (int, optional): The value in seconds of the
+                `retry-after` header sent with a rejected request. Defaults to
+                1.
+        """
+        if max_concurrency < 1:
+            raise ValueError('The maximum concurrency must be at least 1')
+
+        self.max_concurrency = max_concurrency
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.client_key = client_key
+        self.client_weight = client_weight
+        self.max_clients = max_clients
+
+        self._clients: Dict[str, _ClientState] = {}
+        self._active: Deque[str] = deque()
+        self._in_flight = 0
+        self._queue_depth = 0
+        self._shed_count = 0
+
+        self._too_many_requests_response = make_rejection_response_factory(
+            429,
+            b'Too Many Requests',
+            retry_after
+        )
+        self._overloaded_response = make_rejection_response_factory(
+            503,
+            b'Service Unavailable',
+            retry_after
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests currently being handled.
+
+        Returns:
+            int: The number of requests in flight.
+        """
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests waiting for admission across all clients.
+
+        Returns:
+            int: The number of queued requests.
+        """
+        return self._queue_depth
+
+    @property
+    def client_count(self) -> int:
+        """The number of clients with requests queued or in flight.
+
+        Returns:
+            int: The number of clients.
+        """
+        return len(self._clients)
+
+    @property
+    def shed_count(self) -> int:
+        """The number of requests rejected since the middleware was created.
+
+        Returns:
+            int: The number of rejected requests.
+        """
+        return self._shed_count
+
+    def _discard_if_idle(self, key: str, state: _ClientState) -> None:
+        if state.in_flight == 0 and not state.waiters:
+            del self._clients[key]
+
+    def _dequeue(
+            self,
+            key: str,
+            state: _ClientState,
+            waiter: asyncio.Future
+    ) -> None:
+        state.waiters.remove(waiter)
+        self._queue_depth -= 1
+        if not state.waiters:
+            self._active.remove(key)
+            state.deficit = 0.0
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.max_concurrency and self._active:
+            key = self._active[0]
+            state = self._clients[key]
+            if state.deficit < 1:
+                state.deficit += state.weight
+                if state.deficit < 1:
+                    self._active.rotate(-1)
+                    continue
+
+            waiter = state.waiters.popleft()
+            self._queue_depth -= 1
+            state.deficit -= 1
+            if not state.waiters:
+                self._active.popleft()
+                state.deficit = 0.0
+            elif state.deficit < 1:
+                self._active.rotate(-1)
+
+            state.in_flight += 1
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    async def _acquire(
+            self,
+            key: str,
+            state: _ClientState
+    ) -> Optional[HttpResponse]:
+        if self._in_flight < self.max_concurrency and not self._active:
+            state.in_flight += 1
+            self._in_flight += 1
+            return None
+
+        if len(state.waiters) >= self.max_queue_per_client:
+            return self._too_many_requests_response()
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        self._queue_depth += 1
+        if len(state.waiters) == 1:
+            self._active.append(key)
+
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot was handed over as the task was cancelled.
+                self._release(key, state)
+            else:
+                self._dequeue(key, state, waiter)
+                self._discard_if_idle(key, state)
+            raise
+
+        if waiter.done():
+            return None
+
+        self._dequeue(key, state, waiter)
+        return self._overloaded_response()
+
+    def _release(self, key: str, state: _ClientState) -> None:
+        state.in_flight -= 1
+        self._in_flight -= 1
+        self._dispatch()
+        self._discard_if_idle(key, state)
+
+    async def __call__(
+            self,
+            request: HttpRequest,
+            handler: HttpRequestCallback
+    ) -> HttpResponse:
+        """Call the handler when the request is admitted.
+
+        Args:
+            request (HttpRequest): The request.
+            handler (HttpRequestCallback): The handler to call.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        key = self.client_key(request)
+        state = self._clients.get(key)
+        if state is None:
+            if len(self._clients) >= self.max_clients:
+                self._shed_count += 1
+                LOGGER.warning('Shedding request: too many clients.')
+                return self._overloaded_response()
+            weight = self.client_weight(key) if self.client_weight else 1.0
+            if weight <= 0:
+                raise ValueError('The client weight must be positive')
+            state = _ClientState(weight)
+            self._clients[key] = state
+
+        rejection = await self._acquire(key, state)
+        if rejection is not None:
+            self._shed_count += 1
+            self._discard_if_idle(key, state)
+            LOGGER.warning(
+                'Rejecting request from "%s" with %d.',
+                key,
+                rejection.status
+            )
+            return rejection
+
+        try:
+            return await handler(request)
+        finally:
+            self._release(key, state)
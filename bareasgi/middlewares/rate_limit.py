@@ -0,0 +1,217 @@
+"""Middleware for rate limiting"""
+
+from collections import OrderedDict
+import logging
+import math
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from ..http import (
+    HttpRequestCallback,
+    HttpRequest,
+    HttpResponse
+)
+
+from .utils import (
+    ClientKeyFunction,
+    client_address_key,
+    make_rejection_response_factory
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# A rate in tokens per second, and the burst size.
+RateLimit = Tuple[float, float]
+
+
+class TokenBucketStore:
+    """A memory bounded store of token buckets.
+
+    The buckets are held in least recently used order. A bucket which has
+    been idle long enough to refill is indistinguishable from a new bucket,
+    so the refilled buckets at the least recently used end are evicted as
+    buckets are taken from. When the store is still full the least recently
+    used bucket is evicted even though it has not refilled, which resets the
+    limit for its key.
+    """
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        """Construct the token bucket store.
+
+        Args:
+            max_keys (int, optional): The maximum number of buckets to hold.
+                Defaults to 100000.
+        """
+        self.max_keys = max_keys
+        # The tokens, the time they were counted, and the time the bucket
+        # will be full.
+        self._buckets: \
+            'OrderedDict[Hashable, Tuple[float, float, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(
+            self,
+            key: Hashable,
+            rate: float,
+            burst: float,
+            now: Optional[float] = None
+    ) -> float:
+        """Take a token from the bucket for a key.
+
+        Args:
+            key (Hashable): The key of the bucket.
+            rate (float): The number of tokens added per second.
+            burst (float): The capacity of the bucket.
+            now (Optional[float], optional): The current monotonic time.
+                Defaults to None.
+
+        Returns:
+            float: Zero if a token was taken, otherwise the number of seconds
+                until a token will be available.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        entry = self._buckets.pop(key, None)
+        if entry is None:
+            tokens = burst
+        else:
+            tokens, updated, _full_at = entry
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            delay = 0.0
+        else:
+            delay = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._evict(now)
+
+        return delay
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            _key, (_tokens, _updated, full_at) = next(
+                iter(self._buckets.items())
+            )
+            if full_at > now:
+                break
+            self._buckets.popitem(last=False)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class RateLimitMiddleware:
+    """Token bucket rate limiting middleware
+
+    Each key, by default the client address, has a bucket which refills at
+    `rate` tokens per second up to `burst` tokens. Every request takes a token,
+    and when the bucket is empty the request is rejected with a pre-built
+    "429 Too Many Requests" response.
+
+    A route may override the limit when it is registered. The bucket for such
+    a route is keyed by the route template, not the raw path, so all the paths
+    matching a route share a bucket.
+
+    ```python
+    app.http_router.add({'POST'}, '/login', login, rate_limit=(1, 5))
+    ```
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            burst: float,
+            *,
+            key: ClientKeyFunction = client_address_key,
+            max_keys: int = 100000
+    ) -> None:
+        """Construct the rate limiting middleware.
+
+        ```python
+        rate_limit_middleware = RateLimitMiddleware(
+            10,
+            20,
+            key=make_composite_key(client_address_key, route_key)
+        )
+        app = Application(middlewares=[rate_limit_middleware])
+        ```
+
+        Args:
+            rate (float): The number of requests per second allowed for each
+                key.
+            burst (float): The number of requests which may be made in a
+                burst.
+            key (ClientKeyFunction, optional): A function to make the key of
+                a request. Defaults to client_address_key.
+            max_keys (int, optional): The maximum number of keys to track.
+                Defaults to 100000.
+        """
+        if rate <= 0:
+            raise ValueError('The rate must be positive')
+        if burst < 1:
+            raise ValueError('The burst must be at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.store = TokenBucketStore(max_keys)
+        self._rejected_count = 0
+        self._rejections: Dict[int, Callable[[], HttpResponse]] = {}
+
+    @property
+    def rejected_count(self) -> int:
+        """The number of requests rejected since the middleware was created.
+
+        Returns:
+            int: The number of rejected requests.
+        """
+        return self._rejected_count
+
+    def _too_many_requests_response(self, delay: float) -> HttpResponse:
+        retry_after = max(1, math.ceil(delay))
+        make_response = self._rejections.get(retry_after)
+        if make_response is None:
+            make_response = make_rejection_response_factory(
+                429,
+                b'Too Many Requests',
+                retry_after
+            )
+            self._rejections[retry_after] = make_response
+        return make_response()
+
+    async def __call__(
+            self,
+            request: HttpRequest,
+            handler: HttpRequestCallback
+    ) -> HttpResponse:
+        """Call the handler if the request is within the rate limit.
+
+        Args:
+            request (HttpRequest): The request.
+            handler (HttpRequestCallback): The handler to call.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        route = request.route
+        route_limit: Optional[RateLimit] = (
+            route.options.get('rate_limit') if route is not None else None
+        )
+        if route is None or route_limit is None:
+            rate, burst = self.rate, self.burst
+            bucket_key: Hashable = self.key(request)
+        else:
+            rate, burst = route_limit
+            bucket_key = (route.path, self.key(request))
+
+        delay = self.store.take(bucket_key, rate, burst)
+        if delay > 0:
+            self._rejected_count += 1
+            LOGGER.debug('Rate limit exceeded for %r.', bucket_key)
+            return self._too_many_requests_response(delay)
+
+        return await handler(request)
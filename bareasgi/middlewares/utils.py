@@ -0,0 +1,108 @@
+"""Middleware utilities"""
+
+from typing import Callable, List, Tuple
+
+from bareutils import bytes_writer, header
+
+from ..http import HttpRequest, HttpResponse
+
+ClientKeyFunction = Callable[[HttpRequest], str]
+
+
+def client_address_key(request: HttpRequest) -> str:
+    """Identify the client by its address.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str: The host of the client, or an empty string if unknown.
+    """
+    client = request.scope.get('client')
+    return client[0] if client else ''
+
+
+def route_key(request: HttpRequest) -> str:
+    """Identify the request by the template of the matched route.
+
+    Using the template rather than the path means '/users/1' and '/users/2'
+    share a key.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str: The path template of the route, or an empty string if no route
+            was matched.
+    """
+    return request.route.path if request.route is not None else ''
+
+
+def make_header_key(
+        name: bytes,
+        fallback: ClientKeyFunction = client_address_key
+) -> ClientKeyFunction:
+    """Make a function to identify the client by a header, e.g. an API key.
+
+    Args:
+        name (bytes): The header name, e.g. b'x-api-key'.
+        fallback (ClientKeyFunction, optional): The function used when the
+            header is missing. Defaults to client_address_key.
+
+    Returns:
+        ClientKeyFunction: The key function.
+    """
+    def header_key(request: HttpRequest) -> str:
+        value = header.find(name, request.scope['headers'])
+        return value.decode('latin-1') if value else fallback(request)
+
+    return header_key
+
+
+def make_composite_key(*keys: ClientKeyFunction) -> ClientKeyFunction:
+    """Make a function which combines other key functions.
+
+    ```python
+    client_and_route_key = make_composite_key(client_address_key, route_key)
+    ```
+
+    Args:
+        *keys (ClientKeyFunction): The key functions to combine.
+
+    Returns:
+        ClientKeyFunction: The key function.
+    """
+    def composite_key(request: HttpRequest) -> str:
+        return '\0'.join(key(request) for key in keys)
+
+    return composite_key
+
+
+def make_rejection_response_factory(
+        status: int,
+        body: bytes,
+        retry_after: int
+) -> Callable[[], HttpResponse]:
+    """Make a factory for cheap rejection responses.
+
+    The headers are encoded once. Each call creates a new response, as the
+    body of a response can only be consumed once.
+
+    Args:
+        status (int): The status code, e.g. 503.
+        body (bytes): The body of the response.
+        retry_after (int): The value in seconds of the `retry-after` header.
+
+    Returns:
+        Callable[[], HttpResponse]: A function which makes the response.
+    """
+    headers: List[Tuple[bytes, bytes]] = [
+        (b'content-type', b'text/plain'),
+        (b'content-length', str(len(body)).encode('ascii')),
+        (b'retry-after', str(retry_after).encode('ascii'))
+    ]
+
+    def make_response() -> HttpResponse:
+        return HttpResponse(status, list(headers), bytes_writer(body))
+
+    return make_response
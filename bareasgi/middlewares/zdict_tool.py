@@ -0,0 +1,78 @@
+"""Train a preset deflate dictionary from recorded responses.
+
+```bash
+python -m bareasgi.middlewares.zdict_tool \\
+    --size 16384 --output responses.zdict responses/*.json
+```
+"""
+
+import argparse
+from typing import Iterable, List, Optional, Sequence
+
+from .compression_dictionary import train_zdict, zdict_encoding
+
+
+def _read_samples(paths: Iterable[str], is_lines: bool) -> List[bytes]:
+    samples: List[bytes] = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            if is_lines:
+                samples.extend(
+                    line.rstrip(b'\r\n')
+                    for line in file
+                    if line.strip()
+                )
+            else:
+                samples.append(file.read())
+    return samples
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Train a dictionary from recorded responses on the command line.
+
+    Args:
+        argv (Optional[Sequence[str]], optional): The arguments. Defaults to
+            None, for the arguments of the process.
+    """
+    parser = argparse.ArgumentParser(
+        description='Train a preset deflate dictionary.'
+    )
+    parser.add_argument('paths', nargs='+', help='files of recorded responses')
+    parser.add_argument(
+        '--output',
+        '-o',
+        required=True,
+        help='the dictionary file'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=32768,
+        help='the maximum size'
+    )
+    parser.add_argument(
+        '--lines',
+        action='store_true',
+        help='each line of a file is a response, e.g. newline delimited JSON'
+    )
+    parser.add_argument('--segment-size', type=int, default=8)
+    parser.add_argument('--min-count', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    samples = _read_samples(args.paths, args.lines)
+    zdict = train_zdict(
+        samples,
+        args.size,
+        segment_size=args.segment_size,
+        min_count=args.min_count
+    )
+    with open(args.output, 'wb') as file:
+        file.write(zdict)
+    print(
+        f'Trained a {len(zdict)} byte dictionary from {len(samples)} samples '
+        f'for the encoding {zdict_encoding(zdict).decode("ascii")}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -3,13 +3,11 @@ An example using forms.
 """
 
 import logging
-import urllib.parse
 
 from bareasgi import (
     Application,
     HttpRequest,
     HttpResponse,
-    text_reader,
     text_writer
 )
 
@@ -50,8 +48,7 @@ async def get_form(_request: HttpRequest) -> HttpResponse:
 
 async def post_form(request: HttpRequest) -> HttpResponse:
     """A request handler for the form POST"""
-    text = await text_reader(request.body)
-    data = urllib.parse.parse_qs(text)
+    data = await request.form()
     print(data)
     return HttpResponse(
         200,
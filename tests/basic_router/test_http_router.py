@@ -89,3 +89,35 @@ def test_path_type():
     assert handler is ok_handler
     assert 'rest' in matches
     assert matches['rest'] == 'folder/other.html'
+
+
+def test_resolve_route():
+    """Test the matched route is resolved"""
+    basic_route_handler = BasicHttpRouter(DEFAULT_NOT_FOUND_RESPONSE)
+    basic_route_handler.add({'GET'}, '/foo/{id:int}', ok_handler)
+
+    handler, matches, route = basic_route_handler.resolve_route(
+        'GET',
+        '/foo/123'
+    )
+    assert handler is ok_handler
+    assert matches == {'id': 123}
+    assert route is not None and route.path == '/foo/{id:int}'
+
+    _handler, _matches, route = basic_route_handler.resolve_route(
+        'GET',
+        '/bar'
+    )
+    assert route is None
+
+
+def test_route_options():
+    """Test route options are available on the resolved route"""
+    basic_route_handler = BasicHttpRouter(DEFAULT_NOT_FOUND_RESPONSE)
+    basic_route_handler.add({'GET', 'HEAD'}, '/health', ok_handler, priority=10)
+
+    _handler, _matches, route = basic_route_handler.resolve_route(
+        'HEAD',
+        '/health'
+    )
+    assert route is not None and route.options == {'priority': 10}
@@ -0,0 +1,113 @@
+"""Tests for the adaptive concurrency middleware"""
+
+import asyncio
+from functools import partial
+
+import pytest
+
+from bareasgi import HttpRequest, HttpResponse
+from bareasgi.http import HttpRoute, make_middleware_chain
+from bareasgi.middlewares import (
+    AdaptiveConcurrencyMiddleware,
+    AimdLimit,
+    GradientLimit
+)
+
+
+def test_aimd_limit():
+    limit = AimdLimit(initial_limit=10, target_latency=0.5)
+    limit.update(0.1, 5, False)
+    assert limit.limit == 11
+    limit.update(0.1, 1, False)
+    assert limit.limit == 11
+    limit.update(1.0, 5, False)
+    assert limit.limit == 9
+    limit.update(0.1, 5, True)
+    assert limit.limit == 8
+
+
+def test_gradient_limit():
+    limit = GradientLimit(initial_limit=10, smoothing=1.0)
+    limit.update(0.1, 10, False)
+    assert limit.limit > 10
+    previous = limit.limit
+    limit.update(1.0, 10, False)
+    assert limit.limit < previous
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_per_route():
+    release = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await release.wait()
+        return HttpResponse(200)
+
+    middleware = AdaptiveConcurrencyMiddleware(
+        partial(AimdLimit, initial_limit=1)
+    )
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    def make_request(method: str, route: HttpRoute) -> HttpRequest:
+        return HttpRequest({'method': method}, {}, {}, {}, None, route)
+
+    slow = HttpRoute('/slow')
+    other = HttpRoute('/other')
+    first = asyncio.create_task(chain(make_request('POST', slow)))
+    await asyncio.sleep(0)
+
+    response = await chain(make_request('POST', slow))
+    assert response.status == 503
+    assert middleware.shed_count == 1
+
+    # Other methods and routes have their own limits.
+    second = asyncio.create_task(chain(make_request('GET', slow)))
+    third = asyncio.create_task(chain(make_request('POST', other)))
+    await asyncio.sleep(0)
+    assert middleware.in_flight == {
+        ('POST', '/slow'): 1,
+        ('GET', '/slow'): 1,
+        ('POST', '/other'): 1
+    }
+
+    release.set()
+    for task in (first, second, third):
+        assert (await task).status == 200
+    assert middleware.limits == {
+        ('POST', '/slow'): 2,
+        ('GET', '/slow'): 2,
+        ('POST', '/other'): 2
+    }
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_cancelled():
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await asyncio.Event().wait()
+        return HttpResponse(200)
+
+    middleware = AdaptiveConcurrencyMiddleware(
+        partial(AimdLimit, initial_limit=10)
+    )
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+    route = HttpRoute('/slow')
+    key = ('GET', '/slow')
+
+    async def cancel(deadline):
+        request = HttpRequest(
+            {'method': 'GET'}, {}, {}, {}, None, route, deadline
+        )
+        task = asyncio.create_task(chain(request))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # A client disconnecting says nothing about the load.
+    await cancel(None)
+    assert middleware.limits == {key: 10}
+    assert middleware.in_flight == {key: 0}
+
+    # A handler cancelled at its deadline was dropped.
+    await cancel(asyncio.get_running_loop().time())
+    assert middleware.limits[key] < 10
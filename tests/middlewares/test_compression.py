@@ -0,0 +1,453 @@
+"""Tests for the compression middleware"""
+
+import asyncio
+import json
+import threading
+import zlib
+from typing import AsyncIterator, Optional
+
+import pytest
+
+from bareasgi import HttpRequest, HttpResponse
+from bareasgi.http import HttpRoute, make_middleware_chain
+from bareasgi.lifespan import LifespanRequest
+from bareasgi.middlewares import (
+    AdaptiveCompressionLevel,
+    CompressionCache,
+    make_default_compression_middleware,
+    train_zdict,
+    zdict_encoding
+)
+
+from ..mock_io import make_body, make_request
+
+GZIP_HEADERS = [(b'accept-encoding', b'gzip')]
+
+
+async def _read_body(response: HttpResponse) -> bytes:
+    assert response.body is not None
+    return b''.join([chunk async for chunk in response.body])
+
+
+def _header_value(response: HttpResponse, name: bytes) -> Optional[bytes]:
+    return dict(response.headers or []).get(name)
+
+
+def _gunzip(data: bytes) -> bytes:
+    return zlib.decompress(data, zlib.MAX_WBITS | 16)
+
+
+@pytest.mark.asyncio
+async def test_compression():
+    content = b'Hello, World! ' * 100
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], make_body([content[:700], content[700:]]))
+
+    middleware = make_default_compression_middleware()
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert (b'content-encoding', b'gzip') in response.headers
+    assert _gunzip(await _read_body(response)) == content
+
+
+@pytest.mark.asyncio
+async def test_compression_offload():
+    chunks = [bytes([i]) * 10000 for i in range(5)] + [b'small']
+    threads = set()
+
+    class RecordingCompressor:
+
+        def __init__(self) -> None:
+            self.compressobj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+        def compress(self, buf: bytes) -> bytes:
+            threads.add(threading.current_thread().name)
+            return self.compressobj.compress(buf)
+
+        def flush(self) -> bytes:
+            return self.compressobj.flush()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], make_body(chunks))
+
+    middleware = make_default_compression_middleware(offload_threshold=1000)
+    middleware.compressors = {b'gzip': RecordingCompressor}
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert _gunzip(await _read_body(response)) == b''.join(chunks)
+    assert threading.current_thread().name in threads
+    assert any(name.startswith('compression') for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_compression_cache():
+    content = b'Hello, World! ' * 100
+    calls = []
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        calls.append(request)
+        return HttpResponse(
+            200,
+            [(b'content-length', str(len(content)).encode())] +
+            request.context.get('headers', []),
+            make_body([content])
+        )
+
+    cache = CompressionCache()
+    middleware = make_default_compression_middleware()
+    middleware.cache = cache
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    # Without an ETag the body is cached by its hash.
+    for expected_misses in (1, 1):
+        response = await chain(make_request(headers=GZIP_HEADERS))
+        compressed = await _read_body(response)
+        assert _gunzip(compressed) == content
+        assert (b'content-length', str(len(compressed)).encode()) in \
+            response.headers
+        assert cache.misses == expected_misses
+    assert cache.hits == 1
+
+    # With an ETag the body is streamed on the first request.
+    request = make_request(headers=GZIP_HEADERS)
+    request.context['headers'] = [(b'etag', b'"v1"')]
+    response = await chain(request)
+    assert _header_value(response, b'content-encoding') == b'gzip'
+    assert _header_value(response, b'content-length') is None
+    assert _header_value(response, b'etag') == b'"v1"'
+    assert _gunzip(await _read_body(response)) == content
+
+    response = await chain(request)
+    assert (b'content-length', str(len(compressed)).encode()) in \
+        response.headers
+    assert _gunzip(await _read_body(response)) == content
+    assert cache.hits == 2
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_compression_cache_resource():
+    closed = []
+
+    class ResourceBody:
+
+        def __init__(self, content: bytes) -> None:
+            self.chunks = iter([content])
+
+        def __aiter__(self) -> 'ResourceBody':
+            return self
+
+        async def __anext__(self) -> bytes:
+            try:
+                return next(self.chunks)
+            except StopIteration:
+                raise StopAsyncIteration from None
+
+        async def aclose(self) -> None:
+            closed.append(self)
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        # Both resources have the same ETag.
+        content = request.scope['path'].encode() * 200
+        headers = [
+            (b'etag', b'"1"'),
+            (b'content-length', str(len(content)).encode('ascii'))
+        ]
+        return HttpResponse(200, headers, ResourceBody(content))
+
+    middleware = make_default_compression_middleware()
+    middleware.cache = CompressionCache()
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    for path in ('/one', '/two', '/one', '/two'):
+        response = await chain(make_request(headers=GZIP_HEADERS, path=path))
+        assert _gunzip(await _read_body(response)) == path.encode() * 200
+    assert middleware.cache.hits == 2
+
+    # The bodies which were not sent were closed.
+    assert len(closed) == 2
+
+
+def test_compression_cache_eviction():
+    cache = CompressionCache(max_size=10, max_entry_size=6)
+    cache.put((b'etag', b'1', b'gzip'), b'12345')
+    cache.put((b'etag', b'2', b'gzip'), b'12345')
+    # Entries larger than the maximum entry size are not held.
+    cache.put((b'etag', b'3', b'gzip'), b'1234567')
+    assert len(cache) == 2
+    cache.put((b'etag', b'3', b'gzip'), b'123')
+    assert len(cache) == 2
+    assert cache.get((b'etag', b'1', b'gzip')) is None
+    assert cache.size == 8
+
+
+@pytest.mark.asyncio
+async def test_compression_peek():
+    chunks = [b'Hello, ', b'World!']
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], make_body(chunks))
+
+    middleware = make_default_compression_middleware(minimum_size=100)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    # A short body is sent uncompressed with its length.
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert response.headers == [(b'content-length', b'13')]
+    assert await _read_body(response) == b'Hello, World!'
+
+    # A long body is compressed, including the part which was read.
+    chunks = [b'Hello, World! ' * 5] * 5
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert (b'content-encoding', b'gzip') in response.headers
+    assert _gunzip(await _read_body(response)) == b''.join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_compression_peek_timeout():
+    release = asyncio.Event()
+
+    async def slow_body() -> AsyncIterator[bytes]:
+        yield b'event: 1\n\n'
+        await release.wait()
+        yield b'event: 2\n\n'
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], slow_body())
+
+    middleware = make_default_compression_middleware(minimum_size=100)
+    middleware.peek_timeout = 0.01
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    # A slow stream is not held back while deciding.
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert (b'content-encoding', b'gzip') in response.headers
+    release.set()
+    assert _gunzip(await _read_body(response)) == b'event: 1\n\nevent: 2\n\n'
+
+
+@pytest.mark.asyncio
+async def test_compression_peek_closed():
+    release = asyncio.Event()
+    closed = []
+
+    async def slow_body() -> AsyncIterator[bytes]:
+        try:
+            yield b'event: 1\n\n'
+            await release.wait()
+            yield b'event: 2\n\n'
+        finally:
+            closed.append(True)
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [(b'etag', b'"1"')], slow_body())
+
+    middleware = make_default_compression_middleware(minimum_size=100)
+    middleware.peek_timeout = 0.01
+    middleware.cache = CompressionCache()
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    release.set()
+    assert _gunzip(await _read_body(response)) == b'event: 1\n\nevent: 2\n\n'
+    assert closed == [True]
+
+    # The body of a cached response is closed, cancelling the read left
+    # pending when the peek timed out.
+    release.clear()
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert middleware.cache.hits == 1
+    assert closed == [True, True]
+    assert _gunzip(await _read_body(response)) == b'event: 1\n\nevent: 2\n\n'
+
+
+@pytest.mark.asyncio
+async def test_compression_flush_interval():
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def stream() -> AsyncIterator[bytes]:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        # A content-length means the body is not read to decide.
+        return HttpResponse(200, [(b'content-length', b'1000')], stream())
+
+    decompressobj = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    middleware = make_default_compression_middleware()
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    # Every chunk is flushed, ending with the empty stored block of a sync
+    # flush, so it decompresses without waiting for the next chunk.
+    route = HttpRoute('/events', {'compression_flush_interval': 0})
+    request = make_request(headers=GZIP_HEADERS, route=route)
+    body = (await chain(request)).body.__aiter__()
+    for data in (b'first', b'second'):
+        await queue.put(data)
+        chunk = await body.__anext__()
+        assert chunk.endswith(b'\x00\x00\xff\xff')
+        assert decompressobj.decompress(chunk) == data
+
+    # Data is held for at most the interval.
+    middleware.flush_interval = 0.01
+    decompressobj = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    body = (await chain(make_request(headers=GZIP_HEADERS))).body.__aiter__()
+    await queue.put(b'first')
+    await queue.put(b'second')
+    data = b''
+    while data != b'firstsecond':
+        chunk = await body.__anext__()
+        data += decompressobj.decompress(chunk)
+    # The data was released by the flush.
+    assert chunk.endswith(b'\x00\x00\xff\xff')
+    await queue.put(None)
+    assert [chunk async for chunk in body]
+
+
+@pytest.mark.asyncio
+async def test_compression_flush_interval_cancelled():
+    queue: asyncio.Queue = asyncio.Queue()
+    closed = []
+
+    async def stream() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            closed.append(True)
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [(b'content-length', b'1000')], stream())
+
+    middleware = make_default_compression_middleware()
+    middleware.flush_interval = 10
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    body = (await chain(make_request(headers=GZIP_HEADERS))).body.__aiter__()
+    await queue.put(b'first')
+    # The consumer waits while the next read is outstanding, and is then
+    # cancelled, as when the client disconnects.
+    consumer = asyncio.ensure_future(body.__anext__())
+    await asyncio.sleep(0.01)
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_compression_level():
+    selector = AdaptiveCompressionLevel(
+        low_lag=0.01,
+        high_lag=0.05,
+        max_cpu_usage=0.8,
+        large_payload_size=10000
+    )
+    monitor = selector.monitor
+    assert selector.select(None) == 9
+    assert selector.select(10000) == 6
+    monitor.lag = 0.03
+    assert selector.select(None) == 5
+    monitor.lag = 1.0
+    assert selector.select(None) == 1
+    monitor.lag, monitor.cpu_usage = 0.0, 0.8
+    assert selector.select(None) == 1
+
+    monitor.cpu_usage = 0.0
+    content = b'Hello, World! ' * 1000
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(
+            200,
+            [(b'content-length', str(len(content)).encode('ascii'))],
+            make_body([content])
+        )
+
+    middleware = make_default_compression_middleware(
+        level_selector=selector
+    )
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert _gunzip(await _read_body(response)) == content
+    monitor.lag = 1.0
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert _gunzip(await _read_body(response)) == content
+
+    metrics = middleware.level_metrics
+    assert metrics.responses == {6: 1, 1: 1}
+    assert metrics.bytes_in == {6: len(content), 1: len(content)}
+    assert metrics.ratios[6] > 1 and metrics.ratios[1] > 1
+
+    # The load is measured between the lifespan handlers.
+    lifespan_request = LifespanRequest({'type': 'lifespan'}, {})
+    await middleware.startup(lifespan_request)
+    assert monitor.is_running
+    await middleware.shutdown(lifespan_request)
+    assert not monitor.is_running
+
+
+def _make_record(index: int) -> bytes:
+    return json.dumps({
+        'id': index,
+        'name': f'user{index}',
+        'email': f'user{index}@example.com',
+        'is_active': index % 2 == 0,
+        'roles': ['reader', 'writer'],
+        'created_at': f'2021-01-{index % 28 + 1:02d}T00:00:00Z'
+    }).encode('utf-8')
+
+
+def test_train_zdict():
+    samples = [_make_record(i) for i in range(100)]
+    zdict = train_zdict(samples, 1024)
+    assert 0 < len(zdict) <= 1024
+    assert b'"email": "user' in zdict
+
+    record = _make_record(1000)
+    compressobj = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    with_zdict = compressobj.compress(record) + compressobj.flush()
+    compressobj = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    without_zdict = compressobj.compress(record) + compressobj.flush()
+    assert len(with_zdict) * 2 < len(without_zdict)
+
+
+@pytest.mark.asyncio
+async def test_compression_zdict():
+    zdict = train_zdict([_make_record(i) for i in range(100)])
+    encoding = zdict_encoding(zdict)
+    content = _make_record(1000)
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(
+            200,
+            [(b'content-length', str(len(content)).encode('ascii'))],
+            make_body([content])
+        )
+
+    middleware = make_default_compression_middleware(zdict=zdict)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    # The body is smaller than the minimum size for gzip.
+    response = await chain(make_request(headers=GZIP_HEADERS))
+    assert _header_value(response, b'content-encoding') is None
+
+    # The client opts in to the dictionary, which is preferred over other
+    # encodings of the same quality.
+    for accept_encoding in (
+            b'gzip;q=0.5, ' + encoding,
+            b'gzip, deflate, ' + encoding
+    ):
+        response = await chain(
+            make_request(headers=[(b'accept-encoding', accept_encoding)])
+        )
+        assert _header_value(response, b'content-encoding') == encoding
+        decompressobj = zlib.decompressobj(-zlib.MAX_WBITS, zdict=zdict)
+        assert decompressobj.decompress(await _read_body(response)) == content
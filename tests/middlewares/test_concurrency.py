@@ -0,0 +1,133 @@
+"""Tests for the concurrency limiting middleware"""
+
+import asyncio
+
+import pytest
+
+from bareasgi import HttpRequest, HttpResponse, text_writer
+from bareasgi.http import HttpRoute, make_middleware_chain
+from bareasgi.middlewares import ConcurrencyLimitMiddleware
+
+from ..mock_io import make_request
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_full():
+    release = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await release.wait()
+        return HttpResponse(200, [], text_writer('ok'))
+
+    middleware = ConcurrencyLimitMiddleware(1, max_queue=1)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    first = asyncio.create_task(chain(make_request(path='/test')))
+    second = asyncio.create_task(chain(make_request(path='/test')))
+    await asyncio.sleep(0)
+    assert middleware.in_flight == 1
+    assert middleware.queue_depth == 1
+
+    response = await chain(make_request(path='/test'))
+    assert response.status == 503
+    assert (b'retry-after', b'1') in response.headers
+    assert middleware.shed_count == 1
+
+    release.set()
+    assert (await first).status == 200
+    assert (await second).status == 200
+    assert middleware.in_flight == 0
+    assert middleware.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_sheds_on_queue_timeout():
+    release = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await release.wait()
+        return HttpResponse(200)
+
+    middleware = ConcurrencyLimitMiddleware(
+        1,
+        max_queue=1,
+        queue_timeout=0.01
+    )
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    first = asyncio.create_task(chain(make_request(path='/test')))
+    await asyncio.sleep(0)
+
+    response = await chain(make_request(path='/test'))
+    assert response.status == 503
+    assert middleware.queue_depth == 0
+    assert middleware.shed_count == 1
+
+    release.set()
+    assert (await first).status == 200
+    assert middleware.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_priority_admission():
+    release = asyncio.Event()
+    admitted = []
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        admitted.append(request.route.path)
+        await release.wait()
+        return HttpResponse(200)
+
+    middleware = ConcurrencyLimitMiddleware(1, max_queue=2)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    def make_priority_request(path: str, priority: int) -> HttpRequest:
+        route = HttpRoute(path, {'priority': priority})
+        return make_request(path=path, route=route)
+
+    first = asyncio.create_task(chain(make_priority_request('/first', 0)))
+    bulk1 = asyncio.create_task(chain(make_priority_request('/bulk1', 0)))
+    bulk2 = asyncio.create_task(chain(make_priority_request('/bulk2', 0)))
+    await asyncio.sleep(0)
+    health = asyncio.create_task(chain(make_priority_request('/health', 10)))
+    await asyncio.sleep(0)
+
+    # The health check evicted the latest bulk request.
+    assert (await bulk2).status == 503
+    assert middleware.class_metrics[0].shed_count == 1
+
+    release.set()
+    for task in (first, bulk1, health):
+        assert (await task).status == 200
+    assert admitted == ['/first', '/health', '/bulk1']
+    assert middleware.class_metrics[10].admitted_count == 1
+    assert middleware.class_metrics[0].admitted_count == 2
+
+
+@pytest.mark.asyncio
+async def test_bypass_priority():
+    release = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await release.wait()
+        return HttpResponse(200)
+
+    async def health_check(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(204)
+
+    middleware = ConcurrencyLimitMiddleware(1, bypass_priority=10)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+    health_chain = make_middleware_chain(middleware, handler=health_check)
+
+    first = asyncio.create_task(chain(make_request(path='/test')))
+    await asyncio.sleep(0)
+
+    route = HttpRoute('/health', {'priority': 10})
+    response = await health_chain(
+        make_request(path='/health', route=route)
+    )
+    assert response.status == 204
+    assert middleware.in_flight == 1
+
+    release.set()
+    assert (await first).status == 200
@@ -0,0 +1,76 @@
+"""Tests for the fair queuing middleware"""
+
+import asyncio
+
+import pytest
+
+from bareasgi import HttpRequest, HttpResponse
+from bareasgi.http import make_middleware_chain
+from bareasgi.middlewares import FairQueuingMiddleware, make_header_key
+
+from ..mock_io import make_request
+
+
+@pytest.mark.asyncio
+async def test_round_robin_between_clients():
+    release = asyncio.Event()
+    admitted = []
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        admitted.append(request.scope['client'][0])
+        await release.wait()
+        return HttpResponse(200)
+
+    middleware = FairQueuingMiddleware(1, max_queue_per_client=3)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    tasks = [
+        asyncio.create_task(chain(make_request(client=(client, 1234))))
+        for client in ('a', 'a', 'a', 'a', 'b', 'b')
+    ]
+    await asyncio.sleep(0)
+    assert middleware.queue_depth == 5
+    assert middleware.client_count == 2
+
+    response = await chain(make_request(client=('a', 1234)))
+    assert response.status == 429
+    assert middleware.shed_count == 1
+
+    release.set()
+    for task in tasks:
+        assert (await task).status == 200
+    assert admitted == ['a', 'a', 'b', 'a', 'b', 'a']
+    assert middleware.client_count == 0
+    assert middleware.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_max_clients():
+    release = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        await release.wait()
+        return HttpResponse(200)
+
+    middleware = FairQueuingMiddleware(1, max_clients=1)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    first = asyncio.create_task(chain(make_request(client=('a', 1234))))
+    await asyncio.sleep(0)
+
+    response = await chain(make_request(client=('b', 1234)))
+    assert response.status == 503
+
+    release.set()
+    assert (await first).status == 200
+    assert middleware.client_count == 0
+
+
+def test_header_key():
+    key = make_header_key(b'x-api-key')
+    request = make_request(
+        headers=[(b'x-api-key', b'secret')],
+        client=('10.0.0.1', 1234)
+    )
+    assert key(request) == 'secret'
+    assert key(make_request(client=('10.0.0.2', 1234))) == '10.0.0.2'
@@ -0,0 +1,77 @@
+"""Tests for the rate limiting middleware"""
+
+import pytest
+
+from bareasgi import Application, HttpRequest, HttpResponse
+from bareasgi.http import HttpRoute, make_middleware_chain
+from bareasgi.middlewares import RateLimitMiddleware, TokenBucketStore
+
+
+def test_token_bucket_store():
+    store = TokenBucketStore(max_keys=2)
+    assert store.take('a', 1, 2, now=0) == 0
+    assert store.take('a', 1, 2, now=0) == 0
+    assert store.take('a', 1, 2, now=0) == 1
+    assert store.take('a', 1, 2, now=0.5) == 0.5
+    assert store.take('a', 1, 2, now=1.5) == 0
+
+    store.take('b', 1, 2, now=2)
+    store.take('c', 1, 2, now=2)
+    assert len(store) == 2
+    # The least recently used key was evicted, so starts with a full bucket.
+    assert store.take('a', 1, 2, now=2) == 0
+
+
+def test_token_bucket_store_evicts_refilled():
+    store = TokenBucketStore(max_keys=2)
+    store.take('a', 1, 2, now=0)
+    store.take('b', 0.1, 2, now=0)
+    store.take('b', 0.1, 2, now=0)
+    assert len(store) == 2
+    # The bucket of 'a' is full again, so it is evicted before the limit
+    # of 'b' would be lost.
+    store.take('c', 1, 2, now=1)
+    assert len(store) == 2
+    assert store.take('b', 0.1, 2, now=1) > 0
+
+
+def test_route_rate_limit_validated():
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200)
+
+    app = Application()
+    for rate_limit in ((0, 1), (-1, 1), (1, 0)):
+        with pytest.raises(ValueError):
+            app.http_router.add(
+                {'GET'},
+                '/login',
+                http_request_callback,
+                rate_limit=rate_limit
+            )
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_by_route_template():
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200)
+
+    middleware = RateLimitMiddleware(100, 100)
+    chain = make_middleware_chain(middleware, handler=http_request_callback)
+
+    route = HttpRoute('/users/{id:int}', {'rate_limit': (0.5, 1)})
+
+    def make_request(path: str) -> HttpRequest:
+        return HttpRequest(
+            {'path': path, 'client': ('10.0.0.1', 1234)},
+            {},
+            {},
+            {},
+            None,
+            route
+        )
+
+    assert (await chain(make_request('/users/1'))).status == 200
+    response = await chain(make_request('/users/2'))
+    assert response.status == 429
+    assert (b'retry-after', b'2') in response.headers
+    assert middleware.rejected_count == 1
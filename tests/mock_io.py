@@ -1,6 +1,17 @@
-from typing import Mapping, Any
+from typing import (
+    Any,
+    AsyncIterator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
 from asyncio.queues import Queue
 
+from bareasgi import HttpRequest
+from bareasgi.http import HttpRoute
+
 
 class MockIO:
 
@@ -19,3 +30,29 @@ class MockIO:
 
     async def receive(self) -> Mapping[str, Any]:
         return await self._write_queue.get()
+
+
+async def make_body(chunks: Iterable[bytes] = ()) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def split_body(data: bytes, size: int) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def make_request(
+        chunks: Iterable[bytes] = (),
+        headers: Optional[List[Tuple[bytes, bytes]]] = None,
+        route: Optional[HttpRoute] = None,
+        **scope: Any
+) -> HttpRequest:
+    """Make a request to pass directly to a handler or middleware."""
+    return HttpRequest(
+        {'headers': headers or [], **scope},  # type: ignore
+        {},
+        {},
+        {},
+        make_body(chunks),
+        route
+    )
@@ -1,9 +1,13 @@
 """Tests for basic functionality"""
 
+import asyncio
+
 from bareutils.streaming import bytes_reader, bytes_writer
 import pytest
 from bareasgi import (
     Application,
+    Codec,
+    CodecRegistry,
     HttpRequest,
     HttpResponse,
     text_writer
@@ -235,3 +239,628 @@ async def test_empty_response_body():
     assert body_response['type'] == 'http.response.body'
     assert body_response['body'] == b""
     assert not body_response['more_body']
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect():
+    is_cancelled = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            is_cancelled.set()
+            raise
+        return HttpResponse(200)
+
+    app = Application(cancel_on_disconnect=True)
+    app.http_router.add({'GET'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'',
+        'more_body': False,
+    })
+    await io.write({
+        'type': 'http.disconnect',
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    assert is_cancelled.is_set()
+    assert app.http_metrics.abandoned == {'/{path}': 1}
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_body_not_read():
+    is_cancelled = asyncio.Event()
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            is_cancelled.set()
+            raise
+        return HttpResponse(200)
+
+    app = Application(cancel_on_disconnect=True)
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    for events in (
+            [
+                {'type': 'http.request', 'body': b'First', 'more_body': True},
+                {'type': 'http.request', 'body': b'Second'},
+                {'type': 'http.disconnect'}
+            ],
+            [
+                {'type': 'http.request', 'body': b'First', 'more_body': True},
+                {'type': 'http.disconnect'}
+            ]
+    ):
+        is_cancelled.clear()
+        io = MockIO()
+        for event in events:
+            await io.write(event)
+
+        await asyncio.wait_for(
+            app(
+                {
+                    'type': 'http',
+                    'http_version': '1.1',
+                    'method': 'POST',
+                    'scheme': 'http',
+                    'path': '/foo',
+                    'query_string': b'',
+                    'root_path': "",
+                    'headers': [],
+                    'client': ('127.0.0.1', 36432),
+                    'server': ('127.0.0.1', 5000),
+                },
+                io.receive,
+                io.send
+            ),
+            1
+        )
+
+        assert is_cancelled.is_set()
+
+    assert app.http_metrics.abandoned == {'/{path}': 2}
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_with_response():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        body = await request.content()
+        return HttpResponse(200, [], bytes_writer(body))
+
+    app = Application(cancel_on_disconnect=True)
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'First',
+        'more_body': True,
+    })
+    await io.write({
+        'type': 'http.request',
+        'body': b'Second',
+        'more_body': False,
+    })
+
+    task = asyncio.create_task(app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    ))
+
+    start_response = await io.read()
+    assert start_response['status'] == 200
+    body_response = await io.read()
+    assert body_response['body'] == b'FirstSecond'
+
+    await io.write({
+        'type': 'http.disconnect',
+    })
+    await task
+    assert app.http_metrics.abandoned == {}
+
+
+@pytest.mark.asyncio
+async def test_deadline():
+    remaining = []
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        remaining.append(request.time_remaining)
+        await asyncio.Event().wait()
+        return HttpResponse(200)
+
+    app = Application(deadline=0.01)
+    app.http_router.add({'GET'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'',
+        'more_body': False,
+    })
+    await io.write({
+        'type': 'http.disconnect',
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 504
+    body_response = await io.read()
+    assert body_response['body'] == b'Gateway Timeout'
+    assert 0 < remaining[0] <= 0.01
+    assert app.http_metrics.timed_out == {'/{path}': 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_deadline():
+    async def slow_body():
+        yield b'First'
+        await asyncio.Event().wait()
+        yield b'Second'
+
+    async def http_request_callback(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], slow_body())
+
+    app = Application(deadline=0.01)
+    app.http_router.add(
+        {'GET'},
+        '/{path}',
+        http_request_callback,
+        deadline=None,
+        stream_deadline=0.01
+    )
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'',
+        'more_body': False,
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 200
+    assert app.http_metrics.stream_timed_out == {'/{path}': 1}
+
+
+@pytest.mark.asyncio
+async def test_slow_request_body():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        body = await request.content()
+        return HttpResponse(200, [], bytes_writer(body))
+
+    app = Application(body_idle_timeout=0.01)
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'First',
+        'more_body': True,
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 408
+    assert (b'connection', b'close') in start_response['headers']
+    assert app.http_metrics.body_timed_out == {'/{path}': 1}
+
+
+@pytest.mark.asyncio
+async def test_max_body_size():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        body = await request.content()
+        return HttpResponse(200, [], bytes_writer(body))
+
+    app = Application(max_body_size=8)
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    def make_scope(headers):
+        return {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': headers,
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        }
+
+    # A declared length is rejected before the body is read.
+    io = MockIO()
+    await app(make_scope([(b'content-length', b'100')]), io.receive, io.send)
+    start_response = await io.read()
+    assert start_response['status'] == 413
+    assert (b'connection', b'close') in start_response['headers']
+
+    # A chunked body is rejected once it passes the limit.
+    io = MockIO()
+    for chunk in (b'First', b'Second'):
+        await io.write({
+            'type': 'http.request',
+            'body': chunk,
+            'more_body': True,
+        })
+    await app(make_scope([]), io.receive, io.send)
+    start_response = await io.read()
+    assert start_response['status'] == 413
+    assert app.http_metrics.body_too_large == {'/{path}': 2}
+
+    # The connection header is not allowed in HTTP/2.
+    io = MockIO()
+    scope = make_scope([(b'content-length', b'100')])
+    scope['http_version'] = '2'
+    await app(scope, io.receive, io.send)
+    start_response = await io.read()
+    assert start_response['status'] == 413
+    assert b'connection' not in dict(start_response['headers'])
+
+
+@pytest.mark.asyncio
+async def test_max_body_size_after_response_started():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        return HttpResponse(200, [], request.body)
+
+    app = Application(cancel_on_disconnect=True, max_body_size=8)
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    task = asyncio.create_task(app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    ))
+    for chunk in (b'First', b'Second', b'Third'):
+        await io.write({
+            'type': 'http.request',
+            'body': chunk,
+            'more_body': True,
+        })
+        await asyncio.sleep(0.01)
+    await asyncio.wait_for(task, 1)
+
+    # The response had started, so it is abandoned rather than replaced.
+    events = []
+    try:
+        while True:
+            events.append(await asyncio.wait_for(io.read(), 0.05))
+    except asyncio.TimeoutError:
+        pass
+    starts = [
+        event for event in events
+        if event['type'] == 'http.response.start'
+    ]
+    assert [event['status'] for event in starts] == [200]
+    assert not any(
+        event['type'] == 'http.response.body' and
+        not event.get('more_body', False)
+        for event in events
+    )
+
+
+@pytest.mark.asyncio
+async def test_codecs():
+    calls = []
+
+    def encode(data) -> bytes:
+        calls.append('encode')
+        return repr(data).encode()
+
+    def decode(data: bytes):
+        calls.append('decode')
+        return bytes(data).decode().split(',')
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        data = await request.json()
+        return HttpResponse.from_json(data)
+
+    app = Application(
+        codecs=CodecRegistry([Codec(b'application/json', encode, decode)])
+    )
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'a,b',
+        'more_body': False,
+    })
+    await io.write({
+        'type': 'http.disconnect',
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [(b'content-type', b'application/json')],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 200
+    body_response = await io.read()
+    assert body_response['body'] == b"['a', 'b']"
+    assert calls == ['decode', 'encode']
+
+
+@pytest.mark.asyncio
+async def test_malformed_multipart():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        fields = {part.name: part async for part in request.multipart()}
+        return HttpResponse(200, [], text_writer(repr(fields)))
+
+    app = Application()
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'--boundary\r\nno-colon\r\n\r\nvalue\r\n--boundary--\r\n',
+        'more_body': False,
+    })
+    await io.write({
+        'type': 'http.disconnect',
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [
+                (b'content-type', b'multipart/form-data; boundary=boundary')
+            ],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 400
+    assert (b'connection', b'close') in start_response['headers']
+
+
+@pytest.mark.asyncio
+async def test_malformed_json_items():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        items = [item async for item in request.json_items()]
+        return HttpResponse(200, [], text_writer(repr(items)))
+
+    app = Application()
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'[1, }',
+        'more_body': False,
+    })
+    await io.write({
+        'type': 'http.disconnect',
+    })
+
+    await app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [(b'content-type', b'application/json')],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    )
+
+    start_response = await io.read()
+    assert start_response['status'] == 400
+
+
+@pytest.mark.asyncio
+async def test_malformed_urlencoded():
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        form = await request.form(max_fields=2)
+        return HttpResponse(200, [], text_writer(repr(form)))
+
+    app = Application()
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    # Invalid encodings and too many fields are rejected.
+    for body in (b'name=%ff', b'a=1&b=2&c=3'):
+        io = MockIO()
+        await io.write({
+            'type': 'http.request',
+            'body': body,
+            'more_body': False,
+        })
+        await io.write({
+            'type': 'http.disconnect',
+        })
+
+        await app(
+            {
+                'type': 'http',
+                'http_version': '1.1',
+                'method': 'POST',
+                'scheme': 'http',
+                'path': '/foo',
+                'query_string': b'',
+                'root_path': "",
+                'headers': [
+                    (b'content-type', b'application/x-www-form-urlencoded')
+                ],
+                'client': ('127.0.0.1', 36432),
+                'server': ('127.0.0.1', 5000),
+            },
+            io.receive,
+            io.send
+        )
+
+        start_response = await io.read()
+        assert start_response['status'] == 400
+
+
+@pytest.mark.asyncio
+async def test_spooled_body_closed():
+    bodies = []
+
+    async def http_request_callback(request: HttpRequest) -> HttpResponse:
+        body = await request.spool(max_memory=4)
+        bodies.append(body)
+        return HttpResponse(200, [], body)
+
+    app = Application()
+    app.http_router.add({'POST'}, '/{path}', http_request_callback)
+
+    io = MockIO()
+    await io.write({
+        'type': 'http.request',
+        'body': b'Hello, World!',
+        'more_body': False,
+    })
+
+    task = asyncio.create_task(app(
+        {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/foo',
+            'query_string': b'',
+            'root_path': "",
+            'headers': [],
+            'client': ('127.0.0.1', 36432),
+            'server': ('127.0.0.1', 5000),
+        },
+        io.receive,
+        io.send
+    ))
+
+    start_response = await io.read()
+    assert start_response['status'] == 200
+    body_response = await io.read()
+    assert body_response['body'] == b'Hello, World!'
+    # The disconnect is sent after the response, so it cannot cancel it.
+    await io.write({
+        'type': 'http.disconnect',
+    })
+    await task
+    # The temporary file is closed once the response has been sent.
+    body, = bodies
+    assert body.is_on_disk
+    assert body.is_closed
@@ -0,0 +1,119 @@
+"""Tests for codecs and content negotiation"""
+
+import json
+import threading
+
+import pytest
+
+from bareasgi import Codec, CodecRegistry, HttpResponse
+from bareasgi.http import HttpUnsupportedMediaTypeError
+from bareasgi.http.http_codecs import reset_codecs, use_codecs
+
+from .mock_io import make_request
+
+CSV_CODEC = Codec(
+    b'text/csv',
+    lambda data: ','.join(data).encode(),
+    lambda data: bytes(data).decode().split(',')
+)
+
+
+def test_negotiate():
+    codecs = CodecRegistry([CSV_CODEC])
+    assert codecs.negotiate(None) is codecs.json
+    assert codecs.negotiate(b'text/csv') is CSV_CODEC
+    assert codecs.negotiate(b'*/*') is codecs.json
+    assert codecs.negotiate(b'text/*, application/json;q=0.5') is CSV_CODEC
+    assert codecs.negotiate(b'*/*;q=0.5, text/csv;q=0') is codecs.json
+    assert codecs.negotiate(b'image/png') is None
+
+
+def test_negotiate_cache():
+    codecs = CodecRegistry(max_cached_accepts=2)
+    for accept in (b'a/a', b'text/csv', b'b/b', b'text/csv'):
+        codecs.negotiate(accept)
+    assert codecs.negotiation_hits == 1
+    assert codecs.negotiation_misses == 3
+
+    # The least recently used accept header was forgotten.
+    codecs.negotiate(b'a/a')
+    assert codecs.negotiation_misses == 4
+
+    # Registering a codec invalidates the cache.
+    codecs.register(CSV_CODEC)
+    assert codecs.negotiate(b'text/csv') is CSV_CODEC
+    assert codecs.negotiation_misses == 5
+
+
+def test_for_content_type():
+    codecs = CodecRegistry([CSV_CODEC])
+    assert codecs.for_content_type(b'text/csv') is CSV_CODEC
+    assert codecs.for_content_type(b'application/vnd.api+json') is codecs.json
+    assert codecs.for_content_type(b'application/xml') is None
+
+
+@pytest.mark.asyncio
+async def test_data():
+    token = use_codecs(CodecRegistry([CSV_CODEC]))
+    try:
+        request = make_request(
+            [b'a,b'],
+            [(b'content-type', b'text/csv; charset=utf-8')]
+        )
+        assert await request.data() == ['a', 'b']
+
+        request = make_request(headers=[(b'content-type', b'application/xml')])
+        with pytest.raises(HttpUnsupportedMediaTypeError):
+            await request.data()
+
+        request = make_request(headers=[(b'accept', b'text/csv')])
+        response = HttpResponse.from_data(request, ['a', 'b'])
+        assert (b'content-type', b'text/csv') in response.headers
+        assert [chunk async for chunk in response.body] == [b'a,b']
+
+        request = make_request(headers=[(b'accept', b'image/png')])
+        assert HttpResponse.from_data(request, ['a']).status == 406
+    finally:
+        reset_codecs(token)
+
+
+@pytest.mark.asyncio
+async def test_offload():
+    threads = []
+
+    def decode(data):
+        threads.append(threading.current_thread())
+        return json.loads(data)
+
+    def encode(data):
+        threads.append(threading.current_thread())
+        return json.dumps(data).encode()
+
+    codecs = CodecRegistry(
+        [Codec(b'application/json', encode, decode)],
+        offload_threshold=10,
+        offload_min_items=3
+    )
+    token = use_codecs(codecs)
+    try:
+        request = make_request([b'[1]'])
+        assert await request.json() == [1]
+        request = make_request([b'[1, 2, 3, 4]'])
+        assert await request.json() == [1, 2, 3, 4]
+
+        response = await HttpResponse.from_json_async([1])
+        assert [chunk async for chunk in response.body] == [b'[1]']
+        response = await HttpResponse.from_json_async([1, 2, 3])
+        # The data is encoded before the response is returned.
+        assert threads[-1] is not threading.current_thread()
+        assert [chunk async for chunk in response.body] == [b'[1, 2, 3]']
+        # Only the awaitable constructors offload the encoding.
+        response = HttpResponse.from_json([1, 2, 3])
+        assert [chunk async for chunk in response.body] == [b'[1, 2, 3]']
+    finally:
+        reset_codecs(token)
+
+    main_thread = threading.current_thread()
+    assert [thread is main_thread for thread in threads] == [
+        True, False, True, False, True
+    ]
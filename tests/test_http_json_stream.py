@@ -0,0 +1,84 @@
+"""Tests for incremental JSON decoding"""
+
+from json import JSONDecoder
+from unittest import mock
+
+import pytest
+
+from bareasgi.http import HttpFormError, HttpPayloadTooLargeError
+from bareasgi.http.http_json_stream import JsonArrayParser
+
+from .mock_io import make_request, split_body
+
+DOCUMENT = (
+    '{"meta": {"skip": [1, {"a": "]"}]}, "data": {"count": 3, '
+    '"rows": [{"id": 1, "name": "café"}, 12345, [true, null], "x"]}, '
+    '"trailer": 1}'
+).encode()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 3, len(DOCUMENT)])
+async def test_json_items_at_path(chunk_size):
+    request = make_request(split_body(DOCUMENT, chunk_size))
+    items = [item async for item in request.json_items(('data', 'rows'))]
+    assert items == [{'id': 1, 'name': 'café'}, 12345, [True, None], 'x']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 4])
+async def test_json_items(chunk_size):
+    request = make_request(split_body(b' [1, 22 , 333] ', chunk_size))
+    assert [item async for item in request.json_items()] == [1, 22, 333]
+
+    request = make_request(split_body(b'[]', chunk_size))
+    assert [item async for item in request.json_items()] == []
+
+    request = make_request(split_body(b'{"a": []}', chunk_size))
+    assert [item async for item in request.json_items(('b',))] == []
+
+
+@pytest.mark.asyncio
+async def test_json_items_errors():
+    for content in (b'[1, 2', b'{"a": 1}', b'["\xff"]'):
+        request = make_request(split_body(content, 2))
+        with pytest.raises(HttpFormError):
+            _items = [item async for item in request.json_items()]
+
+    request = make_request(split_body(b'["' + b'x' * 100 + b'"]', 10))
+    with pytest.raises(HttpPayloadTooLargeError):
+        _items = [item async for item in request.json_items(max_item_size=50)]
+
+
+def test_json_items_decoded_once():
+    text = '[{"a": "x\\"]\\\\", "b": [1, {"c": "}"}]}, -1.5e3, "\\u00e9"]'
+    parser = JsonArrayParser()
+    raw_decode = JSONDecoder.raw_decode
+    calls = []
+
+    def counting_raw_decode(decoder, data, index=0):
+        calls.append(index)
+        return raw_decode(decoder, data, index)
+
+    items = []
+    with mock.patch.object(JSONDecoder, 'raw_decode', counting_raw_decode):
+        for char in text:
+            items.extend(parser.feed(char))
+        items.extend(parser.feed('', True))
+
+    assert items == [{'a': 'x"]\\', 'b': [1, {'c': '}'}]}, -1500.0, 'é']
+    # Each element is decoded once, when it is complete.
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_json_items_skipped_values():
+    # Values which are skipped are not held, so are not limited in size.
+    document = b'{"skip": ["' + b'x' * 1000 + b'"], "rows": [1, 2]}'
+    request = make_request(split_body(document, 7))
+    items = [
+        item
+        async for item in request.json_items(('rows',), max_item_size=50)
+    ]
+    assert items == [1, 2]
+    assert JsonArrayParser().max_item_size == 1024 * 1024
@@ -0,0 +1,88 @@
+"""Tests for multipart/form-data parsing"""
+
+import os
+import pytest
+
+from bareasgi.http import (
+    FormField,
+    FormFile,
+    HttpFormError,
+    HttpPayloadTooLargeError
+)
+from bareasgi.http.http_multipart import parse_header_value
+
+from .mock_io import make_request, split_body
+
+BODY = (
+    b'preamble\r\n'
+    b'--boundary\r\n'
+    b'Content-Disposition: form-data; name="title"\r\n'
+    b'\r\n'
+    b'Hello, World!\r\n'
+    b'--boundary\r\n'
+    b'Content-Disposition: form-data; name="upload"; filename="a;b.txt"\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'\r\n'
+    b'The contents\r\nof the file\r\n'
+    b'--boundary--\r\n'
+    b'epilogue'
+)
+
+
+HEADERS = [(b'content-type', b'multipart/form-data; boundary=boundary')]
+
+
+def test_parse_header_value():
+    assert parse_header_value(
+        b'form-data; name="a\\"b"; filename="c;d.txt"'
+    ) == (b'form-data', {b'name': b'a"b', b'filename': b'c;d.txt'})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 7, len(BODY)])
+async def test_multipart(chunk_size, tmp_path):
+    request = make_request(split_body(BODY, chunk_size), HEADERS)
+    parts = [
+        part
+        async for part in request.multipart(directory=str(tmp_path))
+    ]
+    assert len(parts) == 2
+
+    field, upload = parts
+    assert isinstance(field, FormField)
+    assert field.name == 'title'
+    assert field.value == 'Hello, World!'
+
+    assert isinstance(upload, FormFile)
+    assert upload.name == 'upload'
+    assert upload.filename == 'a;b.txt'
+    assert upload.content_type == b'text/plain'
+    assert upload.size == 25
+    with open(upload.path, 'rb') as file:
+        assert file.read() == b'The contents\r\nof the file'
+
+
+@pytest.mark.asyncio
+async def test_multipart_limits(tmp_path):
+    request = make_request([BODY], HEADERS)
+    with pytest.raises(HttpPayloadTooLargeError):
+        async for _part in request.multipart(
+                max_file_size=10,
+                directory=str(tmp_path)
+        ):
+            pass
+    # The partly written file is removed.
+    assert not os.listdir(tmp_path)
+
+    request = make_request([BODY], HEADERS)
+    with pytest.raises(HttpFormError):
+        async for _part in request.multipart(max_parts=1):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_multipart_truncated():
+    request = make_request([BODY[:100]], HEADERS)
+    with pytest.raises(HttpFormError):
+        async for _part in request.multipart():
+            pass
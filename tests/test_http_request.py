@@ -0,0 +1,120 @@
+"""Tests for the http request"""
+
+import tracemalloc
+
+import pytest
+
+from bareasgi.http.http_errors import HttpPayloadTooLargeError
+
+from .mock_io import make_request
+
+
+@pytest.mark.asyncio
+async def test_content_with_content_length():
+    request = make_request(
+        [b'Hello, ', b'World!'],
+        [(b'content-length', b'13')]
+    )
+    content = await request.content()
+    assert content == b'Hello, World!'
+    assert isinstance(content, bytes)
+
+
+@pytest.mark.asyncio
+async def test_content_allocates_once():
+    size = 4 * 1024 * 1024
+    chunks = [bytes([i]) * (size // 64) for i in range(64)]
+    request = make_request(chunks, [(b'content-length', str(size).encode())])
+
+    tracemalloc.start()
+    try:
+        content = await request.content()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert content == b''.join(chunks)
+    # Only one buffer the size of the body is allocated.
+    assert size <= peak < size * 1.5
+
+
+@pytest.mark.asyncio
+async def test_content_with_wrong_content_length():
+    request = make_request(
+        [b'Hello, ', b'World!'],
+        [(b'content-length', b'5')]
+    )
+    assert await request.content() == b'Hello, World!'
+
+    request = make_request([b'Hello'], [(b'content-length', b'100')])
+    assert await request.content() == b'Hello'
+
+
+@pytest.mark.asyncio
+async def test_content_without_content_length():
+    request = make_request([b'Hello, ', b'World!'])
+    assert await request.content() == b'Hello, World!'
+
+    request = make_request()
+    assert await request.content() == b''
+
+
+@pytest.mark.asyncio
+async def test_text_and_json():
+    request = make_request(
+        ['{"name": "café"}'.encode()],
+        [(b'content-length', b'17')]
+    )
+    assert await request.json() == {'name': 'café'}
+
+    # A decode function passed by the caller is given bytes.
+    request = make_request([b'[1, ', b'2]'], [(b'content-length', b'6')])
+    assert await request.json(lambda data: type(data)) is bytes
+
+    request = make_request([b'caf', b'\xc3\xa9'], [(b'content-length', b'5')])
+    assert await request.text() == 'café'
+
+
+@pytest.mark.asyncio
+async def test_spool():
+    request = make_request([b'Hello, ', b'World!'])
+    body = await request.spool(max_memory=8, chunk_size=4)
+    assert body.is_on_disk
+    assert body.size == 13
+    assert await request.spool() is body
+    assert await body.read(7, 5) == b'World'
+    assert [chunk async for chunk in body] == [b'Hell', b'o, W', b'orld', b'!']
+    assert await request.text() == 'Hello, World!'
+    assert await request.content() == b'Hello, World!'
+    await body.close()
+
+    request = make_request([b'Hello'])
+    body = await request.spool()
+    assert not body.is_on_disk
+    assert await request.content() == b'Hello'
+    assert await request.content() == b'Hello'
+
+
+@pytest.mark.asyncio
+async def test_tee():
+    request = make_request([b'Hello, ', b'World!'])
+    body = request.tee()
+    assert request.tee() is body
+
+    reader = body.__aiter__()
+    assert await reader.__anext__() == b'Hello, '
+    assert not body.is_complete
+    assert await request.content() == b'Hello, World!'
+    assert body.is_complete
+    assert [chunk async for chunk in reader] == [b'World!']
+    assert await request.text() == 'Hello, World!'
+
+
+@pytest.mark.asyncio
+async def test_tee_max_size():
+    request = make_request([b'Hello, ', b'World!'])
+    request.tee(max_size=8)
+    with pytest.raises(HttpPayloadTooLargeError):
+        await request.content()
+    with pytest.raises(HttpPayloadTooLargeError):
+        await request.content()
@@ -0,0 +1,55 @@
+"""Tests for the http response"""
+
+from typing import AsyncIterator
+
+import pytest
+
+from bareasgi import HttpResponse
+
+
+async def _read_chunks(response: HttpResponse):
+    assert response.body is not None
+    return [chunk async for chunk in response.body]
+
+
+async def _records(count: int) -> AsyncIterator[dict]:
+    for i in range(count):
+        yield {'id': i}
+
+
+@pytest.mark.asyncio
+async def test_from_json_array():
+    response = HttpResponse.from_json_array(_records(3), buffer_size=20)
+    assert response.headers == [(b'content-type', b'application/json')]
+    chunks = await _read_chunks(response)
+    assert chunks == [b'[{"id": 0},{"id": 1}', b',{"id": 2}]']
+
+    response = HttpResponse.from_json_array([])
+    assert await _read_chunks(response) == [b'[]']
+
+
+@pytest.mark.asyncio
+async def test_from_ndjson():
+    response = HttpResponse.from_ndjson(_records(3), buffer_size=1)
+    chunks = await _read_chunks(response)
+    assert chunks == [b'{"id": 0}\n', b'{"id": 1}\n', b'{"id": 2}\n']
+
+    response = HttpResponse.from_ndjson(iter([1, 2]))
+    assert await _read_chunks(response) == [b'1\n2\n']
+
+    response = HttpResponse.from_ndjson([])
+    assert await _read_chunks(response) == []
+
+
+def test_subclass_constructors():
+    class CustomResponse(HttpResponse):
+        pass
+
+    for response in (
+            CustomResponse.from_bytes(b'bytes'),
+            CustomResponse.from_text('text'),
+            CustomResponse.from_json({'id': 1}),
+            CustomResponse.from_json_array([{'id': 1}]),
+            CustomResponse.from_ndjson([{'id': 1}])
+    ):
+        assert isinstance(response, CustomResponse)
@@ -0,0 +1,46 @@
+"""Tests for urlencoded form parsing"""
+
+import pytest
+
+from bareasgi.http import HttpFormError, HttpPayloadTooLargeError
+
+from .mock_io import make_request, split_body
+
+BODY = (
+    b'firstname=Mickey&lastname=Mouse&note=caf%C3%A9+au+lait&empty=&'
+    b'firstname=M'
+)
+
+
+HEADERS = [(b'content-type', b'application/x-www-form-urlencoded')]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunk_size', [1, 5, len(BODY)])
+async def test_form(chunk_size):
+    request = make_request(split_body(BODY, chunk_size), HEADERS)
+    form = await request.form()
+    assert form == {
+        'firstname': ['Mickey', 'M'],
+        'lastname': ['Mouse'],
+        'note': ['café au lait'],
+        'empty': ['']
+    }
+    # The result is cached, as the body has been consumed.
+    assert await request.form() is form
+
+
+@pytest.mark.asyncio
+async def test_form_limits():
+    with pytest.raises(HttpFormError):
+        await make_request([BODY], HEADERS).form(max_fields=3)
+
+    with pytest.raises(HttpPayloadTooLargeError):
+        await make_request([BODY], HEADERS).form(max_field_size=16)
+
+    with pytest.raises(HttpPayloadTooLargeError):
+        await make_request([b'a' * 100], HEADERS).form(max_field_size=16)
+
+    request = make_request([BODY])
+    with pytest.raises(HttpFormError):
+        await request.form()